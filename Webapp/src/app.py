@@ -35,7 +35,7 @@ app.api_base_url = "http://th3sroeeeng4/RTMSAPI/ApiAutoUph/api"
 
 # Mapping operation -> function list
 OPERATION_FUNCTIONS = {
-    "Singulation": ["LOGVIEW"],
+    "Singulation": ["LOGVIEW", "LOGVIEW_STREAM", "LOGVIEW_HISTORY"],
     "Pick & Place": ["PNP_CHANGE_TYPE","PNP_BOM_TYPE","PNP_PACK_TYPE"],
     "Die Attach": ["DA_AUTO_UPH"],
     "Wire Bond": ["WB_AUTO_UPH"],
@@ -207,7 +207,7 @@ def function():
             func_module = importlib.import_module(f"functions.{func_name.lower()}")
             func = getattr(func_module, func_name)
             temp_root = os.path.join(os.getcwd(), "temp")
-            if func_name in ["DA_AUTO_UPH", "PNP_AUTO_UPH", "WB_AUTO_UPH"]:
+            if func_name in ["DA_AUTO_UPH", "PNP_AUTO_UPH", "WB_AUTO_UPH", "LOGVIEW_HISTORY"]:
                 result = func(file_path, temp_root, start_date, end_date)
             else:
                 result = func(file_path, temp_root)
@@ -313,6 +313,34 @@ def result():
             table_html = f"<pre>เกิดข้อผิดพลาดในการอ่านไฟล์ผลลัพธ์: {e}</pre>"
     return render_template("result.html", result=result_data, current_file=current_file, operation=operation, func_name=func_name, table_html=table_html, start_date=session.get("start_date"), end_date=session.get("end_date"))
 
+# ฟังก์ชันที่รองรับ what-if ปรับ threshold ของการตัด outliers
+TUNING_FUNCTIONS = ["DA_AUTO_UPH", "WB_AUTO_UPH"]
+
+@app.route("/tune_outliers", methods=["GET", "POST"])
+def tune_outliers():
+    """what-if: รันตัด outliers + ค่าเฉลี่ยใหม่ด้วย threshold ที่ส่งมา บนข้อมูลของผลลัพธ์ล่าสุดใน session"""
+    func_name = session.get("func_name")
+    file_path = session.get("current_file")
+    if func_name not in TUNING_FUNCTIONS or not file_path:
+        return jsonify({"error": f"ฟังก์ชัน {func_name} ไม่รองรับการปรับ threshold หรือยังไม่ได้ประมวลผล"}), 400
+    params = request.get_json(silent=True) or request.values.to_dict()
+    try:
+        import importlib
+        func_module = importlib.import_module(f"functions.{func_name.lower()}")
+        table, elapsed = func_module.tune_outliers(file_path, session.get("start_date"), session.get("end_date"), params)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": f"เกิดข้อผิดพลาดในการคำนวณ what-if: {e}"}), 500
+    table = table.astype(object).where(table.notna(), None)
+    return jsonify({
+        "func_name": func_name,
+        "params": params,
+        "elapsed_sec": round(elapsed, 4),
+        "columns": list(table.columns),
+        "rows": table.to_dict(orient="records"),
+    })
+
 @app.route("/api/", methods=["GET"])
 def get_api_data():
     endpoint = request.args.get("endpoint")
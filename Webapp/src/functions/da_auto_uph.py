@@ -2,63 +2,19 @@ import pandas as pd
 import numpy as np
 import os
 import json
+import time
 from datetime import datetime
-
-def apply_zscore(df, uph_col):
-    """ตัด outliers ด้วย Z-Score (±3 std)"""
-    mean = df[uph_col].mean()
-    std = df[uph_col].std()
-    if std == 0:
-        return df
-    z_scores = (df[uph_col] - mean) / std
-    filtered = df[(z_scores >= -3) & (z_scores <= 3)].copy()
-    filtered['Outlier_Method'] = 'Z-Score ±3'
-    return filtered
-
-def apply_iqr(df, uph_col):
-    """ตัด outliers ด้วย IQR"""
-    Q1 = df[uph_col].quantile(0.25)
-    Q3 = df[uph_col].quantile(0.75)
-    IQR = Q3 - Q1
-    lower = Q1 - 1.5 * IQR
-    upper = Q3 + 1.5 * IQR
-    filtered = df[(df[uph_col] >= lower) & (df[uph_col] <= upper)].copy()
-    filtered['Outlier_Method'] = 'IQR'
-    return filtered
-
-def has_outlier(df, uph_col):
-    """ตรวจสอบ outliers"""
-    Q1 = df[uph_col].quantile(0.25)
-    Q3 = df[uph_col].quantile(0.75)
-    IQR = Q3 - Q1
-    lower = Q1 - 1.5 * IQR
-    upper = Q3 + 1.5 * IQR
-    return ((df[uph_col] < lower) | (df[uph_col] > upper)).sum() > 0
-
-def remove_outliers_auto(df_model, uph_col, max_iter=20):
-    """ตัด outliers อัตโนมัติ"""
-    df_model[uph_col] = pd.to_numeric(df_model[uph_col], errors='coerce')
-    df_model = df_model.dropna(subset=[uph_col])
-
-    if len(df_model) < 15:
-        df_model['Outlier_Method'] = 'ไม่ตัด (ข้อมูลน้อย)'
-        return df_model
-
-    current_df = df_model.copy()
-    for i in range(max_iter):
-        z_df = apply_zscore(current_df, uph_col)
-        if not has_outlier(z_df, uph_col):
-            z_df['Outlier_Method'] = f'Z-Score Loop ×{i+1}'
-            return z_df
-
-        iqr_df = apply_iqr(z_df, uph_col)
-        if not has_outlier(iqr_df, uph_col):
-            iqr_df['Outlier_Method'] = f'IQR Loop ×{i+1}'
-            return iqr_df
-        current_df = iqr_df
-
-    current_df['Outlier_Method'] = f'IQR-Z-Score Loop ×{max_iter}+'
-    return current_df
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from functions import normalize, outlier_engine, outlier_tuning, uph_store
+    from functions.logview import resolve_workers
+except ImportError:
+    import normalize
+    import outlier_engine
+    import outlier_tuning
+    import uph_store
+    from logview import resolve_workers
 
 def get_column_names(df):
     """หาชื่อคอลัมน์ที่ต้องการ"""
@@ -105,25 +61,85 @@ def load_file(file_path):
     else:
         return pd.read_excel(file_path, engine='openpyxl')
 
+def _load_file_timed(file_path):
+    start = time.time()
+    df = load_file(file_path)
+    return df, time.time() - start
+
+def align_columns(frames):
+    """ปรับชื่อคอลัมน์ของทุกไฟล์ให้ตรงกับไฟล์แรกที่พบ (ไม่สนตัวพิมพ์ / ช่องว่าง / '_')"""
+    canonical = {}
+    aligned = []
+    for df in frames:
+        rename = {}
+        for col in df.columns:
+            key = str(col).strip().lower().replace(' ', '_')
+            rename[col] = canonical.setdefault(key, col)
+        aligned.append(df.rename(columns=rename))
+    return aligned
+
+def load_files(file_paths, workers=None):
+    """โหลดหลายไฟล์พร้อมกัน (process pool) แล้วรวมเป็นชุดข้อมูลเดียว (workers: None = logview.DEFAULT_WORKERS)"""
+    if isinstance(file_paths, str):
+        file_paths = [file_paths]
+    if not file_paths:
+        raise Exception("ไม่มีไฟล์ในรายการ")
+    workers = resolve_workers(workers, len(file_paths))
+    start = time.time()
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_load_file_timed, file_paths))
+    else:
+        results = [_load_file_timed(path) for path in file_paths]
+    for path, (df, seconds) in zip(file_paths, results):
+        print(f"📄 โหลด {os.path.basename(path)}: {len(df):,} แถว ({seconds:.2f} วินาที)")
+
+    frames = align_columns([df for df, _ in results])
+    df = pd.concat(frames, ignore_index=True, sort=False) if len(frames) > 1 else frames[0]
+    if len(frames) > 1:
+        print(f"📊 รวม {len(frames)} ไฟล์: {len(df):,} แถว ({time.time() - start:.2f} วินาที, workers: {workers})")
+    return df
+
+OUTLIER_METHOD_LABELS = {
+    outlier_engine.STOP_TOO_FEW: 'ไม่ตัด (ข้อมูลน้อย)',
+    outlier_engine.STOP_ZSCORE: 'Z-Score Loop ×{}',
+    outlier_engine.STOP_IQR: 'IQR Loop ×{}',
+    outlier_engine.STOP_MAX_ITER: 'IQR-Z-Score Loop ×{}+',
+}
+
 def remove_outliers(df):
-    """ตัด outliers ตามกลุ่ม"""
+    """ตัด outliers ตามกลุ่ม (ทุกกลุ่มพร้อมกันด้วย outlier_engine.trim_zscore_iqr: Z-Score ±3 สลับ IQR 1.5 ไม่ตัดกลุ่มที่มีน้อยกว่า 15 แถว)"""
     uph_col, model_col, bom_col, _ = get_column_names(df)
-    result_dfs = []
-    
     # เพิ่ม optn_code ใน groupby
-    for (bom_no, machine_model, optn_code, device, package_code, bom_rev), group_df in df.groupby([bom_col, model_col, 'optn_code', 'device', 'package_code', 'bom_rev']):
-        before_count = len(group_df)
-        cleaned_group = remove_outliers_auto(group_df, uph_col)
-        after_count = len(cleaned_group)
-        cleaned_group['DataPoints_Before'] = before_count
-        cleaned_group['DataPoints_After'] = after_count
-        cleaned_group['Outliers_Removed'] = before_count - after_count
-        result_dfs.append(cleaned_group)
-    
-    return pd.concat(result_dfs, ignore_index=True)
+    group_cols = [bom_col, model_col, 'optn_code', 'device', 'package_code', 'bom_rev']
+    codes, n_groups = outlier_engine.group_codes(df, group_cols)
+    if n_groups == 0:
+        raise Exception("ไม่พบกลุ่มข้อมูลสำหรับตัด outliers")
+
+    uph = pd.to_numeric(df[uph_col], errors='coerce')
+    keep, status, rounds = outlier_engine.trim_zscore_iqr(uph.to_numpy(dtype=float), codes, n_groups)
+    labels = np.array([OUTLIER_METHOD_LABELS[s].format(r) for s, r in zip(status, rounds)], dtype=object)
+    return kept_rows(df, uph, codes, n_groups, keep, labels)
+
+def kept_rows(df, uph, codes, n_groups, keep, labels=None):
+    """แถวที่เหลือหลังตัด outliers (เรียงตามกลุ่ม) พร้อมจำนวนจุดก่อน/หลังตัดของกลุ่ม (labels: Outlier_Method ต่อกลุ่ม)"""
+    uph_col = get_column_names(df)[0]
+    rows = outlier_engine.sorted_group_order(codes, keep)
+    before = np.bincount(codes[codes >= 0], minlength=n_groups)
+    after = np.bincount(codes[rows], minlength=n_groups)
+    row_codes = codes[rows]
+
+    result = df.iloc[rows].reset_index(drop=True)
+    result[uph_col] = uph.iloc[rows].to_numpy()
+    if labels is not None:
+        result['Outlier_Method'] = labels[row_codes]
+    result['DataPoints_Before'] = before[row_codes]
+    result['DataPoints_After'] = after[row_codes]
+    result['Outliers_Removed'] = before[row_codes] - after[row_codes]
+    return result
 
 def process_date_column(df):
-    """ประมวลผลคอลัมน์วันที่"""
+    """ประมวลผลคอลัมน์วันที่ (เก็บเป็น datetime64 ระดับวัน ไม่แปลงเป็น string)"""
     _, _, _, date_col = get_column_names(df)
     
     if not date_col:
@@ -131,8 +147,7 @@ def process_date_column(df):
         return df
     
     print(f"ใช้คอลัมน์วันที่: {date_col}")
-    df['date_time_start'] = pd.to_datetime(df[date_col], errors='coerce')
-    df['date_time_start'] = df['date_time_start'].dt.strftime('%Y/%m/%d')
+    df['date_time_start'] = pd.to_datetime(df[date_col], errors='coerce').dt.normalize()
     
     invalid_dates = df['date_time_start'].isna().sum()
     if invalid_dates > 0:
@@ -141,24 +156,49 @@ def process_date_column(df):
     
     return df
 
+class DateIndex:
+    """ดัชนีวันที่ที่เรียงแล้วของชุดข้อมูล: หาช่วงวันที่ด้วย binary search แทนการเทียบทุกแถว"""
+
+    def __init__(self, df, date_col='date_time_start'):
+        self.df = df
+        dates = df[date_col].to_numpy(dtype='datetime64[ns]')
+        self.order = np.argsort(dates, kind='stable')
+        self.sorted_dates = dates[self.order]
+
+    def __len__(self):
+        return len(self.sorted_dates)
+
+    def bounds(self):
+        """วันที่ต่ำสุด / สูงสุด ในรูปแบบ 'YYYY/MM/DD'"""
+        return tuple(pd.Timestamp(d).strftime('%Y/%m/%d') for d in (self.sorted_dates[0], self.sorted_dates[-1]))
+
+    def window(self, start_date, end_date):
+        """แถวที่วันที่อยู่ในช่วง [start_date, end_date] (รวมทั้งสองวัน) ตามลำดับแถวเดิม"""
+        lo = np.searchsorted(self.sorted_dates, pd.Timestamp(start_date).normalize().to_datetime64(), side='left')
+        hi = np.searchsorted(self.sorted_dates, pd.Timestamp(end_date).normalize().to_datetime64(), side='right')
+        return self.df.iloc[np.sort(self.order[lo:hi])]
+
+def _as_date_index(data):
+    return data if isinstance(data, DateIndex) else DateIndex(data)
+
 def get_date_range(df, start_date=None, end_date=None):
-    """ได้ช่วงวันที่"""
+    """ได้ช่วงวันที่ (df เป็น DataFrame หรือ DateIndex)"""
     if start_date and end_date:
         return start_date, end_date
     
-    max_date = df['date_time_start'].max()
-    min_date = df['date_time_start'].min()
+    min_date, max_date = _as_date_index(df).bounds()
     print(f"ใช้ช่วงวันที่ทั้งหมด: {min_date} ถึง {max_date}")
     return min_date, max_date
 
 def filter_by_date_range(df, start_date, end_date):
-    """กรองข้อมูลตามช่วงวันที่"""
-    filtered_df = df[df['date_time_start'].between(start_date, end_date)].copy()
+    """กรองข้อมูลตามช่วงวันที่ (df เป็น DataFrame หรือ DateIndex)"""
+    date_index = _as_date_index(df)
+    filtered_df = date_index.window(start_date, end_date).copy()
     
     if len(filtered_df) == 0:
         raise Exception("ไม่พบข้อมูลในช่วงวันที่ที่เลือก")
     
-    print(f"กรองข้อมูล: {len(filtered_df)}/{len(df)} แถว")
+    print(f"กรองข้อมูล: {len(filtered_df)}/{len(date_index)} แถว")
     return filtered_df
 
 def calculate_group_average(df, start_date, end_date):
@@ -171,11 +211,15 @@ def calculate_group_average(df, start_date, end_date):
         firsts = df.groupby([bom_col, model_col, 'optn_code'], as_index=False)[other_cols].first()
         grouped = pd.merge(grouped, firsts, on=[bom_col, model_col, 'optn_code'], how='left')
     print(f"=== ค่าเฉลี่ย UPH ({start_date} ถึง {end_date}) ===")
-    grouped = grouped.rename(columns={uph_col: 'UPH', model_col: 'Machine Model', bom_col: 'Bom No','operation':"Operation",
-                                      'optn_code':'Optn_Code', 'device':'Device', 'package_code':'Package Code', 'bom_rev':'Bom Rev'})
+    grouped = grouped.rename(columns=display_names(uph_col, model_col, bom_col))
 
     return grouped
 
+def display_names(uph_col, model_col, bom_col):
+    """ชื่อคอลัมน์ในตารางค่าเฉลี่ย"""
+    return {uph_col: 'UPH', model_col: 'Machine Model', bom_col: 'Bom No','operation':"Operation",
+            'optn_code':'Optn_Code', 'device':'Device', 'package_code':'Package Code', 'bom_rev':'Bom Rev'}
+
 def save_results(df_cleaned, grouped_average, start_date, end_date, output_dir):
     """บันทึกผลลัพธ์"""
     os.makedirs(output_dir, exist_ok=True)
@@ -193,22 +237,64 @@ def save_results(df_cleaned, grouped_average, start_date, end_date, output_dir):
     
     return cleaned_file, average_file
 
-def process_die_attack_data(file_path, start_date=None, end_date=None):
-    """ประมวลผลข้อมูล Die Attack"""
-    print("=== ประมวลผลข้อมูล Die Attack ===")
-    
-    df = load_file(file_path)
+DATASET_CACHE_SIZE = 4
+_dataset_cache = {}
+
+def load_dataset(file_path):
+    """โหลดไฟล์ เตรียมคอลัมน์วันที่ และสร้าง DateIndex (cache ตาม path + เวลาแก้ไขของทุกไฟล์
+    เลือกช่วงวันที่ใหม่กับข้อมูลชุดเดิมจึงไม่ต้องโหลดไฟล์ซ้ำ)"""
+    paths = [file_path] if isinstance(file_path, str) else list(file_path)
+    key = outlier_tuning.file_key(paths)
+    if key in _dataset_cache:
+        date_index = _dataset_cache[key]
+        print(f"ใช้ข้อมูลที่โหลดไว้แล้ว: {len(date_index)} แถว")
+        return date_index
+
+    df = load_files(paths)
     print(f"ข้อมูลเริ่มต้น: {len(df)} แถว")
-    
     df = process_date_column(df)
+    date_index = DateIndex(df)
+    if len(_dataset_cache) >= DATASET_CACHE_SIZE:
+        _dataset_cache.pop(next(iter(_dataset_cache)))
+    _dataset_cache[key] = date_index
+    return date_index
+
+def _read_file_for_store(file_path):
+    df = load_file(file_path)
+    uph_col, model_col, bom_col, date_col = get_column_names(df)
+    return df, date_col, {'uph': uph_col, 'machine_model': model_col, 'bom_no': bom_col}
+
+def load_store_dataset(file_path, store_path, start_date=None, end_date=None):
+    """เพิ่มไฟล์ใหม่เข้าคลังข้อมูล UPH แล้วดึงเฉพาะช่วงวันที่ที่ต้องการจากคลัง (ไม่อ่านไฟล์เดิมซ้ำ)"""
+    store = uph_store.UphStore(store_path)
+    paths = [file_path] if isinstance(file_path, str) else list(file_path or [])
+    uph_store.append_files(store, 'DA', paths, _read_file_for_store)
+    df = store.load_window('DA', start_date, end_date)
+    print(f"ข้อมูลจากคลัง: {len(df)} แถว")
+    df = process_date_column(df)
+    return DateIndex(df)
+
+def process_die_attack_data(file_path, start_date=None, end_date=None, store_path=None, normalize_models=False):
+    """ประมวลผลข้อมูล Die Attack (file_path เป็นไฟล์เดียวหรือ list ของไฟล์ที่จะรวมกัน
+    store_path: ใช้คลังข้อมูล UPH แทนการอ่านไฟล์ดิบทั้งหมด
+    normalize_models: ทำความสะอาดชื่อ Machine Model (ตัดช่องว่าง/ตัวพิมพ์ใหญ่ แบบเดียวกับ WB) ก่อนจัดกลุ่ม)"""
+    print("=== ประมวลผลข้อมูล Die Attack ===")
+    
+    if store_path:
+        date_index = load_store_dataset(file_path, store_path, start_date, end_date)
+    else:
+        date_index = load_dataset(file_path)
     
     if start_date and end_date:
         start_date = start_date.replace("-", "/")
         end_date = end_date.replace("-", "/")
     else:
-        start_date, end_date = get_date_range(df)
+        start_date, end_date = get_date_range(date_index)
     
-    df_filtered = filter_by_date_range(df, start_date, end_date)
+    df_filtered = filter_by_date_range(date_index, start_date, end_date)
+    if normalize_models:
+        _, model_col, _, _ = get_column_names(df_filtered)
+        df_filtered[model_col] = normalize.normalize_models(df_filtered[model_col])
     
     print("ตัด outliers...")
     df_cleaned = remove_outliers(df_filtered)
@@ -218,105 +304,206 @@ def process_die_attack_data(file_path, start_date=None, end_date=None):
     
     return df_cleaned, grouped_average, start_date, end_date
 
-def preview_date_range(file_path):
-    """แสดงข้อมูลวันที่ในไฟล์"""
+def build_tuning_session(df, start_date, end_date):
+    """เตรียม what-if session จากข้อมูลที่กรองช่วงวันที่แล้ว (กลุ่มและกฎเดียวกับ remove_outliers)
+    ตารางผลลัพธ์สร้างแบบเดียวกับ DA_AUTO_UPH: calculate_group_average + join Part bom pkg"""
+    uph_col, model_col, bom_col, _ = get_column_names(df)
+    group_cols = [bom_col, model_col, 'optn_code', 'device', 'package_code', 'bom_rev']
+    codes, n_groups = outlier_engine.group_codes(df, group_cols)
+    uph = pd.to_numeric(df[uph_col], errors='coerce')
+
+    def summarize(keep):
+        grouped_average = calculate_group_average(kept_rows(df, uph, codes, n_groups, keep), start_date, end_date)
+        if not os.path.exists(MAPPING_FILE):
+            return grouped_average
+        return join_mapping(grouped_average)
+
+    return outlier_tuning.build_session(
+        'zscore_iqr', df, group_cols, uph_col, method_labels=OUTLIER_METHOD_LABELS, summarize=summarize)
+
+def tune_outliers(file_path, start_date=None, end_date=None, params=None):
+    """what-if: ตัด outliers ใหม่ด้วย params (z_threshold, iqr_k, min_count, max_iter) บนข้อมูลชุดเดิม
+    ครั้งแรกเตรียม array ของแต่ละกลุ่มไว้ ครั้งต่อไปรันเฉพาะการตัด outliers + ค่าเฉลี่ย คืน (ตาราง, วินาที)"""
+    key = ('DA', outlier_tuning.file_key(file_path), start_date, end_date)
+
+    def builder():
+        date_index = load_dataset(file_path)
+        if start_date and end_date:
+            used_start, used_end = start_date.replace("-", "/"), end_date.replace("-", "/")
+        else:
+            used_start, used_end = get_date_range(date_index)
+        return build_tuning_session(filter_by_date_range(date_index, used_start, used_end), used_start, used_end)
+
+    return outlier_tuning.run_what_if(key, builder, params)
+
+DATE_KEYWORDS = ['date', 'time', 'วัน', 'เวลา']
+LOG_EXTENSIONS = ('.txt', '.log')
+PREVIEW_CACHE_SIZE = 64
+_preview_cache = {}
+
+def _find_date_column(columns):
+    for col in columns:
+        if col is not None and any(keyword in str(col).lower() for keyword in DATE_KEYWORDS):
+            return col
+    return None
+
+def _read_excel_date_column(file_path):
+    """อ่านเฉพาะคอลัมน์วันที่จาก .xlsx แบบ read-only (ไม่สร้าง DataFrame ทั้งไฟล์)"""
+    from openpyxl import load_workbook
+    wb = load_workbook(file_path, read_only=True, data_only=True)
     try:
-        df = load_file(file_path)
-        print(f"ไฟล์มีข้อมูล: {len(df):,} แถว")
-        
-        date_cols = [col for col in df.columns 
-                    if any(keyword in col.lower() for keyword in ['date', 'time', 'วัน', 'เวลา'])]
-        
-        if not date_cols:
+        ws = wb.worksheets[0]  # sheet แรกแบบเดียวกับ pd.read_excel (ไม่ใช่ sheet ที่ active ตอนบันทึก)
+        rows = ws.iter_rows(values_only=True)
+        header = next(rows, None)
+        date_col = _find_date_column(header or [])
+        if date_col is None:
+            return None, None
+        idx = list(header).index(date_col) + 1
+        values = [row[0] for row in ws.iter_rows(min_row=2, min_col=idx, max_col=idx, values_only=True)]
+        # ตัดแถวว่างท้ายชีต เหมือน pandas.read_excel
+        while values and values[-1] is None:
+            values.pop()
+        return date_col, values
+    finally:
+        wb.close()
+
+def _read_table_date_column(file_path):
+    """อ่านเฉพาะคอลัมน์วันที่ (csv ใช้ usecols, xls อ่าน header ก่อน, json ดึงเฉพาะ key)"""
+    if file_path.endswith('.csv'):
+        date_col = _find_date_column(pd.read_csv(file_path, nrows=0).columns)
+        if date_col is None:
+            return None, None
+        return date_col, pd.read_csv(file_path, usecols=[date_col])[date_col]
+    if file_path.endswith('.xls'):
+        date_col = _find_date_column(pd.read_excel(file_path, engine='xlrd', nrows=0).columns)
+        if date_col is None:
+            return None, None
+        return date_col, pd.read_excel(file_path, engine='xlrd', usecols=[date_col])[date_col]
+    df = load_file(file_path)
+    date_col = _find_date_column(df.columns)
+    return date_col, (df[date_col] if date_col is not None else None)
+
+def _scan_log_dates(file_path, chunk_size=1 << 20):
+    """log ของเครื่อง (ขึ้นต้นบรรทัดด้วย '<date> <time>') ใช้แค่บรรทัดแรก/บรรทัดสุดท้าย และนับจำนวนบรรทัด"""
+    with open(file_path, 'rb') as f:
+        first = f.readline()
+        size = f.seek(0, os.SEEK_END)
+        f.seek(max(size - 4096, 0))
+        tail = f.read()
+        last = ([line for line in tail.splitlines() if line.strip()] or [first])[-1]
+        f.seek(0)
+        line_count = sum(chunk.count(b'\n') for chunk in iter(lambda: f.read(chunk_size), b''))
+    if tail and not tail.endswith(b'\n'):
+        line_count += 1
+    dates = [line.decode('latin-1').split('\t', 1)[0].strip().split(' ', 1)[0] for line in (first, last)]
+    return dates, line_count
+
+def _preview_file(file_path):
+    if file_path.lower().endswith(LOG_EXTENSIONS):
+        dates, total = _scan_log_dates(file_path)
+        parsed = pd.to_datetime(pd.Series(dates), errors='coerce').dropna()
+        valid = total if len(parsed) else 0
+    else:
+        if file_path.endswith('.xlsx') or not os.path.splitext(file_path)[1]:
+            date_col, values = _read_excel_date_column(file_path)
+        else:
+            date_col, values = _read_table_date_column(file_path)
+        if date_col is None:
             print("ไม่พบคอลัมน์วันที่")
             return None
-        
-        date_col = date_cols[0]
-        df['temp_date'] = pd.to_datetime(df[date_col], errors='coerce')
-        valid_dates = df.dropna(subset=['temp_date'])
-        
-        if len(valid_dates) == 0:
-            print("ไม่มีข้อมูลวันที่ที่ถูกต้อง")
+        parsed = pd.to_datetime(pd.Series(values, dtype=object), errors='coerce')
+        total = len(parsed)
+        parsed = parsed.dropna()
+        valid = len(parsed)
+    if len(parsed) == 0:
+        print("ไม่มีข้อมูลวันที่ที่ถูกต้อง")
+        return None
+    return {
+        'min_date': parsed.min().strftime('%Y-%m-%d'),
+        'max_date': parsed.max().strftime('%Y-%m-%d'),
+        'valid_records': valid,
+        'total_records': total
+    }
+
+def preview_date_range(file_path):
+    """แสดงข้อมูลวันที่ในไฟล์ (อ่านเฉพาะคอลัมน์วันที่ และ cache ตาม path + เวลาแก้ไขไฟล์)"""
+    try:
+        if not os.path.isfile(file_path):
             return None
-        
-        min_date = valid_dates['temp_date'].min()
-        max_date = valid_dates['temp_date'].max()
-        
-        print(f"วันที่: {min_date.strftime('%Y-%m-%d')} ถึง {max_date.strftime('%Y-%m-%d')}")
-        print(f"ข้อมูลถูกต้อง: {len(valid_dates):,} แถว")
-        
-        return {
-            'min_date': min_date.strftime('%Y-%m-%d'),
-            'max_date': max_date.strftime('%Y-%m-%d'),
-            'valid_records': len(valid_dates),
-            'total_records': len(df)
-        }
+        stat = os.stat(file_path)
+        key = (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size)
+        if key not in _preview_cache:
+            if len(_preview_cache) >= PREVIEW_CACHE_SIZE:
+                _preview_cache.pop(next(iter(_preview_cache)))
+            _preview_cache[key] = _preview_file(file_path)
+        info = _preview_cache[key]
+        if info:
+            print(f"ไฟล์มีข้อมูล: {info['total_records']:,} แถว")
+            print(f"วันที่: {info['min_date']} ถึง {info['max_date']}")
+            print(f"ข้อมูลถูกต้อง: {info['valid_records']:,} แถว")
+        return info
         
     except Exception as e:
         print(f"เกิดข้อผิดพลาด: {str(e)}")
         return None
 
 
-def map_data(average_file):
-    """Map ข้อมูลเพิ่มเติมจากไฟล์ Part bom pkg ในโฟลเดอร์ data_MAP"""
-    print("=== Map ข้อมูลเพิ่มเติม ===")
-    
-    try:
-        # โหลดไฟล์ average
-        df_average = pd.read_excel(average_file, engine='openpyxl')
+MAPPING_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data_MAP", "Part bom pkg.xlsx")
+MAPPING_KEYS = ["Package Code", "Bom No", "Bom Rev", "Product Number"]
+_mapping_cache = {}
 
-        print(f"📊 ข้อมูล average: {len(df_average)} แถว")
+def load_mapping_table(mapping_file=MAPPING_FILE):
+    """โหลด Part bom pkg ครั้งเดียว (โหลดใหม่เมื่อไฟล์เปลี่ยน) ตั้ง index ตาม (Package Code, Bom No, Bom Rev, Product Number)"""
+    stat = os.stat(mapping_file)
+    key = (os.path.abspath(mapping_file), stat.st_mtime_ns, stat.st_size)
+    if _mapping_cache.get('key') != key:
+        df_map = pd.read_excel(mapping_file, engine='openpyxl')
+        # ไฟล์ mapping ใช้ชื่อคอลัมน์ bom_no
+        df_map = df_map.rename(columns={"bom_no": "Bom No"})
+        missing_cols = [col for col in MAPPING_KEYS + ["#of Die"] if col not in df_map.columns]
+        if missing_cols:
+            raise KeyError(f"ไม่พบคอลัมน์: {missing_cols}")
+        table = df_map[MAPPING_KEYS + ["#of Die"]].set_index(MAPPING_KEYS).sort_index()
+        _mapping_cache.update(key=key, table=table, rows=len(df_map))
+    return _mapping_cache['table']
 
-        # หาไฟล์ mapping
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        map_folder = os.path.join(current_dir, "..", "data_MAP")
+def join_mapping(df_average):
+    """Join ตารางค่าเฉลี่ยกับ Part bom pkg ผ่าน index (Device = Product Number) เรียงคอลัมน์แบบไฟล์ผลลัพธ์ DA"""
+    table = load_mapping_table()
+    df_merged = df_average.join(table, on=["Package Code", "Bom No", "Bom Rev", "Device"], how="left")
 
-        mapping_file = os.path.join(map_folder, "Part bom pkg.xlsx")
-        df_map = pd.read_excel(mapping_file, engine='openpyxl')
+    df_merged["Cust"] = df_merged["Bom No"].str[:3]
+    df_merged.rename(columns={"#of Die": "#OF DIE"}, inplace=True)
 
-        if not os.path.exists(mapping_file):
-            print(f"⚠️ ไม่พบไฟล์: {mapping_file}")
-            return average_file
+    column_order=["Cust","Package Code","Device","Bom No","Bom Rev","Machine Model","Operation","Optn_Code","#OF DIE",
+                  "UPH","DataPoints_Before","DataPoints_After","Outliers_Removed"]
 
-        # โหลดไฟล์ mapping แรก
-        df_map = pd.read_excel(mapping_file, engine='openpyxl')
-        print(f"📊 ข้อมูล mapping: {len(df_map)} แถว")
+    df_merged = df_merged[column_order]
+    return df_merged.rename(columns={"Device": "Product Number"})
 
-        # ตรวจสอบคอลัมน์ที่จำเป็น
-        required_cols = ["Product Number"]
-        missing_cols = [col for col in required_cols if col not in df_map.columns]
-        
-        if missing_cols:
-            print(f"⚠️ ไม่พบคอลัมน์: {missing_cols}")
-            return average_file
-
-        # เลือกคอลัมน์ที่ต้องการจากไฟล์แรก
-        map_cols = ["Bom No"] + required_cols
-        if "#of Die" in df_map.columns:
-            map_cols.append("#of Die")
-        elif "of Die" in df_map.columns:
-            map_cols.append("of Die")
-        
-        # Merge ข้อมูลจากไฟล์แรก
-        df_merged = df_average.merge(
-            df_map[["Package Code", "Bom No", "Bom Rev", "Product Number", "#of Die"]],
-            left_on=["Package Code", "Bom No", "Bom Rev", "Device"],
-            right_on=["Package Code", "Bom No", "Bom Rev", "Product Number"],
-            how="left"
-        )
-        print(f"✅ Map ไฟล์แรกสำเร็จ: {len(df_merged)} แถว")
+def map_data(grouped_average, output_dir=None):
+    """Map ข้อมูลเพิ่มเติมจากไฟล์ Part bom pkg ในโฟลเดอร์ data_MAP (join ในหน่วยความจำ)
+    grouped_average เป็น DataFrame หรือ path ของไฟล์ average คืน path ของไฟล์ที่ map แล้ว (None ถ้า map ไม่ได้)"""
+    print("=== Map ข้อมูลเพิ่มเติม ===")
+    
+    try:
+        if isinstance(grouped_average, pd.DataFrame):
+            df_average = grouped_average
+        else:
+            df_average = pd.read_excel(grouped_average, engine='openpyxl')
+            output_dir = output_dir or os.path.dirname(grouped_average)
 
-        df_merged["Cust"] = df_merged["Bom No"].str[:3]
-        df_merged.rename(columns={"#of Die": "#OF DIE"}, inplace=True)
+        print(f"📊 ข้อมูล average: {len(df_average)} แถว")
 
-        column_order=["Cust","Package Code","Device","Bom No","Bom Rev","Machine Model","Operation","Optn_Code","#OF DIE",
-                      "UPH","DataPoints_Before","DataPoints_After","Outliers_Removed"]
+        if not os.path.exists(MAPPING_FILE):
+            print(f"⚠️ ไม่พบไฟล์: {MAPPING_FILE}")
+            return None
 
-        df_merged = df_merged[column_order]
-        df_merged = df_merged.rename(columns={"Device": "Product Number"})
+        df_merged = join_mapping(df_average)
+        print(f"📊 ข้อมูล mapping: {_mapping_cache['rows']} แถว")
+        print(f"✅ Map ไฟล์แรกสำเร็จ: {len(df_merged)} แถว")
 
         # บันทึกไฟล์ที่ map แล้ว
-        output_dir = os.path.dirname(average_file)
         timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
         mapped_file = os.path.join(output_dir, f"Da_Web_{timestamp}.xlsx")
         
@@ -327,35 +514,37 @@ def map_data(average_file):
 
     except Exception as e:
         print(f"❌ เกิดข้อผิดพลาดในการ map ข้อมูล: {e}")
-        return average_file
+        return None
 
-def DA_AUTO_UPH(file_path, temp_root, start_date=None, end_date=None):
-    """ฟังก์ชันหลักสำหรับประมวลผล Die Attack"""
+def DA_AUTO_UPH(file_path, temp_root, start_date=None, end_date=None, debug_output=False, store_path=None,
+                normalize_models=False):
+    """ฟังก์ชันหลักสำหรับประมวลผล Die Attack (debug_output=True บันทึกไฟล์ cleaned_data / group_average ด้วย
+    store_path: เพิ่มไฟล์เข้าคลังข้อมูล UPH แล้วประมวลผลจากคลัง ส่ง file_path ว่างได้ถ้าใช้ข้อมูลในคลังอย่างเดียว
+    normalize_models: ทำความสะอาดชื่อ Machine Model ก่อนจัดกลุ่ม)"""
     try:
-        # ตรวจสอบ input type
+        # ตรวจสอบ input type (หลายไฟล์ เช่น ไฟล์รายไตรมาส จะถูกรวมเป็นชุดข้อมูลเดียว)
         if isinstance(file_path, list):
-            if len(file_path) == 0:
+            if len(file_path) == 0 and not store_path:
                 print("❌ ไม่มีไฟล์ในรายการ")
                 return None
-            actual_file_path = file_path[0]  # ใช้ไฟล์แรก
-            print(f"⚠️ รับรายการไฟล์ ({len(file_path)} ไฟล์) ใช้ไฟล์แรก: {actual_file_path}")
-        else:
-            actual_file_path = file_path
+            print(f"📂 รับรายการไฟล์ ({len(file_path)} ไฟล์) รวมเป็นชุดข้อมูลเดียว")
 
         df_cleaned, grouped_average, used_start_date, used_end_date = process_die_attack_data(
-            actual_file_path, start_date, end_date)
-
-        cleaned_file, average_file = save_results(
-            df_cleaned, grouped_average, used_start_date, used_end_date, temp_root)
+            file_path, start_date, end_date, store_path=store_path, normalize_models=normalize_models)
 
         print(f"ช่วงวันที่: {used_start_date} ถึง {used_end_date}")
-        
-        if not os.path.exists(average_file):
-            print("❌ ไม่พบไฟล์ average_file")
-            return None
+        os.makedirs(temp_root, exist_ok=True)
+
+        # ไฟล์ระหว่างทาง (cleaned_data / group_average) บันทึกเฉพาะเมื่อขอ debug_output
+        if debug_output:
+            save_results(df_cleaned, grouped_average, used_start_date, used_end_date, temp_root)
 
         # Map ข้อมูลเพิ่มเติม
-        mapped_file = map_data(average_file)      
+        mapped_file = map_data(grouped_average, temp_root)
+        if mapped_file is None:
+            # map ไม่ได้: ส่งคืนไฟล์ค่าเฉลี่ยแทนแบบเดิม
+            _, mapped_file = save_results(
+                df_cleaned, grouped_average, used_start_date, used_end_date, temp_root)
         print(f"📁 ส่งคืนไฟล์: {mapped_file}")
         return mapped_file
 
@@ -2,11 +2,12 @@ import pandas as pd
 import os
 import glob
 import numpy as np
+import csv
 from pathlib import Path
 import time
 from datetime import datetime  
-import tempfile
-import shutil
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
@@ -17,105 +18,128 @@ import pandas as pd
 import os
 from typing import Union, List
 
-def find_input_files(input_pattern: str):
+def find_input_files(input_pattern: Union[str, List[str]]):
+    # รองรับ list ของไฟล์/โฟลเดอร์ที่ส่งมาจากหน้าเว็บ
+    if isinstance(input_pattern, (list, tuple)):
+        files = []
+        for pattern in input_pattern:
+            files.extend(find_input_files(pattern))
+        return sorted(set(files))
     if os.path.isdir(input_pattern):
         files = glob.glob(os.path.join(input_pattern, "*.txt")) + \
         glob.glob(os.path.join(input_pattern, "*.TXT"))
         files = list(set(os.path.abspath(f) for f in files))
     else:
         files = glob.glob(input_pattern)
-    return files
+    return sorted(files)
+
+# คอลัมน์ที่ขั้นตอนถัดไปใช้งานจริง: ตำแหน่งใน payload (คั่นด้วย ',') ของแต่ละคอลัมน์
+PARSE_VALUE_COLUMNS = {'frame': 0, 'No_strip': 2, 'value_1': 3, 'value_5': 7}
+FRAME_PATTERN = r'((?:FU|FR|FA|FW|FN|FJ|F1|F2|F3|F4|F5|F6|F7|F8|F9|F0)\w{4})'
 
 def load_and_parse_file(input_file: str) -> pd.DataFrame:
+    # อ่านทั้งไฟล์ด้วย C engine ครั้งเดียว: timestamp / step / payload แยกด้วย tab
     try:
-        with open(input_file, 'r', encoding='latin-1') as file:
-            lines = file.readlines()
+        raw = pd.read_csv(
+            input_file, sep='\t', header=None, names=['timestamp', 'step', 'payload'],
+            usecols=[0, 1, 2], dtype=str, encoding='latin-1', engine='c',
+            quoting=csv.QUOTE_NONE, keep_default_na=False, on_bad_lines='skip'
+        )
+    except pd.errors.EmptyDataError:
+        return pd.DataFrame()
     except Exception as e:
         print(f"Error reading {input_file}: {e}")
         return pd.DataFrame()
-    rows = []
-    max_values_len = 0
-    for line in lines:
-        parts = line.strip().split('\t')
-        if len(parts) < 3:
-            continue
-        timestamp, data_type, data_values = parts[0], parts[1], parts[2]
-        try:
-            date_part, time_part = timestamp.split(' ')
-            time_part = time_part.replace('AM', '').replace('PM', '').strip()
-        except ValueError:
-            continue
-        values = data_values.split(',')
-        if len(values) > max_values_len:
-            max_values_len = len(values)
-        row = [date_part, time_part, data_type] + values
-        rows.append(row)
-    if not rows:
+    raw = raw[raw['payload'].str.strip() != '']
+    if raw.empty:
         return pd.DataFrame()
-    max_len = 6 + max_values_len
-    for row in rows:
-        row += [''] * (max_len - len(row))
-    columns = ['date', 'time', 'step', 'frame', 'G', 'No_strip'] + [f'value_{i}' for i in range(1, max_values_len + 1)]
-    df = pd.DataFrame(rows, columns=columns)
-    pattern = r'(FU|FR|FA|FW|FN|FJ|F1|F2|F3|F4|F5|F6|F7|F8|F9|F0)(\w{4})'
-    df['frame'] = df['frame'].astype(str)
-    df['frame'] = df['frame'].str.extract(pattern).fillna('').agg(''.join, axis=1)
-    return df
+
+    # timestamp ต้องมีรูปแบบ "<date> <time>" (เว้นวรรคเดียว) เหมือนเดิม
+    timestamp = raw['timestamp'].str.strip()
+    raw = raw[timestamp.str.count(' ') == 1]
+    if raw.empty:
+        return pd.DataFrame()
+    date_time = timestamp[raw.index].str.split(' ', n=1, expand=True)
+
+    max_index = max(PARSE_VALUE_COLUMNS.values())
+    values = raw['payload'].str.rstrip().str.split(',', n=max_index + 1, expand=True)
+
+    df = pd.DataFrame({
+        'date': date_time[0],
+        'time': date_time[1].str.replace('AM', '', regex=False).str.replace('PM', '', regex=False).str.strip(),
+        'step': raw['step'].astype('category'),
+    })
+    for col, pos in PARSE_VALUE_COLUMNS.items():
+        column = values[pos] if pos in values.columns else pd.Series(None, index=values.index, dtype=object)
+        if col == 'frame':
+            df[col] = column.fillna('').str.extract(FRAME_PATTERN, expand=False).fillna('')
+        else:
+            df[col] = pd.to_numeric(column, errors='coerce')
+    return df.reset_index(drop=True)
+
+def _round_speed(x):
+    return int(x) if x % 1 == 0 else round(x, 2)
 
 def extract_pro_and_speed(df: pd.DataFrame) -> pd.DataFrame:
     if df.empty:
         return pd.DataFrame()
-    df_pro = df[df['step'] == 'PRO'].copy()
+    is_pro = (df['step'] == 'PRO').to_numpy()
+    df_pro = df[is_pro].copy()
     if df_pro.empty:
         return pd.DataFrame()
-    df_pro['speed'] = None
-    for idx in df_pro.index:
-        speed_value = None
-        pos = df.index.get_loc(idx)
-        for j in range(pos + 1, len(df)):
-            if df.loc[df.index[j], 'step'] == 'CUC':
-                if 'value_5' in df.columns and len(df.columns) > df.columns.get_loc('value_5'):
-                    speed_value = df.loc[df.index[j], 'value_5']
-                break
-        df_pro.at[idx, 'speed'] = speed_value
-    df_pro['speed'] = pd.to_numeric(df_pro['speed'], errors='coerce')
-    df_pro['speed'] = df_pro['speed'] / 10 / 25.4
-    df_pro['speed'] = df_pro['speed'].apply(lambda x: int(x) if x % 1 == 0 else round(x, 2))
+    # หา CUC ตัวถัดไปของแต่ละ PRO ด้วย searchsorted (O(n log n) แทนการวนหาทีละแถว)
+    cuc_pos = np.flatnonzero((df['step'] == 'CUC').to_numpy())
+    pro_pos = np.flatnonzero(is_pro)
+    next_cuc = np.searchsorted(cuc_pos, pro_pos, side='right')
+    has_cuc = next_cuc < len(cuc_pos)
+    speed = np.full(len(pro_pos), np.nan)
+    if 'value_5' in df.columns and has_cuc.any():
+        value_5 = pd.to_numeric(df['value_5'], errors='coerce').to_numpy(dtype=float)
+        speed[has_cuc] = value_5[cuc_pos[next_cuc[has_cuc]]]
+    speed = pd.Series(speed, index=df_pro.index) / 10 / 25.4
+    # ปัดค่าเฉพาะค่าที่ไม่ซ้ำ แล้ว map กลับ (ค่า speed มีไม่กี่ค่า)
+    uniques = speed.dropna().unique()
+    rounded = {x: _round_speed(x) for x in uniques}
+    if speed.notna().all() and all(isinstance(v, int) for v in rounded.values()):
+        df_pro['speed'] = speed.map(rounded).astype('int64')
+    else:
+        df_pro['speed'] = speed.map(rounded).astype(float)
     return df_pro
 
+ERROR_STEPS = ['ERRSET', 'ERRRCV', 'ERRCLR', 'DMC', 'DMW']
+
 def mark_errors(df: pd.DataFrame, df_pro: pd.DataFrame) -> pd.DataFrame:
     if df.empty or df_pro.empty:
         return df_pro
-    df_pro['MC'] = None
-    pro_indices = df.index[df['step'] == 'PRO'].tolist()
-    for i in range(1, len(pro_indices)):
-        current_idx = pro_indices[i]
-        prev_idx = pro_indices[i - 1]
-        start_idx = min(prev_idx, current_idx)
-        end_idx = max(prev_idx, current_idx)
-        df_slice = df.loc[start_idx:end_idx]
-        error_steps = ['ERRSET', 'ERRRCV', 'ERRCLR', 'DMC', 'DMW']
-        has_error = df_slice['step'].isin(error_steps).any()
-        if has_error and prev_idx in df_pro.index:
-            df_pro.at[prev_idx, 'MC'] = 'MC error'
+    # นับ error สะสม แล้วเอาผลต่างระหว่าง PRO ที่ติดกันเป็นจำนวน error ในช่วงนั้น
+    error_count = df['step'].isin(ERROR_STEPS).to_numpy().cumsum()
+    pro_pos = np.flatnonzero((df['step'] == 'PRO').to_numpy())
+    has_error = np.zeros(len(pro_pos), dtype=bool)
+    has_error[:-1] = np.diff(error_count[pro_pos]) > 0
+    mc = pd.Series(np.where(has_error, 'MC error', None), index=df.index[pro_pos], dtype=object)
+    mc = mc.reindex(df_pro.index)
+    df_pro['MC'] = mc.where(mc.notna(), None)
     return df_pro
 
+def _layout_with_blank_rows(df: pd.DataFrame, keep_pos, blank_before, blank_after) -> pd.DataFrame:
+    """
+    จัดวางแถวตามตำแหน่ง keep_pos และแทรกแถวว่างก่อน/หลังแต่ละแถว ด้วยการ reindex ครั้งเดียว
+    """
+    keep_pos = np.asarray(keep_pos, dtype=np.int64)
+    blank_before = np.asarray(blank_before, dtype=np.int64)
+    blank_after = np.asarray(blank_after, dtype=np.int64)
+    n_out = len(keep_pos) + int(blank_before.sum()) + int(blank_after.sum())
+    out_pos = np.arange(len(keep_pos)) + np.cumsum(blank_before) + (np.cumsum(blank_after) - blank_after)
+    indexer = np.full(n_out, -1, dtype=np.int64)
+    indexer[out_pos] = keep_pos
+    return df.reset_index(drop=True).reindex(indexer).reset_index(drop=True)
+
 def insert_blank_rows(df_pro: pd.DataFrame) -> pd.DataFrame:
     if df_pro.empty:
         return df_pro
-    new_rows = []
-    for i in range(len(df_pro)):
-        row = df_pro.iloc[i]
-        new_rows.append(row)
-        try:
-            first_strip = float(row['No_strip']) == 1
-        except (ValueError, TypeError):
-            first_strip = False
-        if first_strip:
-            empty_row = pd.Series([None] * len(df_pro.columns), index=df_pro.columns)
-            new_rows.append(empty_row)
-    df_with_blank = pd.DataFrame(new_rows).reset_index(drop=True)
-    return df_with_blank
+    first_strip = (pd.to_numeric(df_pro['No_strip'], errors='coerce') == 1).to_numpy()
+    n = len(df_pro)
+    return _layout_with_blank_rows(df_pro, np.arange(n), np.zeros(n), first_strip)
 
 def calculate_time_diff(df: pd.DataFrame) -> pd.DataFrame:
     if df.empty:
@@ -130,100 +154,100 @@ def calculate_time_diff(df: pd.DataFrame) -> pd.DataFrame:
     df = df.drop(columns=['datetime'])
     return df
 
+def assign_subgroups(strip: pd.Series) -> pd.Series:
+    # เริ่ม subgroup ใหม่เมื่อเป็นแถวแรกหลังแถวว่าง หรือ No_strip มากกว่าแถวก่อนหน้า
+    values = strip.to_numpy(dtype=float)
+    valid = ~np.isnan(values)
+    prev = np.concatenate(([np.nan], values[:-1]))
+    starts = valid & (np.isnan(prev) | (values > prev))
+    subgroups = np.cumsum(starts).astype(float)
+    subgroups[~valid] = np.nan
+    return pd.Series(subgroups, index=strip.index)
+
 def assign_subgroups_and_insert_empty_rows(df, column_strip='No_strip', frame_group='frame'):
-    subgroup_id = 0
-    subgroups = []
-    prev_val = None
-    for val in df[column_strip]:
-        if pd.isna(val):
-            subgroups.append(np.nan)
-            prev_val = None
-            continue
-        if prev_val is None:
-            subgroup_id += 1
-        elif val > prev_val:
-            subgroup_id += 1
-        subgroups.append(subgroup_id)
-        prev_val = val
-    df['subgroup_id'] = subgroups
-    result_rows = []
-    subgroup_keys = df['subgroup_id'].dropna().unique()
-    for group in subgroup_keys:
-        group_df = df[df['subgroup_id'] == group].reset_index(drop=True)
-        result_rows.append(group_df.iloc[[0]])
-        for i in range(1, len(group_df)):
-            prev_frame = group_df.loc[i - 1, frame_group]
-            curr_frame = group_df.loc[i, frame_group]
-            if prev_frame != curr_frame:
-                empty_row = pd.DataFrame({col: [np.nan] for col in df.columns})
-                result_rows.append(empty_row)
-            result_rows.append(group_df.iloc[[i]])
-        empty_row = pd.DataFrame({col: [np.nan] for col in df.columns})
-        result_rows.append(empty_row)
-    result_df = pd.concat(result_rows, ignore_index=True).reset_index(drop=True)
-    return result_df
+    df['subgroup_id'] = assign_subgroups(pd.to_numeric(df[column_strip], errors='coerce'))
+    subgroup = df['subgroup_id'].to_numpy()
+    keep_pos = np.flatnonzero(~np.isnan(subgroup))
+    if len(keep_pos) == 0:
+        return pd.DataFrame(columns=df.columns)
+    kept_group = subgroup[keep_pos]
+    kept_frame = df[frame_group].to_numpy(dtype=object)[keep_pos]
+    same_group = np.concatenate(([False], kept_group[1:] == kept_group[:-1]))
+    frame_changed = np.concatenate(([False], kept_frame[1:] != kept_frame[:-1]))
+    # แถวว่างคั่นเมื่อ frame เปลี่ยนภายใน subgroup และปิดท้ายทุก subgroup
+    blank_before = same_group & frame_changed
+    blank_after = np.concatenate((kept_group[1:] != kept_group[:-1], [True]))
+    return _layout_with_blank_rows(df, keep_pos, blank_before, blank_after)
 
-def mark_outlier_subgroups(df, subgroup_col='subgroup_id', no_strip_col='No_strip'):
-    outlier_groups = []
-    for subgroup, group_df in df.groupby(subgroup_col):
-        if 1 not in group_df[no_strip_col].values:
-            outlier_groups.append(subgroup)
-    df['outlier_subgroup'] = df[subgroup_col].isin(outlier_groups)
-    return df
+def _percentile_25(values):
+    return np.percentile(values.to_numpy(), 25)
+
+def _percentile_75(values):
+    return np.percentile(values.to_numpy(), 75)
+
+def _numpy_mean(values):
+    return np.mean(values.to_numpy())
+
+def _numpy_std(values):
+    return np.std(values.to_numpy())
+
+def compute_frame_statistics(df, group_col='frame', value_col='seconds', no_strip_col='No_strip',
+                             subgroup_col='subgroup_id', outlier_mc='MC',
+                             iqr_factor=1, zscore_threshold=2, min_diff_seconds=90, min_good_values=5):
+    """
+    ขั้นตอนสถิติรายเฟรมแบบ vectorized (แทน mark_outlier_subgroups, detect_outliers_combined
+    และ add_avg_exclude_outliers_by_frame): เพิ่มคอลัมน์ outlier_subgroup, is_outlier,
+    avg_ex_outliers, count_avg และ count_outliers
+    """
+    strip = df[no_strip_col]
+
+    # subgroup ที่ไม่มี No_strip = 1 ถือเป็น outlier subgroup
+    has_first_strip = (strip == 1).groupby(df[subgroup_col]).transform('any')
+    df['outlier_subgroup'] = df[subgroup_col].notna() & (has_first_strip != True)
 
-def detect_outliers_combined(df, group_col='frame', value_col='seconds', no_strip_col='No_strip',
-                             iqr_factor=1, zscore_threshold=2, min_diff_seconds=90):
+    # outlier รายแถว: คิดสถิติจากแถวที่ไม่ใช่ strip 2 ที่ตามด้วย strip 1
     df['is_outlier'] = False
-    df_filtered = df[~((df[no_strip_col] == 2) & (df[no_strip_col].shift(-1) == 1))]
-    for group_name, group in df_filtered.groupby(group_col):
-        values = group[value_col].dropna().values
-        if len(values) == 0:
-            continue
-        median = np.median(values)
-        q1 = np.percentile(values, 25)
-        q3 = np.percentile(values, 75)
-        iqr = q3 - q1
-        upper_bound = q3 + iqr_factor * iqr
-        mean = np.mean(values)
-        std = np.std(values)
-        for idx in group.index:
-            val = df.loc[idx, value_col]
-            if pd.isna(val):
-                continue
-            if val > upper_bound and abs(val - median) > min_diff_seconds:
-                df.at[idx, 'is_outlier'] = True
-            elif std > 0:
-                z_score = (val - mean) / std
-                if z_score > zscore_threshold and abs(val - mean) > min_diff_seconds:
-                    df.at[idx, 'is_outlier'] = True
-    return df
+    candidate = ~((strip == 2) & (strip.shift(-1) == 1)) & df[group_col].notna() & df[value_col].notna()
+    values = df.loc[candidate, value_col]
+    if not values.empty:
+        grouped = values.groupby(df.loc[candidate, group_col])
+        median = grouped.transform('median')
+        q1 = grouped.transform(_percentile_25)
+        q3 = grouped.transform(_percentile_75)
+        mean = grouped.transform(_numpy_mean)
+        std = grouped.transform(_numpy_std)
+        upper_bound = q3 + iqr_factor * (q3 - q1)
+        iqr_outlier = (values > upper_bound) & ((values - median).abs() > min_diff_seconds)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z_score = (values - mean) / std
+        z_outlier = (std > 0) & (z_score > zscore_threshold) & ((values - mean).abs() > min_diff_seconds)
+        df.loc[candidate, 'is_outlier'] = (iqr_outlier | z_outlier).to_numpy()
 
-def add_avg_exclude_outliers_by_frame(
-    df, 
-    value_col='seconds', 
-    group_col='frame', 
-    outlier_col='is_outlier',
-    outlier_subgroup_col='outlier_subgroup',
-    outlier_mc='MC'
-):
+    # ค่าเฉลี่ยรายเฟรมที่ไม่รวม outlier บันทึกไว้ที่แถวแรกของแต่ละเฟรม
     df['avg_ex_outliers'] = pd.NA
     df['count_avg'] = pd.NA
     df['count_outliers'] = pd.NA
-    for frame_val in df[group_col].dropna().unique():
-        group_df = df[df[group_col] == frame_val]
-        good_values = group_df[(group_df[outlier_col] != True) & (group_df[outlier_subgroup_col] != True) & (group_df[outlier_mc] != 'MC error')][value_col].dropna()
-        if len(good_values) < 5:
-            continue
-        avg_val = good_values.mean()
-        count_avg_val = len(good_values)
-        count_all = group_df[value_col].count()
-        count_outliers = count_all - count_avg_val
-        idx = df[df[group_col] == frame_val].index
-        if len(idx) > 0:
-            first_idx = idx[0]
-            df.at[first_idx, 'avg_ex_outliers'] = round(avg_val, 2)
-            df.at[first_idx, 'count_avg'] = count_avg_val
-            df.at[first_idx, 'count_outliers'] = count_outliers
+    frames = df[group_col]
+    good = (
+        (df['is_outlier'] != True) & (df['outlier_subgroup'] != True)
+        & (df[outlier_mc] != 'MC error') & df[value_col].notna() & frames.notna()
+    )
+    good_values = df.loc[good, value_col]
+    if good_values.empty:
+        return df
+    good_grouped = good_values.groupby(frames[good])
+    count_avg = good_grouped.size()
+    count_avg = count_avg[count_avg >= min_good_values]
+    if count_avg.empty:
+        return df
+    avg = good_grouped.agg(_numpy_mean)[count_avg.index]
+    count_all = df[value_col].groupby(frames).count()[count_avg.index]
+    first_rows = df.index[frames.notna() & ~frames.duplicated()]
+    first_rows = first_rows[frames[first_rows].isin(count_avg.index)]
+    first_frames = frames[first_rows]
+    df.loc[first_rows, 'avg_ex_outliers'] = avg[first_frames].round(2).to_numpy()
+    df.loc[first_rows, 'count_avg'] = count_avg[first_frames].to_numpy()
+    df.loc[first_rows, 'count_outliers'] = (count_all[first_frames] - count_avg[first_frames]).to_numpy()
     return df
 
 def summarize_by_frame(df):
@@ -232,16 +256,11 @@ def summarize_by_frame(df):
     }).reset_index()
     return summary
 
-def process_single_file_complete(input_file: str, output_dir: str):
-    print(f"กำลังประมวลผล: {input_file}")
-    input_path = Path(input_file)
-    output_path = Path(output_dir)
-    output_path.mkdir(exist_ok=True)
-    
-    # สร้างชื่อไฟล์ใหม่ด้วยวันที่และเวลา
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    output_file = output_path / f"{input_path.stem}_{timestamp}.xlsx"
-    
+def analyze_single_file(input_file: str):
+    """
+    วิเคราะห์ไฟล์ log หนึ่งไฟล์ในหน่วยความจำ
+    คืนค่า (True, (df_final, summary)) หรือ (False, ข้อความผิดพลาด)
+    """
     try:
         df = load_and_parse_file(input_file)
         if df.empty:
@@ -281,9 +300,7 @@ def process_single_file_complete(input_file: str, output_dir: str):
         
         # วิเคราะห์ข้อมูล
         df_analyzed = assign_subgroups_and_insert_empty_rows(df_filtered, 'No_strip', 'frame')
-        df_analyzed = mark_outlier_subgroups(df_analyzed, 'subgroup_id', 'No_strip')
-        df_analyzed = detect_outliers_combined(df_analyzed, 'frame', 'seconds', 'No_strip')
-        df_analyzed = add_avg_exclude_outliers_by_frame(df_analyzed, value_col='seconds', group_col='frame')
+        df_analyzed = compute_frame_statistics(df_analyzed, 'frame', 'seconds', 'No_strip', 'subgroup_id')
         
         # จัดการ Error columns
         if 'outlier_subgroup' in df_analyzed.columns and 'is_outlier' in df_analyzed.columns and 'MC' in df_analyzed.columns:
@@ -302,43 +319,238 @@ def process_single_file_complete(input_file: str, output_dir: str):
         # สร้าง Summary
         summary = summarize_by_frame(df_analyzed)
         df_final = df_analyzed.drop(columns=['avg_ex_outliers'])
-        
-        # บันทึกไฟล์ Excel
-        with pd.ExcelWriter(output_file) as writer:
-            df_final.to_excel(writer, index=False, sheet_name='Processed_Data')
-            summary.to_excel(writer, index=False, sheet_name='Summary')
-        
-        return True, str(output_file)
-        
+        return True, (df_final, summary)
+
     except Exception as e:
         return False, f"เกิดข้อผิดพลาดในการประมวลผล {input_file}: {str(e)}"
 
-def process_multiple_files_complete(input_pattern: str, output_dir: str):
-    files = find_input_files(input_pattern)
-    if not files:
-        print(f" ไม่พบไฟล์ที่ตรงกับ pattern: {input_pattern}")
-        return
-    print(f" พบไฟล์ทั้งหมด {len(files)} ไฟล์")
+def export_single_file(df_final: pd.DataFrame, summary: pd.DataFrame, input_file: str, output_dir: str):
+    input_path = Path(input_file)
+    output_path = Path(output_dir)
+    output_path.mkdir(exist_ok=True)
+    
+    # สร้างชื่อไฟล์ใหม่ด้วยวันที่และเวลา
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    output_file = output_path / f"{input_path.stem}_{timestamp}.xlsx"
+    
+    # บันทึกไฟล์ Excel
+    with pd.ExcelWriter(output_file) as writer:
+        df_final.to_excel(writer, index=False, sheet_name='Processed_Data')
+        summary.to_excel(writer, index=False, sheet_name='Summary')
+    return str(output_file)
+
+def process_single_file_complete(input_file: str, output_dir: str):
+    print(f"กำลังประมวลผล: {input_file}")
+    success, result = analyze_single_file(input_file)
+    if not success:
+        return False, result
+    try:
+        df_final, summary = result
+        return True, export_single_file(df_final, summary, input_file, output_dir)
+    except Exception as e:
+        return False, f"เกิดข้อผิดพลาดในการประมวลผล {input_file}: {str(e)}"
+
+def summarize_single_file(input_file: str, export_dir=None, cache_dir=None, with_hash=False):
+    """
+    วิเคราะห์ไฟล์และคืนเฉพาะ frame / speed / sec/strip (และ date) สำหรับขั้นตอน summary (ไม่ต้องอ่าน Excel กลับ)
+    ถ้าระบุ export_dir จะบันทึกไฟล์ Excel รายไฟล์เป็นผลลัพธ์เสริม
+    ถ้าระบุ cache_dir จะใช้ผลลัพธ์จาก cache เมื่อเนื้อหาไฟล์ไม่เปลี่ยน (ใช้เฉพาะเมื่อไม่ export Excel)
+    คืนค่า (success, message, sec_strip_df, file_hash) โดย file_hash เป็น None ถ้าไม่ได้คำนวณ
+    """
+    file_hash = None
+    cache_key = None
+    try:
+        if with_hash or (cache_dir and not export_dir):
+            file_hash = file_content_hash(input_file)
+    except OSError as e:
+        print(f"⚠️  คำนวณ hash ไม่ได้สำหรับ {input_file}: {e}")
+    if file_hash and cache_dir and not export_dir:
+        cache_key = f"{file_hash}_v{PIPELINE_VERSION}"
+        try:
+            cached = load_cached_sec_strip(cache_dir, cache_key)
+        except OSError as e:
+            print(f"⚠️  ใช้ cache ไม่ได้สำหรับ {input_file}: {e}")
+            cache_key, cached = None, None
+        if cached is not None:
+            return True, f"{input_file} (cache)", cached, file_hash
+    print(f"กำลังประมวลผล: {input_file}")
+    success, result = analyze_single_file(input_file)
+    if not success:
+        return False, result, None, file_hash
+    df_final, summary = result
+    message = input_file
+    if export_dir:
+        try:
+            message = export_single_file(df_final, summary, input_file, export_dir)
+        except Exception as e:
+            return False, f"เกิดข้อผิดพลาดในการบันทึก Excel ของ {input_file}: {str(e)}", None, file_hash
+    sec_strip = sec_strip_by_frame(df_final)
+    if cache_key:
+        try:
+            save_cached_sec_strip(cache_dir, cache_key, sec_strip)
+        except OSError as e:
+            print(f"⚠️  บันทึก cache ไม่ได้สำหรับ {input_file}: {e}")
+    return True, message, sec_strip, file_hash
+
+# ---------- Cache ผลวิเคราะห์รายไฟล์ (key = hash เนื้อหาไฟล์ + เวอร์ชัน pipeline) ----------
+
+# เปลี่ยนค่านี้เมื่อขั้นตอนวิเคราะห์เปลี่ยน เพื่อไม่ให้ใช้ผลลัพธ์ cache เดิม
+PIPELINE_VERSION = "2"
+CACHE_DIR_NAME = ".logview_cache"
+CACHE_MAX_AGE_DAYS = 30
+CACHE_MAX_SIZE_MB = 500
+
+def file_content_hash(input_file: str, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(input_file, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def cache_key_for_file(input_file: str) -> str:
+    return f"{file_content_hash(input_file)}_v{PIPELINE_VERSION}"
+
+def _cache_file(cache_dir: str, cache_key: str) -> str:
+    return os.path.join(cache_dir, f"{cache_key}.npz")
+
+def load_cached_sec_strip(cache_dir: str, cache_key: str):
+    path = _cache_file(cache_dir, cache_key)
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path) as data:
+            df = pd.DataFrame({
+                'frame': data['frame'].astype(object),
+                'speed': data['speed'],
+                'sec/strip': data['sec_strip'],
+            })
+            if 'date' in data:
+                df['date'] = data['date'].astype(object)
+    except (ValueError, KeyError, EOFError) as e:
+        print(f"⚠️  ไฟล์ cache เสีย ลบทิ้ง: {path} ({e})")
+        os.remove(path)
+        return None
+    os.utime(path)  # ใช้ล่าสุด สำหรับการลบแบบ LRU
+    return df
+
+def save_cached_sec_strip(cache_dir: str, cache_key: str, df: pd.DataFrame):
+    # เก็บแบบ columnar (อาร์เรย์ละคอลัมน์) เขียนไฟล์ชั่วคราวแล้วค่อย replace เพื่อกันไฟล์ไม่ครบ
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _cache_file(cache_dir, cache_key)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    columns = {
+        'frame': df['frame'].to_numpy(dtype=str),
+        'speed': df['speed'].to_numpy(dtype=float),
+        'sec_strip': df['sec/strip'].to_numpy(dtype=float),
+    }
+    if 'date' in df.columns:
+        columns['date'] = df['date'].to_numpy(dtype=str)
+    with open(temp_path, 'wb') as file:
+        np.savez(file, **columns)
+    os.replace(temp_path, path)
+
+def evict_cache(cache_dir: str, max_age_days=CACHE_MAX_AGE_DAYS, max_size_mb=CACHE_MAX_SIZE_MB):
+    """
+    ลบ cache ที่ไม่ได้ใช้เกิน max_age_days และลบตัวที่ใช้นานที่สุดจนขนาดรวมไม่เกิน max_size_mb
+    """
+    if not os.path.isdir(cache_dir):
+        return 0
+    now = time.time()
+    entries = []
+    removed = 0
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if not name.endswith('.npz') or not os.path.isfile(path):
+            continue
+        stat = os.stat(path)
+        if now - stat.st_mtime > max_age_days * 86400:
+            os.remove(path)
+            removed += 1
+        else:
+            entries.append((stat.st_mtime, stat.st_size, path))
+    total_size = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total_size <= max_size_mb * 1024 * 1024:
+            break
+        os.remove(path)
+        total_size -= size
+        removed += 1
+    return removed
+
+# จำนวน process เริ่มต้นเมื่อไม่ระบุ workers (เช่นเรียกจากเว็บ: ทุก request สร้าง pool ของตัวเอง จึงจำกัดไว้)
+# ใช้ร่วมกับ DA / WB ผ่าน resolve_workers แอปปรับค่าได้ที่ logview.DEFAULT_WORKERS, CLI ที่ต้องการใช้ทุก CPU ส่ง workers=os.cpu_count()
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+
+def resolve_workers(workers, n_files):
+    """
+    จำนวน process ที่ใช้: None = DEFAULT_WORKERS, 1 = ประมวลผลทีละไฟล์ (ไม่เกินจำนวนไฟล์)
+    """
+    if workers is None:
+        workers = DEFAULT_WORKERS
+    return max(1, min(int(workers), n_files))
+
+def run_files(files, worker, *args, workers=None):
+    """
+    เรียก worker(file, *args) กับทุกไฟล์ (แบบขนานด้วย process pool เมื่อ workers > 1)
+    worker ต้องคืน tuple ที่ขึ้นต้นด้วย (success, message); คืนผลลัพธ์เรียงตามลำดับไฟล์ input
+    """
+    workers = resolve_workers(workers, len(files))
+    print(f" พบไฟล์ทั้งหมด {len(files)} ไฟล์ (workers: {workers})")
     print("=" * 60)
     successful = 0
     failed = 0
+    results = []
     start_time = time.time()
-    for i, file_path in enumerate(files, 1):
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(worker, f, *args) for f in files]
+            outcomes = []
+            for file_path, future in zip(files, futures):
+                try:
+                    outcomes.append(future.result())
+                except Exception as e:
+                    outcomes.append((False, f"เกิดข้อผิดพลาดในการประมวลผล {file_path}: {str(e)}"))
+    else:
+        outcomes = (worker(f, *args) for f in files)
+    for i, (file_path, outcome) in enumerate(zip(files, outcomes), 1):
+        success, message = outcome[0], outcome[1]
         print(f"[{i}/{len(files)}] ", end="")
-        success, message = process_single_file_complete(file_path, output_dir)
         if success:
             print(f" สำเร็จ: {message}")
             successful += 1
         else:
             print(f" ล้มเหลว: {message}")
             failed += 1
+        results.append((file_path,) + tuple(outcome))
     end_time = time.time()
     print("\n" + "=" * 60)
     print(f" ใช้เวลา: {end_time - start_time:.2f} วินาที")
     print(f" ผลลัพธ์: สำเร็จ {successful} ไฟล์, ล้มเหลว {failed} ไฟล์")
+    return results
+
+def process_multiple_files_complete(input_pattern: Union[str, List[str]], output_dir: str, workers=None):
+    """
+    ประมวลผลหลายไฟล์และบันทึก Excel รายไฟล์
+    คืนค่า list ของ (input_file, success, message) เรียงตามลำดับไฟล์ input
+    """
+    files = find_input_files(input_pattern)
+    if not files:
+        print(f" ไม่พบไฟล์ที่ตรงกับ pattern: {input_pattern}")
+        return []
+    return run_files(files, process_single_file_complete, output_dir, workers=workers)
 
 # ---------- 2. รวม Summary ----------
 
+def sec_strip_by_frame(df):
+    """
+    เลือกเฉพาะแถวที่มี sec/strip และ speed (frame ว่างถือเป็น NaN เหมือนค่าที่อ่านกลับจาก Excel)
+    """
+    df = df[[col for col in ['frame', 'speed', 'sec/strip', 'date'] if col in df.columns]].copy()
+    df['frame'] = df['frame'].where(df['frame'] != '', np.nan).astype(str)
+    df['speed'] = pd.to_numeric(df['speed'], errors='coerce')
+    df['sec/strip'] = pd.to_numeric(df['sec/strip'], errors='coerce')
+    return df[df['sec/strip'].notna() & df['speed'].notna()]
+
 def load_sec_strip_by_frame(filepath, sheet_name='Processed_Data'):
     print(f"         📄 อ่านไฟล์: {os.path.basename(filepath)}")
     
@@ -368,13 +580,9 @@ def load_sec_strip_by_frame(filepath, sheet_name='Processed_Data'):
     
     print(f"         ✅ มีครบทุกคอลัมน์ที่ต้องการ")
     
-    df['frame'] = df['frame'].astype(str)
-    df['speed'] = pd.to_numeric(df['speed'], errors='coerce')
-    df['sec/strip'] = pd.to_numeric(df['sec/strip'], errors='coerce')
-    
     # นับจำนวนข้อมูลก่อนกรอง
     before_filter = len(df)
-    df = df[df['sec/strip'].notna() & df['speed'].notna()]
+    df = sec_strip_by_frame(df)
     after_filter = len(df)
     
     print(f"         📊 ข้อมูลก่อนกรอง: {before_filter} แถว")
@@ -385,11 +593,79 @@ def load_sec_strip_by_frame(filepath, sheet_name='Processed_Data'):
     
     return df
 
+def summarize_sec_strip_frames(frames):
+    """
+    สร้างตาราง summary จาก dict {ชื่อไฟล์: DataFrame(frame, speed, sec/strip)} ที่อยู่ในหน่วยความจำ
+    """
+    data = {}
+    for file_key, df in frames.items():
+        summary = df.groupby(['frame', 'speed'])['sec/strip'].mean()
+        summary.index = summary.index.map(lambda x: f"{x[0]}_speed{x[1]}")
+        data[file_key] = summary
+    if not data:
+        return pd.DataFrame()
+    result_df = pd.DataFrame(data)
+    result_df = result_df.sort_index()
+    return result_df
+
+def summarize_sec_strip_long(frames):
+    """
+    สร้าง summary แบบ long format (FRAME_STOCK, frame, speed, file, sec/strip) หนึ่งแถวต่อ frame/speed/ไฟล์
+    FRAME_STOCK คือ key "<frame>_speed<speed>" แบบเดียวกับ index ของตาราง wide
+    """
+    parts = []
+    for file_key, df in frames.items():
+        summary = df.groupby(['frame', 'speed'])['sec/strip'].mean().reset_index()
+        summary['file'] = file_key
+        parts.append(summary)
+    if not parts:
+        return pd.DataFrame(columns=['FRAME_STOCK', 'frame', 'speed', 'file', 'sec/strip'])
+    long_df = pd.concat(parts, ignore_index=True)
+    long_df.insert(0, 'FRAME_STOCK', long_df['frame'] + '_speed' + long_df['speed'].astype(str))
+    # เรียงตาม key (คงลำดับไฟล์ภายใน key) ให้ตรงกับ sort_index ของตาราง wide
+    return long_df.sort_values('FRAME_STOCK', kind='stable').reset_index(drop=True)
+
+def summary_to_long(summary_df):
+    """
+    แปลงตาราง wide (index = FRAME_STOCK, คอลัมน์ละไฟล์) เป็น long format (FRAME_STOCK, file, sec/strip)
+    """
+    if {'FRAME_STOCK', 'file', 'sec/strip'}.issubset(summary_df.columns):
+        return summary_df
+    df = summary_df
+    if 'FRAME_STOCK' in df.columns:
+        df = df.set_index('FRAME_STOCK')
+    long_df = df.stack().rename('sec/strip').reset_index()
+    long_df.columns = ['FRAME_STOCK', 'file', 'sec/strip']
+    return long_df
+
+def filtered_mean_by_group(long_df, key_col='FRAME_STOCK', value_col='sec/strip'):
+    """
+    filtered_mean ต่อ key แบบ vectorized: ตัดค่าที่เกิน Q3 + 1.5 IQR แล้วเฉลี่ย (รวมค่าตามลำดับไฟล์)
+    คืน DataFrame (key_col, 'TIME/STRIP') เรียงตาม key
+    """
+    values_df = long_df[[key_col, value_col]].dropna(subset=[value_col])
+    values_df = values_df.sort_values(key_col, kind='stable')
+    values = pd.to_numeric(values_df[value_col]).astype(float)
+    grouped = values.groupby(values_df[key_col], sort=False)
+    q1 = grouped.transform(_percentile_25)
+    q3 = grouped.transform(_percentile_75)
+    keep = (values <= q3 + 1.5 * (q3 - q1)).to_numpy()
+    keys = values_df[key_col].to_numpy()[keep]
+    kept = values.to_numpy()[keep]
+    if len(kept) == 0:
+        return pd.DataFrame(columns=[key_col, 'TIME/STRIP'])
+    # bincount บวกค่าตามลำดับแถว (ลำดับไฟล์) ให้ได้ผลเท่ากับ sum() ของ Python ทุกบิต
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    counts = np.diff(np.append(starts, len(kept)))
+    group_idx = np.repeat(np.arange(len(starts)), counts)
+    sums = np.bincount(group_idx, weights=kept, minlength=len(starts))
+    return pd.DataFrame({key_col: keys[starts], 'TIME/STRIP': sums / counts})
+
 def summarize_sec_strip(files_folder, file_list):
     print(f"   📁 กำลังประมวลผลไฟล์จาก folder: {files_folder}")
     print(f"   📋 รายการไฟล์: {file_list}")
     
-    data = {}
+    frames = {}
     successful_files = 0
     failed_files = 0
     
@@ -412,12 +688,10 @@ def summarize_sec_strip(files_folder, file_list):
                 failed_files += 1
                 continue
                 
-            summary = df.groupby(['frame', 'speed'])['sec/strip'].mean()
-            summary.index = summary.index.map(lambda x: f"{x[0]}_speed{x[1]}")
             file_key = os.path.splitext(filename)[0]
-            data[file_key] = summary
+            frames[file_key] = df
             
-            print(f"      ✅ สำเร็จ: {len(summary)} กลุ่มข้อมูล")
+            print(f"      ✅ สำเร็จ: {df.groupby(['frame', 'speed']).ngroups} กลุ่มข้อมูล")
             successful_files += 1
             
         except Exception as e:
@@ -427,12 +701,11 @@ def summarize_sec_strip(files_folder, file_list):
     
     print(f"   📊 สรุป: สำเร็จ {successful_files} ไฟล์, ล้มเหลว {failed_files} ไฟล์")
     
-    if not data:
+    if not frames:
         print(f"   ❌ ไม่มีข้อมูลใดๆ จากไฟล์ทั้งหมด")
         return pd.DataFrame()
         
-    result_df = pd.DataFrame(data)
-    result_df = result_df.sort_index()
+    result_df = summarize_sec_strip_frames(frames)
     print(f"   ✅ สร้าง result DataFrame: {result_df.shape}")
     
     return result_df
@@ -468,6 +741,12 @@ MAPPING = {
     ('QFN', '3.0'): 'Full PPF',
 }
 
+# กำหนด Process ตาม (Package group, SPEED) ใช้กับ SLP เท่านั้น
+PROCESS_MAPPING = {
+    ('SLP', 5): 'Full Cut',
+    ('SLP', 3): 'Step Cut',
+}
+
 def analyze_and_export_csv(summary_path, package_path, output_csv):
     df = pd.read_excel(summary_path)
     df2 = pd.read_excel(package_path)
@@ -493,10 +772,15 @@ def analyze_and_export_csv_from_df(summary_df, package_path, output_csv):
     """
     print("📊 เริ่มวิเคราะห์และส่งออก CSV...")
     
-    df = summary_df.reset_index()
-    # ตรวจสอบและเปลี่ยนชื่อคอลัมน์ index ให้เป็น 'FRAME_STOCK'
-    if df.columns[0] != 'FRAME_STOCK':
-        df = df.rename(columns={df.columns[0]: 'FRAME_STOCK'})
+    # รองรับทั้ง long format (FRAME_STOCK, file, sec/strip) และตาราง wide เดิม
+    if {'FRAME_STOCK', 'file', 'sec/strip'}.issubset(summary_df.columns):
+        long_df = summary_df
+    else:
+        df = summary_df.reset_index()
+        # ตรวจสอบและเปลี่ยนชื่อคอลัมน์ index ให้เป็น 'FRAME_STOCK'
+        if df.columns[0] != 'FRAME_STOCK':
+            df = df.rename(columns={df.columns[0]: 'FRAME_STOCK'})
+        long_df = summary_to_long(df)
     
     # โหลดข้อมูล package
     print(f"📁 โหลดข้อมูล package จาก: {package_path}")
@@ -518,11 +802,7 @@ def analyze_and_export_csv_from_df(summary_df, package_path, output_csv):
     
     # ประมวลผลข้อมูล
     print("🔄 กำลังประมวลผลข้อมูล...")
-    df['non_null_values'] = df.loc[:, df.columns != 'FRAME_STOCK'].apply(
-        lambda row: row.dropna().tolist(), axis=1)
-    df = df[['FRAME_STOCK', 'non_null_values']]
-    df['TIME/STRIP'] = df['non_null_values'].apply(filtered_mean)
-    df = df[['FRAME_STOCK', 'TIME/STRIP']]
+    df = filtered_mean_by_group(long_df)
     df['SPEED (IPS)'] = df['FRAME_STOCK'].astype(str).str[-3:]
     df['X'] = df['FRAME_STOCK'].astype(str).str[0:6]
     df = df[['X', 'SPEED (IPS)', 'TIME/STRIP', 'FRAME_STOCK']]
@@ -542,10 +822,14 @@ def analyze_and_export_csv_from_df(summary_df, package_path, output_csv):
     # แก้ไขการใช้ MAPPING (เฉพาะเมื่อมีคอลัมน์ที่เกี่ยวข้อง)
     if 'Frame type ' in df_merged.columns and 'Package group' in df_merged.columns:
         print("🔧 ปรับปรุง Frame type ตาม mapping...")
-        df_merged['Frame type '] = df_merged.apply(
-            lambda row: MAPPING.get((str(row['Package group']), str(row['SPEED (IPS)'])), row['Frame type ']),
-            axis=1
+        mapping_df = pd.DataFrame(
+            [(group, speed, frame_type) for (group, speed), frame_type in MAPPING.items()],
+            columns=['_group', '_speed', '_frame_type']
         )
+        mapped = df_merged[['Package group', 'SPEED (IPS)']].astype(str).merge(
+            mapping_df, left_on=['Package group', 'SPEED (IPS)'], right_on=['_group', '_speed'], how='left'
+        )['_frame_type']
+        df_merged['Frame type '] = mapped.where(mapped.notna(), df_merged['Frame type ']).to_numpy()
     else:
         print("⚠️  ข้าม MAPPING เนื่องจากไม่มีคอลัมน์ที่จำเป็น")
     
@@ -568,17 +852,20 @@ def analyze_and_export_csv_from_df(summary_df, package_path, output_csv):
         # ✅ แก้ไขเงื่อนไข Process - ให้ชัดเจนว่าใช้กับ SLP เท่านั้น
         print("   🔍 กำหนดเงื่อนไข Process สำหรับ SLP เท่านั้น...")
         
-        # สร้างเงื่อนไขแยกชัดเจน
-        condition_slp_speed5 = (df_merged['SPEED (IPS)'] == 5) & (df_merged['Package group'] == 'SLP')
-        condition_slp_speed3 = (df_merged['SPEED (IPS)'] == 3) & (df_merged['Package group'] == 'SLP')
+        # กำหนด Process ด้วยการ merge กับตาราง PROCESS_MAPPING
+        process_df = pd.DataFrame(
+            [(group, speed, process) for (group, speed), process in PROCESS_MAPPING.items()],
+            columns=['_group', '_speed', '_process']
+        )
+        process = df_merged[['Package group', 'SPEED (IPS)']].merge(
+            process_df, left_on=['Package group', 'SPEED (IPS)'], right_on=['_group', '_speed'], how='left'
+        )['_process'].to_numpy()
+        matched = pd.notna(process)
+        df_merged.loc[matched, 'Process'] = process[matched]
         
         # แสดงจำนวนข้อมูลที่ตรงเงื่อนไข
-        print(f"      - SLP Speed 5: {condition_slp_speed5.sum()} รายการ")
-        print(f"      - SLP Speed 3: {condition_slp_speed3.sum()} รายการ")
-        
-        # กำหนด Process ด้วย .loc[] แทน np.select()
-        df_merged.loc[condition_slp_speed5, 'Process'] = 'Full Cut'
-        df_merged.loc[condition_slp_speed3, 'Process'] = 'Step Cut'
+        for (group, speed), process_name in PROCESS_MAPPING.items():
+            print(f"      - {group} Speed {speed}: {(df_merged['Process'] == process_name).sum()} รายการ")
         
         # แสดงสรุปการกำหนด Process
         process_summary = df_merged.groupby(['Package group', 'SPEED (IPS)', 'Process']).size().reset_index(name='count')
@@ -612,6 +899,55 @@ def analyze_and_export_csv_from_df(summary_df, package_path, output_csv):
     
     return df_final
 
+def _merge_duplicate_frame_stock(df_merged):
+    """
+    รวมแถว FRAME_STOCK ที่ซ้ำกัน: TIME/STRIP ใช้ค่าเฉลี่ยของค่าที่ไม่เป็น NaN
+    คอลัมน์อื่นใช้ค่าแรกที่ไม่เป็น NaN
+    """
+    grouped = df_merged.groupby('FRAME_STOCK', sort=True)
+    df_unique = grouped.first()
+    time_values = df_merged[['FRAME_STOCK', 'TIME/STRIP']].dropna()
+    time_mean = time_values.groupby('FRAME_STOCK')['TIME/STRIP'].first()
+    duplicated = time_values[time_values['FRAME_STOCK'].duplicated(keep=False)]
+    if not duplicated.empty:
+        time_mean.update(duplicated.groupby('FRAME_STOCK')['TIME/STRIP'].agg(_numpy_mean))
+    df_unique['TIME/STRIP'] = time_mean.reindex(df_unique.index)
+    return df_unique.reset_index()[list(df_merged.columns)]
+
+def _group_time_strip_stats(df_unique, grouping_cols):
+    """
+    คำนวณค่าเฉลี่ยหลังตัด outlier (IQR 1.5) และจำนวนก่อน/หลังตัด ต่อกลุ่ม grouping_cols
+    คืน DataFrame หนึ่งแถวต่อกลุ่ม (เฉพาะกลุ่มที่มีข้อมูล TIME/STRIP)
+    """
+    values_df = df_unique.dropna(subset=grouping_cols + ['TIME/STRIP'])
+    columns = grouping_cols + ['_avg', 'Before_Outlier', 'After_Outlier', '_outliers']
+    if values_df.empty:
+        return pd.DataFrame(columns=columns)
+    keys = [values_df[col] for col in grouping_cols]
+    values = values_df['TIME/STRIP']
+    grouped = values.groupby(keys)
+    q1 = grouped.transform(_percentile_25)
+    q3 = grouped.transform(_percentile_75)
+    iqr = q3 - q1
+    in_range = (values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)
+
+    stats = grouped.agg(['size', 'first', _numpy_mean])
+    stats.columns = ['Before_Outlier', '_single', '_raw_mean']
+    filtered = values[in_range].groupby([key[in_range] for key in keys])
+    stats['After_Outlier'] = filtered.size().reindex(stats.index).fillna(0).astype(int)
+    stats['_filtered_mean'] = filtered.agg(_numpy_mean).reindex(stats.index)
+
+    # กลุ่มที่มีค่าเดียวใช้ค่านั้น, ถ้าทุกค่าเป็น outlier ใช้ค่าเฉลี่ยดิบ
+    has_filtered = stats['After_Outlier'] > 0
+    stats['_avg'] = np.where(has_filtered, stats['_filtered_mean'], stats['_raw_mean']).round(2)
+    stats.loc[stats['Before_Outlier'] == 1, '_avg'] = stats['_single']
+    stats.loc[~has_filtered, 'After_Outlier'] = stats['Before_Outlier']
+    stats['_outliers'] = np.where(
+        (stats['Before_Outlier'] >= 2) & has_filtered, stats['Before_Outlier'] - stats['After_Outlier'], 0
+    )
+    stats['_processed'] = (stats['Before_Outlier'] >= 2) & has_filtered
+    return stats.reset_index()[columns + ['_processed']]
+
 def group_and_average_across_frames_unique_frame(df_merged):
     print("🔄 กำลังจัดกลุ่มและคำนวณค่าเฉลี่ย...")
     
@@ -632,64 +968,15 @@ def group_and_average_across_frames_unique_frame(df_merged):
     
     print(f"📊 ข้อมูลเริ่มต้น: {df_merged.shape[0]} แถว")
     
-    # ✅ วิธีที่ดีที่สุด: รวมข้อมูลแทนการลบ duplicate
+    # ✅ รวมข้อมูล FRAME_STOCK ที่ซ้ำกันแทนการลบ duplicate
     print("🔄 รวมข้อมูล FRAME_STOCK ที่ซ้ำกัน...")
-    
-    # ตรวจสอบ duplicate ก่อน
-    duplicated_frames = df_merged[df_merged.duplicated(subset=['FRAME_STOCK'], keep=False)]
-    if not duplicated_frames.empty:
-        print(f"⚠️  พบ FRAME_STOCK ที่ซ้ำกัน: {duplicated_frames['FRAME_STOCK'].nunique()} ตัว")
-        duplicate_analysis = {}
-        for frame in duplicated_frames['FRAME_STOCK'].unique():
-            frame_data = duplicated_frames[duplicated_frames['FRAME_STOCK'] == frame]
-            time_values = frame_data['TIME/STRIP'].dropna().tolist()
-            duplicate_analysis[frame] = {
-                'count': len(frame_data),
-                'time_values': time_values,
-                'non_null_count': len(time_values)
-            }
-            print(f"   - {frame}: {len(frame_data)} แถว → TIME/STRIP: {time_values}")
-    
-    # ✅ รวมข้อมูลโดยใช้กลยุทธ์ที่ดีที่สุด
-    def smart_aggregation(group):
-        # สำหรับ TIME/STRIP: ใช้ค่าเฉลี่ยของค่าที่ไม่เป็น NaN
-        time_values = group['TIME/STRIP'].dropna()
-        if len(time_values) > 0:
-            time_result = time_values.mean()
-        else:
-            time_result = np.nan
-        
-        # สำหรับคอลัมน์อื่นๆ: ใช้ค่าแรกที่ไม่เป็น NaN
-        result = {}
-        for col in df_merged.columns:
-            if col == 'TIME/STRIP':
-                result[col] = time_result
-            elif col == 'FRAME_STOCK':
-                result[col] = group[col].iloc[0]  # ใช้ค่าเดิม
-            else:
-                # ใช้ค่าแรกที่ไม่เป็น NaN
-                non_null_values = group[col].dropna()
-                if len(non_null_values) > 0:
-                    result[col] = non_null_values.iloc[0]
-                else:
-                    result[col] = group[col].iloc[0]
-        
-        return pd.Series(result)
-    
-    # รวมข้อมูลตาม FRAME_STOCK
-    df_unique = df_merged.groupby('FRAME_STOCK').apply(smart_aggregation).reset_index(drop=True)
+    duplicated_count = df_merged.loc[df_merged['FRAME_STOCK'].duplicated(keep=False), 'FRAME_STOCK'].nunique()
+    if duplicated_count:
+        print(f"⚠️  พบ FRAME_STOCK ที่ซ้ำกัน: {duplicated_count} ตัว (ใช้ค่าเฉลี่ย TIME/STRIP)")
+    df_unique = _merge_duplicate_frame_stock(df_merged)
     
     print(f"📊 ข้อมูลหลังรวม: {df_unique.shape[0]} แถว")
     
-    # แสดงการเปลี่ยนแปลง TIME/STRIP
-    if not duplicated_frames.empty:
-        print("📊 การรวม TIME/STRIP สำหรับ FRAME_STOCK ที่ซ้ำ:")
-        for frame, info in duplicate_analysis.items():
-            if info['non_null_count'] > 1:
-                new_value = df_unique[df_unique['FRAME_STOCK'] == frame]['TIME/STRIP'].iloc[0]
-                if not pd.isna(new_value):
-                    print(f"   - {frame}: {info['time_values']} → {round(new_value, 2)} (เฉลี่ยจาก {info['non_null_count']} ค่า)")
-    
     # ✅ ติดตาม FRAME_STOCK ที่ไม่มีข้อมูล TIME/STRIP
     frames_without_time = df_unique[df_unique['TIME/STRIP'].isna()]['FRAME_STOCK'].tolist()
     if frames_without_time:
@@ -699,108 +986,12 @@ def group_and_average_across_frames_unique_frame(df_merged):
         if len(frames_without_time) > 5:
             print(f"   ... และอีก {len(frames_without_time) - 5} ตัว")
     
-    # ประมวลผลต่อไป...
-    group_avg_map = {}
-    group_before_map = {}
-    group_after_map = {}
-    total_groups = 0
-    processed_groups = 0
-    total_outliers_removed = 0
-    excluded_frames = []
-    excluded_reasons = []
-    
+    # สถิติต่อกลุ่ม แล้ว merge กลับครั้งเดียว
     print("🔍 วิเคราะห์กลุ่มข้อมูล...")
-    print("=" * 80)
-    
-    for group_key, group_df in df_unique.groupby(grouping_cols):
-        total_groups += 1
-        group_name = " | ".join([f"{col}={val}" for col, val in zip(grouping_cols, group_key)])
-        total_frames_in_group = len(group_df)
-        
-        # นับเฉพาะข้อมูลที่มีค่า TIME/STRIP
-        values = group_df['TIME/STRIP'].dropna().tolist()
-        frames_with_data = group_df[group_df['TIME/STRIP'].notna()]['FRAME_STOCK'].tolist()
-        frames_without_data = group_df[group_df['TIME/STRIP'].isna()]['FRAME_STOCK'].tolist()
-
-        # ✅ ใช้ len(values) เพื่อนับเฉพาะที่มีข้อมูล
-        group_before_map[group_key] = len(values)
-    
-        # บันทึก FRAME_STOCK ที่ไม่มีข้อมูล TIME/STRIP
-        for frame in frames_without_data:
-            excluded_frames.append(frame)
-            excluded_reasons.append(f"กลุ่ม: {group_name} | เหตุผล: ไม่มีข้อมูล TIME/STRIP")
-
-        # ✅ แก้ไข: ไม่ให้ Before_Outlier และ After_Outlier เป็น 0
-        if len(values) < 2:
-            print(f"❌ กลุ่ม: {group_name}")
-            print(f"   📊 Frame Stock ทั้งหมด: {total_frames_in_group} ตัว")
-            print(f"   📊 มีข้อมูล TIME/STRIP: {len(values)} ค่า")
-            print(f"   📋 FRAME_STOCK ที่มีข้อมูล: {frames_with_data}")
-            if frames_without_data:
-                print(f"   ❌ FRAME_STOCK ที่ไม่มีข้อมูล: {frames_without_data}")
-            
-            # กำหนดค่าเฉลี่ยแม้มีข้อมูลน้อย
-            if len(values) == 1:
-                group_avg_map[group_key] = values[0]
-                group_after_map[group_key] = 1  # ✅ ใช้ค่าเดียวที่มี
-                print(f"   ✅ ใช้ค่าเดียว: {values[0]}")
-            elif len(values) == 0:
-                group_avg_map[group_key] = np.nan
-                group_after_map[group_key] = np.nan  # ✅ เปลี่ยนจาก 0 เป็น NaN
-                print(f"   ⚠️  ไม่มีข้อมูล: ใช้ NaN")
-            else:
-                group_avg_map[group_key] = np.mean(values)
-                group_after_map[group_key] = len(values)  # ✅ ใช้จำนวนข้อมูลจริง
-                print(f"   ✅ ใช้ค่าเฉลี่ยโดยไม่กรอง: {np.mean(values)}")
-            
-            print(f"   📊 จำนวน: {len(values)}/{group_after_map[group_key]} (มีข้อมูล/หลังตัด)")
-            print()
-            
-        else:
-            # กรองข้อมูล outliers
-            q1 = np.percentile(values, 25)
-            q3 = np.percentile(values, 75)
-            iqr = q3 - q1
-            lower = q1 - 1.5 * iqr
-            upper = q3 + 1.5 * iqr
-            
-            filtered = [v for v in values if lower <= v <= upper]
-            outliers = [v for v in values if v < lower or v > upper]
-            
-            if filtered:
-                avg_val = round(np.mean(filtered), 2)
-                group_avg_map[group_key] = avg_val
-                group_after_map[group_key] = len(filtered)  # ✅ ใช้จำนวนข้อมูลที่เหลือหลังกรอง
-                processed_groups += 1
-                total_outliers_removed += len(outliers)
-                
-                print(f"✅ กลุ่ม: {group_name}")
-                print(f"   📊 Frame Stock ทั้งหมด: {total_frames_in_group} ตัว")
-                print(f"   📊 มีข้อมูล TIME/STRIP: {len(values)} ค่า")
-                print(f"   📈 ช่วงปกติ: {round(lower, 2)} - {round(upper, 2)}")
-                print(f"   ✅ ข้อมูลที่ใช้: {len(filtered)} ค่า → {filtered}")
-                
-                if outliers:
-                    print(f"   ❌ Outliers ที่ตัดออก: {len(outliers)} ค่า → {outliers}")
-                    print(f"   📊 เปอร์เซ็นต์ที่ตัด: {round(len(outliers)/len(values)*100, 1)}%")
-                else:
-                    print(f"   ✨ ไม่มี outliers")
-                
-                print(f"   🎯 ค่าเฉลี่ยสุดท้าย: {avg_val}")
-                print(f"   📊 จำนวน: {len(values)}/{len(filtered)} (มีข้อมูล/หลังตัด)")
-                print()
-            else:
-                print(f"⚠️  กลุ่ม: {group_name}")
-                print(f"   📊 Frame Stock ทั้งหมด: {total_frames_in_group} ตัว")
-                print(f"   📊 ข้อมูลทั้งหมด: {len(values)} ค่า → {values}")
-                print(f"   ❌ ทุกค่าเป็น outliers")
-                print(f"   📈 ช่วงปกติ: {round(lower, 2)} - {round(upper, 2)}")
-                
-                group_avg_map[group_key] = round(np.mean(values), 2)
-                group_after_map[group_key] = len(values)  # ✅ เปลี่ยนจาก 0 เป็น len(values) เพราะใช้ค่าเฉลี่ยดิบ
-                print(f"   ⚠️  ใช้ค่าเฉลี่ยดิบ: {round(np.mean(values), 2)}")
-                print(f"   📊 จำนวน: {len(values)}/{len(values)} (มีข้อมูล/หลังตัด)")
-                print()
+    stats = _group_time_strip_stats(df_unique, grouping_cols)
+    total_groups = df_unique.groupby(grouping_cols).ngroups
+    processed_groups = int(stats['_processed'].sum())
+    total_outliers_removed = int(stats['_outliers'].sum())
 
     # แสดงสรุป
     print("=" * 80)
@@ -809,108 +1000,40 @@ def group_and_average_across_frames_unique_frame(df_merged):
     print(f"   ✅ กลุ่มที่ประมวลผลได้: {processed_groups} กลุ่ม")
     print(f"   ❌ กลุ่มที่ข้ามไป: {total_groups - processed_groups} กลุ่ม")
     print(f"   🗑️  Outliers ที่ตัดออกทั้งหมด: {total_outliers_removed} ค่า")
-    print(f"   📊 อัตราสำเร็จ: {round(processed_groups/total_groups*100, 1)}%")
+    if total_groups:
+        print(f"   📊 อัตราสำเร็จ: {round(processed_groups/total_groups*100, 1)}%")
     
-    # แสดงรายงาน FRAME_STOCK ที่ไม่ถูกนำมาคิด
-    if excluded_frames:
-        print(f"\n❌ FRAME_STOCK ที่ไม่ถูกนำมาคิด: {len(excluded_frames)} ตัว")
+    # แสดงรายงาน FRAME_STOCK ที่ไม่ถูกนำมาคิด (อยู่ในกลุ่มแต่ไม่มี TIME/STRIP)
+    in_group = df_unique[grouping_cols].notna().all(axis=1)
+    excluded = df_unique[in_group & df_unique['TIME/STRIP'].isna()]
+    if not excluded.empty:
+        print(f"\n❌ FRAME_STOCK ที่ไม่ถูกนำมาคิด: {len(excluded)} ตัว (ไม่มีข้อมูล TIME/STRIP)")
         print("=" * 80)
-        for i, (frame, reason) in enumerate(zip(excluded_frames, excluded_reasons), 1):
-            print(f"   {i:2d}. {frame} → {reason}")
+        for i, frame in enumerate(excluded['FRAME_STOCK'], 1):
+            print(f"   {i:2d}. {frame}")
         print("=" * 80)
     else:
         print(f"\n✅ FRAME_STOCK ทุกตัวถูกนำมาคิดแล้ว")
-    
-    # ฟังก์ชันสำหรับ apply
-    def assign_before_count(row):
-        key = tuple(row[col] for col in grouping_cols)
-        count = group_before_map.get(key, np.nan)
-        # ✅ ไม่ให้เป็น 0 - ใช้ NaN แทน
-        return count if pd.notna(count) and count > 0 else np.nan
-
-    def assign_after_count(row):
-        key = tuple(row[col] for col in grouping_cols)
-        count = group_after_map.get(key, np.nan)
-        # ✅ ไม่ให้เป็น 0 - ใช้ NaN แทน
-        return count if pd.notna(count) and count > 0 else np.nan
-
-    def assign_avg(row):
-        key = tuple(row[col] for col in grouping_cols)
-        original_value = row['TIME/STRIP']
-        new_value = group_avg_map.get(key, original_value)
-        
-        if pd.notna(original_value) and pd.notna(new_value) and abs(original_value - new_value) > 0.01:
-            change_type = "📈" if new_value > original_value else "📉"
-            diff = abs(new_value - original_value)
-            before_count = group_before_map.get(key, np.nan)
-            after_count = group_after_map.get(key, np.nan)
-            print(f"   {change_type} {row['FRAME_STOCK']}: {original_value} → {new_value} (เปลี่ยน {round(diff, 2)}) [{before_count}/{after_count}]")
-            
-        return new_value
 
     print("🔄 กำลังอัปเดตค่า TIME/STRIP...")
-    df_unique['TIME/STRIP'] = df_unique.apply(assign_avg, axis=1)
-
+    df_result = df_unique.merge(
+        stats.drop(columns=['_outliers', '_processed']), on=grouping_cols, how='left'
+    )
+    matched = df_result['Before_Outlier'].notna()
+    df_result['TIME/STRIP'] = df_result['_avg'].where(matched, df_result['TIME/STRIP'])
+    df_result = df_result.drop(columns=['_avg'])
     print("📊 เพิ่มคอลัมน์จำนวนข้อมูลก่อนและหลังตัด...")
-    df_unique['Before_Outlier'] = df_unique.apply(assign_before_count, axis=1)
-    df_unique['After_Outlier'] = df_unique.apply(assign_after_count, axis=1)
+    for col in ['Before_Outlier', 'After_Outlier']:
+        counts = df_result[col].astype(float)
+        df_result[col] = counts.astype(int) if counts.notna().all() else counts
 
     print("✅ เสร็จสิ้นการจัดกลุ่มและคำนวณค่าเฉลี่ย")
-    return df_unique
+    return df_result
 
-def LOGVIEW(input_path, output_dir):
+def export_summary(summary_df, output_dir):
     """
-    ฟังก์ชันหลักสำหรับประมวลผลไฟล์ LOGVIEW
+    ขั้นตอนที่ 3-4: map summary (long หรือ wide) กับไฟล์ package แล้วบันทึก Summary_<timestamp>.csv
     """
-    print(f"🚀 เริ่มประมวลผล LOGVIEW")
-    print(f"📁 Input: {input_path}")
-    print(f"📁 Output: {output_dir}")
-    
-    # 1. ประมวลผลไฟล์ input และเก็บชื่อไฟล์ .xlsx ที่สร้างใหม่
-    print("📊 ขั้นตอนที่ 1: ประมวลผลไฟล์ input...")
-    before_files = set(f for f in os.listdir(output_dir) if f.lower().endswith('.xlsx'))
-    
-    with tempfile.TemporaryDirectory() as temp_dir:
-        # ประมวลผลในไฟล์ชั่วคราว
-        process_multiple_files_complete(input_path, temp_dir)
-        # หาไฟล์ใหม่ที่สร้างขึ้น
-        temp_files = set(f for f in os.listdir(temp_dir) if f.lower().endswith('.xlsx'))
-        
-        if not temp_files:
-            print(" ไม่พบไฟล์ .xlsx ใหม่")
-            return
-
-        print(f" สร้างไฟล์ใหม่ {len(temp_files)} ไฟล์")
-        
-        # คัดลอกไฟล์จาก temp_dir ไปยัง output_dir
-        import shutil
-        new_files = []
-        for filename in temp_files:
-            src = os.path.join(temp_dir, filename)
-            dst = os.path.join(output_dir, filename)
-            shutil.copy2(src, dst)
-            new_files.append(filename)
-            print(f"   ✅ คัดลอก: {filename}")
-    
-    # ตรวจสอบไฟล์ที่คัดลอกมาแล้ว
-    if not new_files:
-        print(" ไม่สามารถคัดลอกไฟล์ได้")
-        return
-
-    # 2. สร้าง summary DataFrame
-    print("📊 ขั้นตอนที่ 2: สร้าง summary...")
-    try:
-        summary_df = summarize_sec_strip(output_dir, new_files)
-        print(f"   ✅ ข้อมูล summary: {summary_df.shape}")
-        
-        if summary_df.empty:
-            print("   ❌ Summary DataFrame ว่างเปล่า")
-            return
-            
-    except Exception as e:
-        print(f"   ❌ เกิดข้อผิดพลาดในการสร้าง summary: {str(e)}")
-        return
-    
     # 3. ตรวจสอบไฟล์ package
     print("📊 ขั้นตอนที่ 3: ตรวจสอบไฟล์ package...")
     package_path = os.path.join(BASE_DIR, "..", "data_MAP", "export package and frame stock Rev.06.xlsx")
@@ -948,7 +1071,60 @@ def LOGVIEW(input_path, output_dir):
         print(f"   ❌ เกิดข้อผิดพลาดในการสร้าง CSV: {str(e)}")
         return None
 
+def LOGVIEW(input_path, output_dir, workers=None, export_per_file=False, use_cache=True, cache_dir=None):
+    """
+    ฟังก์ชันหลักสำหรับประมวลผลไฟล์ LOGVIEW
+    workers: จำนวน process สำหรับประมวลผลหลายไฟล์พร้อมกัน (None = DEFAULT_WORKERS, 1 = ทีละไฟล์)
+    export_per_file: บันทึกไฟล์ Excel รายไฟล์ลง output_dir ด้วย (ผลลัพธ์เสริม ไม่จำเป็นต่อ summary)
+    use_cache / cache_dir: ข้ามไฟล์ที่เคยวิเคราะห์แล้ว (ค่าเริ่มต้น cache อยู่ที่ output_dir/.logview_cache)
+    """
+    print(f"🚀 เริ่มประมวลผล LOGVIEW")
+    print(f"📁 Input: {input_path}")
+    print(f"📁 Output: {output_dir}")
+    
+    # 1. วิเคราะห์ไฟล์ input และเก็บ frame / speed / sec/strip ของแต่ละไฟล์ไว้ในหน่วยความจำ
+    print("📊 ขั้นตอนที่ 1: ประมวลผลไฟล์ input...")
+    files = find_input_files(input_path)
+    if not files:
+        print(f" ไม่พบไฟล์ที่ตรงกับ pattern: {input_path}")
+        return
+    export_dir = output_dir if export_per_file else None
+    if use_cache and cache_dir is None:
+        cache_dir = os.path.join(output_dir, CACHE_DIR_NAME)
+    elif not use_cache:
+        cache_dir = None
+    results = run_files(files, summarize_single_file, export_dir, cache_dir, workers=workers)
+    if cache_dir:
+        removed = evict_cache(cache_dir)
+        if removed:
+            print(f" 🧹 ลบ cache เก่า {removed} ไฟล์")
 
+    frames = {}
+    for file_path, success, message, *rest in results:
+        sec_strip = rest[0] if rest else None
+        if not success or sec_strip is None or sec_strip.empty:
+            continue
+        file_key = Path(file_path).stem
+        while file_key in frames:
+            file_key += "_"
+        frames[file_key] = sec_strip
 
+    if not frames:
+        print(" ไม่มีข้อมูล sec/strip จากไฟล์ใดเลย")
+        return
 
-
+    # 2. สร้าง summary DataFrame
+    print("📊 ขั้นตอนที่ 2: สร้าง summary...")
+    try:
+        summary_df = summarize_sec_strip_long(frames)
+        print(f"   ✅ ข้อมูล summary: {summary_df.shape}")
+        
+        if summary_df.empty:
+            print("   ❌ Summary DataFrame ว่างเปล่า")
+            return
+            
+    except Exception as e:
+        print(f"   ❌ เกิดข้อผิดพลาดในการสร้าง summary: {str(e)}")
+        return
+    
+    return export_summary(summary_df, output_dir)
@@ -0,0 +1,261 @@
+import io
+import os
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import warnings
+import functools
+import contextlib
+import tracemalloc
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+try:
+    from functions import logview
+except ImportError:
+    import logview
+
+
+# ================================================================
+# LOGVIEW_BENCHMARK
+# สร้างไฟล์ log Singulation จำลองตามจำนวนบรรทัดที่กำหนด แล้ววัดเวลา / rows ต่อวินาที /
+# หน่วยความจำสูงสุด ของแต่ละขั้นตอนใน LOGVIEW (ใช้ตรวจ regression เมื่อแก้โค้ด)
+#   python -m functions.logview_benchmark --sizes 10k,1M,10M
+# ================================================================
+
+FRAME_PREFIXES = ['FU', 'FR', 'FA', 'FW', 'FN', 'FJ', 'F1', 'F3', 'F5', 'F9']
+PACKAGE_GROUPS = ['SLP', 'QFN', 'DFN']
+SPEEDS = [1270, 762, 1016, 508]
+DEFAULT_SIZES = "10k,1M,10M"
+
+# ขั้นตอน -> ฟังก์ชันใน logview ที่นับเวลาเข้าขั้นตอนนั้น
+STAGES = {
+    'parse': ['load_and_parse_file'],
+    'extract_pro_speed': ['extract_pro_and_speed'],
+    'mark_errors': ['mark_errors'],
+    'layout': ['insert_blank_rows', 'calculate_time_diff', 'assign_subgroups_and_insert_empty_rows'],
+    'outliers': ['compute_frame_statistics'],
+    'summary': ['summarize_by_frame', 'sec_strip_by_frame', 'summarize_sec_strip_long'],
+    'csv_export': ['export_summary'],
+}
+
+
+def parse_size(text):
+    """
+    แปลงขนาดแบบ '10k', '1M', '2.5M' เป็นจำนวนบรรทัด
+    """
+    text = text.strip().lower()
+    multiplier = {'k': 1_000, 'm': 1_000_000}.get(text[-1:], 1)
+    number = text[:-1] if multiplier > 1 else text
+    return int(float(number) * multiplier)
+
+
+def make_frames(n_frames, seed=0):
+    r = random.Random(seed)
+    chars = 'ABCDEFGHJKLMNPQRSTUVWXYZ0123456789'
+    return sorted({r.choice(FRAME_PREFIXES) + ''.join(r.choice(chars) for _ in range(4)) for _ in range(n_frames)})
+
+
+def generate_log(path, n_lines, seed=0, n_frames=20, error_rate=0.03):
+    """
+    เขียนไฟล์ log จำลองประมาณ n_lines บรรทัด (เรียงจากใหม่ไปเก่าเหมือน log จริงของเครื่อง)
+    แต่ละ lot มี CUC (speed), PRO (frame + strip counter) และ ERR/DMC/STAT แทรกเป็นระยะ
+    คืนจำนวนบรรทัดที่เขียนจริง
+    """
+    r = random.Random(seed)
+    frames = make_frames(n_frames, seed)
+    t = datetime(2024, 1, 1, 6, 0, 0) + timedelta(seconds=n_lines * 40)
+    written = 0
+    buffer = []
+    with open(path, 'w', encoding='latin-1') as file:
+        while written + len(buffer) < n_lines:
+            frame = r.choice(frames) + r.choice(['', 'AB', '-X'])
+            prefix = r.choice(['', 'PKG_', 'xx'])
+            speed = r.choice(SPEEDS)
+            # เขียนจากท้าย lot ย้อนกลับ: strip counter ลดลง เวลาย้อนหลัง
+            for strip in range(r.randint(3, 30), 0, -1):
+                stamp = t.strftime('%Y/%m/%d %I:%M:%S') + ('AM' if t.hour < 12 else 'PM')
+                if r.random() < 0.05:
+                    buffer.append(f"{stamp}\tSTAT\t9")
+                if r.random() < error_rate:
+                    buffer.append(f"{stamp}\t{r.choice(logview.ERROR_STEPS)}\t1,2,3")
+                buffer.append(f"{stamp}\tPRO\t{prefix}{frame},G,{strip},{r.randint(1, 99)}")
+                if r.random() < 0.8:
+                    buffer.append(f"{stamp}\tCUC\t1,2,3,4,5,6,7,{speed}")
+                t -= timedelta(seconds=r.randint(40, 60) if r.random() < 0.95 else r.randint(200, 400))
+            if r.random() < 0.02:
+                t -= timedelta(days=1)
+            if len(buffer) >= 100_000:
+                file.write('\n'.join(buffer) + '\n')
+                written += len(buffer)
+                buffer = []
+        if buffer:
+            file.write('\n'.join(buffer) + '\n')
+            written += len(buffer)
+    return written
+
+
+def write_package_file(path, frames):
+    """
+    ไฟล์ package จำลอง (sheet 'Export Worksheet') สำหรับ frame ที่ใช้ใน log
+    """
+    r = random.Random(len(frames))
+    df = pd.DataFrame({
+        'FRAME_STOCK': frames,
+        'PACKAGE_CODE': [f"P{frame}" for frame in frames],
+        'Package size ': [r.choice(['2x2', '3x3', '5x5']) for _ in frames],
+        'Package group': [r.choice(PACKAGE_GROUPS) for _ in frames],
+        'Frame type ': 'Copper',
+        'Unit/strip': 100,
+    })
+    df.to_excel(path, sheet_name='Export Worksheet', index=False)
+
+
+class StageRecorder:
+    """
+    ครอบฟังก์ชันใน logview ชั่วคราวเพื่อจับเวลา (และหน่วยความจำสูงสุดเมื่อเปิด tracemalloc) ต่อขั้นตอน
+    """
+
+    def __init__(self, track_memory=False):
+        self.track_memory = track_memory
+        self.seconds = {stage: 0.0 for stage in STAGES}
+        self.peak_bytes = {stage: 0 for stage in STAGES}
+        self._originals = {}
+        self._depth = 0
+
+    def _wrap(self, stage, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if self._depth:
+                return func(*args, **kwargs)
+            self._depth += 1
+            if self.track_memory:
+                tracemalloc.reset_peak()
+                base, _ = tracemalloc.get_traced_memory()
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.seconds[stage] += time.perf_counter() - start
+                if self.track_memory:
+                    _, peak = tracemalloc.get_traced_memory()
+                    self.peak_bytes[stage] = max(self.peak_bytes[stage], peak - base)
+                self._depth -= 1
+        return wrapper
+
+    def __enter__(self):
+        for stage, names in STAGES.items():
+            for name in names:
+                self._originals[name] = getattr(logview, name)
+                setattr(logview, name, self._wrap(stage, self._originals[name]))
+        return self
+
+    def __exit__(self, *exc):
+        for name, func in self._originals.items():
+            setattr(logview, name, func)
+        self._originals = {}
+
+
+def run_pipeline(log_path, output_dir):
+    """
+    รันขั้นตอนเดียวกับ LOGVIEW สำหรับไฟล์เดียว (ไม่ใช้ cache, ปิดข้อความ log ของ pipeline) คืนเวลารวม
+    """
+    with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        start = time.perf_counter()
+        success, message, sec_strip, _ = logview.summarize_single_file(log_path)
+        if not success:
+            raise RuntimeError(message)
+        summary_df = logview.summarize_sec_strip_long({'bench': sec_strip})
+        output_csv = logview.export_summary(summary_df, output_dir)
+        elapsed = time.perf_counter() - start
+    if output_csv is None:
+        raise RuntimeError("สร้าง Summary CSV ไม่สำเร็จ")
+    return elapsed
+
+
+def benchmark_size(n_lines, work_dir, track_memory=True, seed=0):
+    """
+    สร้าง log ขนาด n_lines แล้ววัดผลแต่ละขั้นตอน คืน DataFrame หนึ่งแถวต่อขั้นตอน
+    """
+    log_path = os.path.join(work_dir, f"bench_{n_lines}.txt")
+    lines = generate_log(log_path, n_lines, seed=seed)
+    output_dir = os.path.join(work_dir, f"out_{n_lines}")
+    os.makedirs(output_dir, exist_ok=True)
+
+    with StageRecorder() as recorder:
+        total = run_pipeline(log_path, output_dir)
+    seconds = dict(recorder.seconds)
+
+    peaks = {}
+    if track_memory:
+        # วัดหน่วยความจำแยกอีกรอบ เพราะ tracemalloc ทำให้เวลาช้าลง
+        tracemalloc.start()
+        try:
+            with StageRecorder(track_memory=True) as recorder:
+                run_pipeline(log_path, output_dir)
+        finally:
+            tracemalloc.stop()
+        peaks = recorder.peak_bytes
+    os.remove(log_path)
+
+    rows = []
+    for stage in list(STAGES) + ['other', 'total']:
+        if stage == 'total':
+            elapsed = total
+        elif stage == 'other':
+            elapsed = max(total - sum(seconds.values()), 0.0)
+        else:
+            elapsed = seconds[stage]
+        rows.append({
+            'lines': lines,
+            'stage': stage,
+            'seconds': round(elapsed, 4),
+            'rows/sec': round(lines / elapsed) if elapsed > 0 else None,
+            'peak_MB': round(peaks[stage] / 1024 / 1024, 1) if stage in peaks else None,
+        })
+    return pd.DataFrame(rows)
+
+
+def run_benchmark(sizes=DEFAULT_SIZES, track_memory=True, output_csv=None, seed=0):
+    """
+    วัดผลทุกขนาดใน sizes (เช่น '10k,1M,10M') แสดงตารางและบันทึก CSV ถ้าระบุ output_csv
+    """
+    work_dir = tempfile.mkdtemp(prefix="logview_bench_")
+    original_base_dir = logview.BASE_DIR
+    try:
+        # export_summary อ่านไฟล์ package จาก BASE_DIR/../data_MAP
+        logview.BASE_DIR = os.path.join(work_dir, "functions")
+        os.makedirs(os.path.join(work_dir, "data_MAP"), exist_ok=True)
+        write_package_file(
+            os.path.join(work_dir, "data_MAP", "export package and frame stock Rev.06.xlsx"),
+            make_frames(20, seed),
+        )
+        results = []
+        for size in str(sizes).split(','):
+            n_lines = parse_size(size)
+            print(f"⏱️  วัดผล {n_lines:,} บรรทัด...")
+            result = benchmark_size(n_lines, work_dir, track_memory=track_memory, seed=seed)
+            print(result.to_string(index=False))
+            results.append(result)
+    finally:
+        logview.BASE_DIR = original_base_dir
+        shutil.rmtree(work_dir, ignore_errors=True)
+    report = pd.concat(results, ignore_index=True)
+    if output_csv:
+        report.to_csv(output_csv, index=False)
+        print(f"✅ บันทึกผลที่: {output_csv}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="วัดประสิทธิภาพแต่ละขั้นตอนของ LOGVIEW ด้วย log จำลอง")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="จำนวนบรรทัดคั่นด้วย comma เช่น 10k,1M,10M")
+    parser.add_argument("--no-memory", action="store_true", help="ไม่วัดหน่วยความจำ (เร็วขึ้น)")
+    parser.add_argument("--output", default=None, help="บันทึกผลเป็นไฟล์ CSV")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run_benchmark(args.sizes, track_memory=not args.no_memory, output_csv=args.output, seed=args.seed)
@@ -0,0 +1,184 @@
+import os
+import sqlite3
+from pathlib import Path
+from datetime import datetime
+
+import pandas as pd
+
+try:
+    from functions import logview
+except ImportError:
+    import logview
+
+
+# ================================================================
+# LOGVIEW_HISTORY
+# คลังประวัติ sec/strip แบบ append-only (SQLite) หนึ่งแถวต่อ ไฟล์ / frame / speed
+# -> index ตาม frame+speed, machine และวันที่ของ log
+# -> รันใหม่จะเพิ่มเฉพาะไฟล์ที่ยังไม่เคยบันทึก (ตรวจด้วย hash เนื้อหาไฟล์)
+# -> สร้างตาราง FRAME_STOCK x SPEED (IPS) จากประวัติทั้งหมดด้วย query เดียว
+# ================================================================
+
+HISTORY_DB_NAME = "logview_history.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS log_files (
+    file_hash   TEXT PRIMARY KEY,
+    file_name   TEXT NOT NULL,
+    machine     TEXT,
+    inserted_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sec_strip_history (
+    id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    file_hash  TEXT NOT NULL REFERENCES log_files(file_hash),
+    machine    TEXT,
+    log_date   TEXT,
+    frame      TEXT NOT NULL,
+    speed      REAL NOT NULL,
+    sec_strip  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_history_frame_speed ON sec_strip_history (frame, speed);
+CREATE INDEX IF NOT EXISTS idx_history_machine ON sec_strip_history (machine);
+CREATE INDEX IF NOT EXISTS idx_history_date ON sec_strip_history (log_date);
+CREATE INDEX IF NOT EXISTS idx_history_file ON sec_strip_history (file_hash);
+"""
+
+
+def machine_from_path(file_path):
+    """
+    ชื่อเครื่องจากชื่อไฟล์ log: ส่วนแรกก่อน '_' (เช่น 'SAW01_20231201.txt' -> 'SAW01')
+    """
+    return Path(file_path).stem.split('_')[0]
+
+
+class SecStripHistory:
+    """
+    คลังประวัติ sec/strip ต่อ ไฟล์ / frame / speed
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def known_hashes(self):
+        with self._connect() as conn:
+            return {row[0] for row in conn.execute("SELECT file_hash FROM log_files")}
+
+    def add_file(self, file_hash, file_path, sec_strip, machine=None):
+        """
+        บันทึกผลของไฟล์หนึ่งไฟล์ (ค่าเฉลี่ย sec/strip ต่อ frame/speed) คืน False ถ้าเคยบันทึกแล้ว
+        """
+        machine = machine or machine_from_path(file_path)
+        df = sec_strip[['frame', 'speed', 'sec/strip']].copy()
+        if 'date' in sec_strip.columns:
+            df['log_date'] = pd.to_datetime(sec_strip['date'], errors='coerce')
+        else:
+            df['log_date'] = pd.NaT
+        rows = df.groupby(['frame', 'speed'], sort=True).agg(
+            sec_strip=('sec/strip', 'mean'),
+            log_date=('log_date', 'min'),
+        ).reset_index()
+        rows['log_date'] = rows['log_date'].dt.strftime('%Y-%m-%d').astype(object)
+        rows.loc[rows['log_date'].isna(), 'log_date'] = None
+        with self._connect() as conn:
+            inserted = conn.execute(
+                "INSERT OR IGNORE INTO log_files (file_hash, file_name, machine, inserted_at) VALUES (?, ?, ?, ?)",
+                (file_hash, os.path.basename(file_path), machine, datetime.now().isoformat(timespec='seconds')),
+            ).rowcount
+            if not inserted:
+                return False
+            conn.executemany(
+                "INSERT INTO sec_strip_history (file_hash, machine, log_date, frame, speed, sec_strip) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (file_hash, machine, log_date, frame, float(speed), float(value))
+                    for frame, speed, value, log_date in rows[['frame', 'speed', 'sec_strip', 'log_date']].itertuples(index=False)
+                ],
+            )
+        return True
+
+    def load_long(self, start_date=None, end_date=None, machines=None, frames=None):
+        """
+        ดึงประวัติเป็น long format (FRAME_STOCK, frame, speed, file, sec/strip) สำหรับ analyze_and_export_csv_from_df
+        กรองตามช่วงวันที่ (YYYY-MM-DD), เครื่อง และ frame ผ่าน index
+        """
+        conditions, params = [], []
+        if start_date:
+            conditions.append("log_date >= ?")
+            params.append(pd.Timestamp(start_date).strftime('%Y-%m-%d'))
+        if end_date:
+            conditions.append("log_date <= ?")
+            params.append(pd.Timestamp(end_date).strftime('%Y-%m-%d'))
+        for column, values in (('machine', machines), ('frame', frames)):
+            if values:
+                conditions.append(f"{column} IN ({','.join('?' * len(values))})")
+                params.extend(values)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        query = (
+            "SELECT frame, speed, file_hash AS file, sec_strip AS \"sec/strip\" "
+            f"FROM sec_strip_history {where} ORDER BY frame, speed, id"
+        )
+        with self._connect() as conn:
+            df = pd.read_sql_query(query, conn, params=params)
+        df.insert(0, 'FRAME_STOCK', df['frame'] + '_speed' + df['speed'].astype(str))
+        return df.sort_values('FRAME_STOCK', kind='stable').reset_index(drop=True)
+
+
+def ingest_files(history, files, workers=None, cache_dir=None):
+    """
+    วิเคราะห์และบันทึกเฉพาะไฟล์ที่ยังไม่อยู่ในคลัง (เทียบ hash เนื้อหาไฟล์) คืนจำนวนไฟล์ที่เพิ่มใหม่
+    """
+    known = history.known_hashes()
+    new_files = []
+    for file_path in files:
+        try:
+            file_hash = logview.file_content_hash(file_path)
+        except OSError as e:
+            print(f"⚠️  อ่านไฟล์ไม่ได้ {file_path}: {e}")
+            continue
+        if file_hash in known:
+            print(f" ⏭️  มีในคลังแล้ว: {file_path}")
+            continue
+        known.add(file_hash)
+        new_files.append(file_path)
+    if not new_files:
+        return 0
+    results = logview.run_files(new_files, logview.summarize_single_file, None, cache_dir, True, workers=workers)
+    added = 0
+    for file_path, success, message, *rest in results:
+        sec_strip = rest[0] if rest else None
+        file_hash = rest[1] if len(rest) > 1 else None
+        if not success or sec_strip is None or sec_strip.empty or not file_hash:
+            continue
+        if history.add_file(file_hash, file_path, sec_strip):
+            added += 1
+    return added
+
+
+def LOGVIEW_HISTORY(input_path, output_dir, start_date=None, end_date=None, workers=None, history_db=None):
+    """
+    เพิ่มไฟล์ log ที่เลือกเข้าคลังประวัติ (เฉพาะไฟล์ใหม่) แล้วสร้าง Summary CSV จากประวัติทั้งหมด
+    start_date / end_date: กรองประวัติตามวันที่ของ log (YYYY-MM-DD)
+    history_db: ไฟล์คลังประวัติ (ค่าเริ่มต้น output_dir/logview_history.sqlite)
+    """
+    print(f"🚀 เริ่มประมวลผล LOGVIEW_HISTORY")
+    history = SecStripHistory(history_db or os.path.join(output_dir, HISTORY_DB_NAME))
+    print(f"📁 History: {history.db_path}")
+
+    print("📊 ขั้นตอนที่ 1: เพิ่มไฟล์ใหม่เข้าคลังประวัติ...")
+    files = logview.find_input_files(input_path) if input_path else []
+    added = ingest_files(history, files, workers=workers) if files else 0
+    print(f"   ✅ เพิ่มไฟล์ใหม่ {added} ไฟล์")
+
+    print("📊 ขั้นตอนที่ 2: ดึง summary จากคลังประวัติ...")
+    summary_df = history.load_long(start_date=start_date, end_date=end_date)
+    print(f"   ✅ ข้อมูล summary: {summary_df.shape}")
+    if summary_df.empty:
+        print("   ❌ ไม่มีข้อมูลในคลังประวัติตามเงื่อนไข")
+        return None
+    return logview.export_summary(summary_df, output_dir)
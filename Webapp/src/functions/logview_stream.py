@@ -0,0 +1,327 @@
+import os
+import io
+import json
+import time
+import argparse
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+import numpy as np
+import pandas as pd
+
+try:
+    from functions.logview import find_input_files, load_and_parse_file, ERROR_STEPS, _round_speed
+except ImportError:
+    from logview import find_input_files, load_and_parse_file, ERROR_STEPS, _round_speed
+
+
+# ================================================================
+# LOGVIEW_STREAM
+# ติดตามไฟล์ log ของเครื่อง Singulation ที่ยังเขียนต่ออยู่ (tail-follow)
+# -> จำ byte offset ต่อไฟล์ อ่านเฉพาะบรรทัดที่เพิ่มเข้ามาใหม่
+# -> เก็บสถานะต่อไฟล์ (PRO ล่าสุด, PRO ที่รอ speed จาก CUC, subgroup) และ
+#    ค่าเฉลี่ย sec/strip ต่อ frame/speed แบบสะสมของไฟล์นั้น (ไม่ต้องประมวลผลทั้งไฟล์ใหม่)
+# -> Stream_Summary.csv รวมเฉพาะไฟล์ที่ส่งมาในรอบนั้น (ไฟล์สถานะใช้ร่วมกันได้หลายชุดไฟล์)
+# ใช้ได้ทั้งจากหน้าเว็บ (เรียกแต่ละครั้ง = อัปเดตหนึ่งรอบ) และรันค้างไว้:
+#   python -m functions.logview_stream <ไฟล์/โฟลเดอร์ log> <output_dir> --interval 10
+# ================================================================
+
+STATE_FILE_NAME = ".logview_stream_state.json"
+MAX_STRIP_SECONDS = 86400
+MIN_DIFF_SECONDS = 90
+ZSCORE_THRESHOLD = 2
+MIN_GOOD_VALUES = 5
+
+
+# ล็อกไฟล์สถานะภายใน process (เว็บรันแบบ threaded) ต่อ path
+_state_locks = {}
+_state_locks_guard = threading.Lock()
+
+
+@contextmanager
+def state_lock(state_path):
+    """
+    ล็อกไฟล์สถานะตลอดช่วง load -> update -> save (ไฟล์สถานะใช้ร่วมกันทุกผู้ใช้)
+    threading.Lock ต่อ path สำหรับหลาย request ใน process เดียว + lock file (.lock) สำหรับหลาย process
+    """
+    path = os.path.abspath(state_path)
+    with _state_locks_guard:
+        lock = _state_locks.setdefault(path, threading.Lock())
+    with lock:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(f"{path}.lock", 'a+b') as handle:
+            if fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+            else:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+                else:
+                    handle.seek(0)
+                    msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _new_file_state():
+    return {
+        'offset': 0,
+        'last_pro': None,      # PRO ล่าสุดที่ยังไม่รู้เวลา strip (รอ PRO ถัดไป)
+        'pending': [],         # strip ที่รู้เวลาแล้ว แต่รอ speed หรือรอให้ subgroup ปิด
+        'subgroup_id': 0,
+        'subgroups': {},       # subgroup_id -> {'has_first_strip': bool, 'closed': bool}
+        'frames': {},          # 'frame|speed' -> ค่าสะสม (count, mean, m2, outliers) ของไฟล์นี้
+    }
+
+
+class LogStream:
+    """
+    สถานะการติดตามไฟล์ log หลายไฟล์ และค่าเฉลี่ย sec/strip สะสมต่อ (frame, speed) แยกตามไฟล์
+
+    ค่า outlier ใช้เกณฑ์ z-score แบบสะสม (เทียบกับค่าเฉลี่ย/ส่วนเบี่ยงเบนที่มีอยู่ขณะนั้น)
+    จึงเป็นค่าประมาณของ detect_outliers_combined ในโหมดประมวลผลทั้งไฟล์
+    """
+
+    def __init__(self, state_path):
+        self.state_path = state_path
+        self.files = {}
+        self.load()
+
+    # ---------- สถานะ ----------
+
+    def load(self):
+        if not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as file:
+                state = json.load(file)
+        except (OSError, ValueError) as e:
+            print(f"⚠️  อ่านสถานะ stream ไม่ได้ เริ่มใหม่: {e}")
+            return
+        self.files = state.get('files', {})
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.state_path)), exist_ok=True)
+        temp_path = f"{self.state_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump({'files': self.files}, file)
+        os.replace(temp_path, self.state_path)
+
+    # ---------- อ่านข้อมูลใหม่ ----------
+
+    def update(self, files):
+        """
+        อ่านเฉพาะข้อมูลที่เพิ่มเข้ามาในแต่ละไฟล์ตั้งแต่ครั้งก่อน แล้วบันทึกสถานะ
+        คืนจำนวนบรรทัดใหม่ที่อ่านได้
+        """
+        new_lines = 0
+        for file_path in files:
+            try:
+                new_lines += self._update_file(os.path.abspath(file_path))
+            except OSError as e:
+                print(f"⚠️  อ่านไฟล์ไม่ได้ {file_path}: {e}")
+        self.save()
+        return new_lines
+
+    def _update_file(self, file_path):
+        state = self.files.get(file_path)
+        size = os.path.getsize(file_path)
+        if state is None or size < state['offset'] or 'frames' not in state:
+            # ไฟล์ใหม่, ไฟล์ถูกเขียนทับ/หมุนเวียน หรือสถานะรูปแบบเก่า (ไม่มีค่าสะสมต่อไฟล์) -> เริ่มอ่านใหม่ตั้งแต่ต้น
+            state = _new_file_state()
+            self.files[file_path] = state
+        if size == state['offset']:
+            return 0
+        with open(file_path, 'rb') as file:
+            file.seek(state['offset'])
+            data = file.read(size - state['offset'])
+        # ประมวลผลเฉพาะบรรทัดที่จบแล้ว บรรทัดที่ยังเขียนไม่เสร็จรออ่านรอบหน้า
+        end = data.rfind(b'\n') + 1
+        if end == 0:
+            return 0
+        state['offset'] += end
+        chunk = data[:end].decode('latin-1')
+        df = load_and_parse_file(io.StringIO(chunk))
+        if not df.empty:
+            self._consume(state, df)
+        return chunk.count('\n')
+
+    def _consume(self, state, df):
+        steps = df['step'].astype(str).to_numpy()
+        relevant = (steps == 'PRO') | (steps == 'CUC') | np.isin(steps, ERROR_STEPS)
+        df = df[relevant]
+        timestamps = pd.to_datetime(df['date'] + ' ' + df['time'], errors='coerce')
+        for row, timestamp in zip(df.itertuples(index=False), timestamps):
+            if row.step == 'PRO':
+                time_ns = None if pd.isna(timestamp) else int(timestamp.value)
+                self._on_pro(state, row.frame, row.No_strip, time_ns)
+            elif row.step == 'CUC':
+                self._on_cuc(state, row.value_5)
+            elif state['last_pro'] is not None:
+                state['last_pro']['mc'] = True
+        self._flush(state)
+
+    # ---------- เหตุการณ์ใน log ----------
+
+    def _on_pro(self, state, frame, strip, time_ns):
+        strip = None if pd.isna(strip) else float(strip)
+        last = state['last_pro']
+        if last is not None:
+            # เวลา strip = เวลาของ PRO นี้เทียบกับ PRO ถัดไปในไฟล์ (เหมือน calculate_time_diff)
+            seconds = None
+            if last['strip'] != 1 and last['time_ns'] is not None and time_ns is not None:
+                seconds = (last['time_ns'] - time_ns) / 1e9
+                if not 0 <= seconds <= MAX_STRIP_SECONDS:
+                    seconds = None
+            last['seconds'] = seconds
+            state['pending'].append(last)
+
+        # เริ่ม subgroup ใหม่หลัง strip 1 หรือเมื่อ No_strip เพิ่มขึ้น (เหมือน assign_subgroups)
+        prev_strip = last['strip'] if last is not None else None
+        if strip is None or prev_strip is None or prev_strip == 1 or strip > prev_strip:
+            current = state['subgroups'].get(str(state['subgroup_id']))
+            if current is not None:
+                current['closed'] = True
+            state['subgroup_id'] += 1
+            state['subgroups'][str(state['subgroup_id'])] = {'has_first_strip': False, 'closed': False}
+        if strip == 1:
+            state['subgroups'][str(state['subgroup_id'])]['has_first_strip'] = True
+
+        state['last_pro'] = {
+            'frame': frame, 'strip': strip, 'time_ns': time_ns, 'mc': False,
+            'speed': None, 'has_speed': False, 'subgroup': str(state['subgroup_id']),
+        }
+
+    def _on_cuc(self, state, value_5):
+        # speed ของ PRO คือค่าจาก CUC ตัวถัดไป
+        speed = pd.to_numeric(value_5, errors='coerce') / 10 / 25.4
+        speed = None if pd.isna(speed) else _round_speed(float(speed))
+        waiting = state['pending'] + ([state['last_pro']] if state['last_pro'] is not None else [])
+        for record in waiting:
+            if not record['has_speed']:
+                record['speed'], record['has_speed'] = speed, True
+
+    def _flush(self, state):
+        # นำ strip ที่ครบข้อมูลแล้ว (รู้ speed และ subgroup ปิดแล้ว) ไปอัปเดตค่าเฉลี่ยตามลำดับ
+        remaining = []
+        for i, record in enumerate(state['pending']):
+            subgroup = state['subgroups'].get(record['subgroup'])
+            if not record['has_speed'] or subgroup is None or not subgroup['closed']:
+                remaining = state['pending'][i:]
+                break
+            if subgroup['has_first_strip']:
+                self._add_value(state['frames'], record)
+        state['pending'] = remaining
+        open_ids = {record['subgroup'] for record in remaining}
+        if state['last_pro'] is not None:
+            open_ids.add(state['last_pro']['subgroup'])
+        state['subgroups'] = {k: v for k, v in state['subgroups'].items() if k in open_ids}
+
+    def _add_value(self, frames, record):
+        value = record['seconds']
+        if value is None or record['mc'] or record['speed'] is None or not record['frame']:
+            return
+        key = f"{record['frame']}|{record['speed']}"
+        stats = frames.setdefault(key, {'count': 0, 'mean': 0.0, 'm2': 0.0, 'outliers': 0})
+        if stats['count'] >= MIN_GOOD_VALUES:
+            std = (stats['m2'] / stats['count']) ** 0.5
+            diff = value - stats['mean']
+            if std > 0 and diff / std > ZSCORE_THRESHOLD and abs(diff) > MIN_DIFF_SECONDS:
+                stats['outliers'] += 1
+                return
+        # Welford: อัปเดตค่าเฉลี่ยและความแปรปรวนแบบสะสม
+        stats['count'] += 1
+        delta = value - stats['mean']
+        stats['mean'] += delta / stats['count']
+        stats['m2'] += delta * (value - stats['mean'])
+
+    # ---------- ผลลัพธ์ ----------
+
+    def frame_stats(self, files=None):
+        """
+        ค่าสะสมต่อ 'frame|speed' รวมจากไฟล์ที่ระบุ (None = ทุกไฟล์ในสถานะ) ด้วยสูตรรวมค่าเฉลี่ย/ความแปรปรวนของ Chan
+        """
+        paths = self.files if files is None else [os.path.abspath(f) for f in files]
+        merged = {}
+        for path in paths:
+            for key, stats in self.files.get(path, {}).get('frames', {}).items():
+                total = merged.setdefault(key, {'count': 0, 'mean': 0.0, 'm2': 0.0, 'outliers': 0})
+                count = total['count'] + stats['count']
+                if count:
+                    delta = stats['mean'] - total['mean']
+                    total['m2'] += stats['m2'] + delta * delta * total['count'] * stats['count'] / count
+                    total['mean'] += delta * stats['count'] / count
+                total['count'] = count
+                total['outliers'] += stats['outliers']
+        return merged
+
+    def summary(self, files=None):
+        rows = []
+        for key, stats in self.frame_stats(files).items():
+            frame, speed = key.rsplit('|', 1)
+            if stats['count'] < MIN_GOOD_VALUES:
+                continue
+            rows.append({
+                'frame': frame,
+                'speed': pd.to_numeric(speed),
+                'sec/strip': round(stats['mean'], 2),
+                'count_avg': stats['count'],
+                'count_outliers': stats['outliers'],
+            })
+        df = pd.DataFrame(rows, columns=['frame', 'speed', 'sec/strip', 'count_avg', 'count_outliers'])
+        return df.sort_values(['frame', 'speed']).reset_index(drop=True)
+
+
+def LOGVIEW_STREAM(input_path, output_dir, state_path=None):
+    """
+    อัปเดตค่าเฉลี่ย sec/strip จากข้อมูลที่เพิ่มเข้ามาใหม่ในไฟล์ log (หนึ่งรอบ) และส่งออก CSV
+    """
+    print(f"📡 LOGVIEW stream: {input_path}")
+    files = find_input_files(input_path)
+    if not files:
+        print(f" ไม่พบไฟล์ที่ตรงกับ pattern: {input_path}")
+        return None
+    state_path = state_path or os.path.join(output_dir, STATE_FILE_NAME)
+    output_csv = os.path.join(output_dir, "Stream_Summary.csv")
+    # หลาย request พร้อมกันต้องไม่โหลด offset ชุดเดียวกันแล้วนับบรรทัดใหม่ซ้ำ
+    with state_lock(state_path):
+        stream = LogStream(state_path)
+        new_lines = stream.update(files)
+        summary = stream.summary(files)
+        summary.to_csv(output_csv, index=False)
+    print(f"   ✅ อ่านบรรทัดใหม่ {new_lines} บรรทัด จาก {len(files)} ไฟล์ | frame/speed: {len(summary)}")
+    return output_csv
+
+
+def follow(input_path, output_dir, interval=10.0, state_path=None):
+    """
+    รันค้างไว้: อัปเดตทุก interval วินาที จนกว่าจะกด Ctrl+C
+    """
+    print(f"🚀 เริ่มติดตาม log ทุก {interval} วินาที (Ctrl+C เพื่อหยุด)")
+    try:
+        while True:
+            output_csv = LOGVIEW_STREAM(input_path, output_dir, state_path)
+            print(f"   🕒 {datetime.now():%H:%M:%S} -> {output_csv}")
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print("🛑 หยุดติดตาม log")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ติดตามไฟล์ log Singulation แบบ real-time")
+    parser.add_argument("input_path", help="ไฟล์ / pattern / โฟลเดอร์ของไฟล์ log")
+    parser.add_argument("output_dir", help="โฟลเดอร์สำหรับ Stream_Summary.csv และไฟล์สถานะ")
+    parser.add_argument("--interval", type=float, default=10.0, help="ระยะเวลาระหว่างการอัปเดต (วินาที)")
+    parser.add_argument("--state", default=None, help="ตำแหน่งไฟล์สถานะ (ค่าเริ่มต้นอยู่ใน output_dir)")
+    args = parser.parse_args()
+    os.makedirs(args.output_dir, exist_ok=True)
+    follow(args.input_path, args.output_dir, args.interval, args.state)
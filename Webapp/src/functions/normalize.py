@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+
+
+# ================================================================
+# NORMALIZE
+# ทำความสะอาดชื่อรุ่นเครื่อง / Option Code (ใช้ร่วมกันระหว่าง WB_AUTO_UPH และ DA_AUTO_UPH)
+# -> ข้อมูลหลายล้านแถวมีค่าไม่ซ้ำกันแค่หลักสิบ: เรียกฟังก์ชันครั้งเดียวต่อค่าที่ไม่ซ้ำ (factorize)
+#    แล้วกระจายผลกลับทุกแถวด้วย array indexing แทน Series.apply ทีละแถว
+# ================================================================
+
+MODEL_FAMILIES = ['WB3100', 'WB3200', 'WB3300']
+OPTN_CODE_MAPPING = {
+    "L/B-ROV-CU": "W/B-ROV-CU",
+    "L/B-ROVING": "W/B-ROV",
+}
+
+
+def normalize_model_name(model_name):
+    """ทำความสะอาดและรวมชื่อรุ่นเครื่องที่คล้ายกัน"""
+    if not isinstance(model_name, str):
+        model_name = str(model_name)
+    model_name = model_name.strip().upper()
+    for family in MODEL_FAMILIES:
+        if family in model_name:
+            return family
+    return model_name
+
+
+def normalize_optn_code(optn_name):
+    """ทำความสะอาดและรวมรหัส Option Code ที่คล้ายกัน"""
+    if not isinstance(optn_name, str):
+        optn_name = str(optn_name)
+
+    optn_name = optn_name.strip().upper()
+
+    for key, value in OPTN_CODE_MAPPING.items():
+        if optn_name in key:
+            return value
+
+    for key, value in OPTN_CODE_MAPPING.items():
+        if key in optn_name:  # optn_name = "W/B-ROV-CU"
+            return value
+
+    return optn_name
+
+
+def map_unique(series, func):
+    """
+    ผลเหมือน series.apply(func) แต่เรียก func ครั้งเดียวต่อค่าที่ไม่ซ้ำ
+    ค่าว่าง (None / NaN / NaT) แยกตามชนิดเพราะ str() ของแต่ละชนิดต่างกัน
+    """
+    if series.empty or isinstance(series.dtype, pd.CategoricalDtype):
+        # category: apply ทำงานต่อ category อยู่แล้ว
+        return series.apply(func)
+    values = series.to_numpy(dtype=object)
+    result = np.empty(len(values), dtype=object)
+    na = pd.isna(values)
+    present = values[~na]
+    if pd.api.types.infer_dtype(present, skipna=False) in ('string', 'empty'):
+        codes, uniques = pd.factorize(present)
+        result[~na] = np.array([func(u) for u in uniques], dtype=object)[codes]
+    else:
+        # ชนิดปนกัน (เช่น 1 กับ 1.0 ที่ factorize มองเป็นค่าเดียวกัน): จำผลตาม (ชนิด, ค่า)
+        cache = {}
+        result[~na] = [cache[k] if k in cache else cache.setdefault(k, func(k[1]))
+                       for k in ((type(v), v) for v in present)]
+    if na.any():
+        cache = {}
+        result[na] = [cache[type(v)] if type(v) in cache else cache.setdefault(type(v), func(v))
+                      for v in values[na]]
+    return pd.Series(result, index=series.index, name=series.name)
+
+
+def normalize_models(series):
+    """ชื่อรุ่นเครื่องทั้งคอลัมน์ (normalize_model_name ครั้งเดียวต่อค่าที่ไม่ซ้ำ)"""
+    return map_unique(series, normalize_model_name)
+
+
+def normalize_optn_codes(series):
+    """Option Code ทั้งคอลัมน์ (normalize_optn_code ครั้งเดียวต่อค่าที่ไม่ซ้ำ)"""
+    return map_unique(series, normalize_optn_code)
@@ -0,0 +1,230 @@
+import numpy as np
+
+
+# ================================================================
+# OUTLIER ENGINE
+# ตัด outliers ทุกกลุ่มพร้อมกันด้วย NumPy (ใช้ร่วมกันระหว่าง DA_AUTO_UPH และ WB_AUTO_UPH)
+# -> เรียงข้อมูลครั้งเดียวตาม (รหัสกลุ่ม, ค่า) ทำให้ข้อมูลที่เหลือของแต่ละกลุ่มเป็นช่วงต่อเนื่อง [lo, hi)
+# -> Z-Score / IQR ตัดได้เฉพาะปลายซ้าย/ขวา จึงเก็บสถานะต่อกลุ่มแค่ lo, hi
+# -> quantile คำนวณจากตำแหน่งในช่วงที่เรียงแล้ว (linear แบบเดียวกับ pandas.Series.quantile)
+# ================================================================
+
+# สถานะการหยุดของแต่ละกลุ่ม (trim_zscore_iqr)
+STOP_TOO_FEW = 0        # ข้อมูลน้อยกว่า min_count ไม่ตัด
+STOP_ZSCORE = 1         # หลัง Z-Score ไม่มี outlier ตาม IQR แล้ว
+STOP_IQR = 2            # หลัง IQR ไม่มี outlier แล้ว
+STOP_MAX_ITER = 3       # ครบจำนวนรอบสูงสุด
+
+
+def group_codes(df, keys, dropna=True):
+    """
+    รหัสกลุ่ม 0..n_groups-1 ตามลำดับของ df.groupby(keys) (-1 = แถวที่ groupby ตัดทิ้งเพราะ key เป็น NaN)
+    """
+    grouped = df.groupby(keys, sort=True, dropna=dropna)
+    codes = grouped.ngroup()
+    codes = codes.fillna(-1).to_numpy(dtype=np.int64) if dropna else codes.to_numpy(dtype=np.int64)
+    return codes, grouped.ngroups
+
+
+def sorted_group_order(codes, keep):
+    """
+    ตำแหน่งแถวที่เหลือ เรียงตามกลุ่ม (คงลำดับเดิมภายในกลุ่ม) แบบเดียวกับ concat ผลของแต่ละกลุ่ม
+    """
+    rows = np.flatnonzero(keep)
+    return rows[np.argsort(codes[rows], kind='stable')]
+
+
+class SegmentedValues:
+    """
+    ค่าของทุกกลุ่มเรียงครั้งเดียวตาม (กลุ่ม, ค่า) โดยไม่รวมแถวที่ไม่มีกลุ่มหรือค่าเป็น NaN
+    """
+
+    def __init__(self, values, codes, n_groups):
+        values = np.asarray(values, dtype=np.float64)
+        codes = np.asarray(codes, dtype=np.int64)
+        valid = np.flatnonzero((codes >= 0) & ~np.isnan(values))
+        self.order = valid[np.lexsort((values[valid], codes[valid]))]
+        self.values = values[self.order]
+        self.n_rows = len(values)
+        self.counts = np.bincount(codes[self.order], minlength=n_groups)
+        self.starts = np.concatenate(([0], np.cumsum(self.counts)[:-1])).astype(np.int64)
+        # ช่วงที่ยังเหลือของแต่ละกลุ่ม
+        self.lo = self.starts.copy()
+        self.hi = self.starts + self.counts
+
+    def reset(self):
+        """
+        คืนทุกกลุ่มเป็นช่วงเต็ม (ใช้ค่าที่เรียงไว้แล้วซ้ำกับพารามิเตอร์ชุดใหม่โดยไม่ต้องเรียงใหม่)
+        """
+        self.lo = self.starts.copy()
+        self.hi = self.starts + self.counts
+        return self
+
+    def sizes(self, groups):
+        return self.hi[groups] - self.lo[groups]
+
+    def active(self, groups):
+        """
+        ตำแหน่ง (ในอาร์เรย์ที่เรียงแล้ว) ของค่าที่เหลือในกลุ่ม groups และลำดับของกลุ่มที่แต่ละค่าสังกัด
+        """
+        sizes = self.sizes(groups)
+        which = np.repeat(np.arange(len(groups)), sizes)
+        offsets = np.arange(len(which)) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+        return self.lo[groups][which] + offsets, which
+
+    def quantile(self, groups, q):
+        """
+        quantile แบบ linear ของค่าที่เหลือในแต่ละกลุ่ม (NaN ถ้ากลุ่มว่าง)
+        """
+        n = self.sizes(groups)
+        result = np.full(len(groups), np.nan)
+        has_data = n > 0
+        lo, n = self.lo[groups][has_data], n[has_data]
+        virtual = (n - 1) * q
+        previous = np.floor(virtual).astype(np.int64)
+        following = np.minimum(previous + 1, n - 1)
+        gamma = virtual - previous
+        a = self.values[lo + previous]
+        b = self.values[lo + following]
+        diff = b - a
+        result[has_data] = np.where(gamma >= 0.5, b - diff * (1 - gamma), a + diff * gamma)
+        return result
+
+    def iqr_bounds(self, groups, k=1.5):
+        q1 = self.quantile(groups, 0.25)
+        q3 = self.quantile(groups, 0.75)
+        iqr = q3 - q1
+        return q1 - k * iqr, q3 + k * iqr
+
+    def has_outlier(self, groups, lower, upper):
+        """
+        มีค่านอกช่วง [lower, upper] หรือไม่ (ดูแค่ค่าต่ำสุด/สูงสุดของช่วงที่เหลือ)
+        """
+        n = self.sizes(groups)
+        result = np.zeros(len(groups), dtype=bool)
+        has_data = n > 0
+        lo = self.lo[groups][has_data]
+        hi = self.hi[groups][has_data]
+        result[has_data] = (self.values[lo] < lower[has_data]) | (self.values[hi - 1] > upper[has_data])
+        return result
+
+    def trimmed_bounds(self, groups, low_ok, high_ok, which):
+        """
+        ช่วงใหม่ [lo, hi) หลังเก็บเฉพาะค่าที่ผ่านทั้ง low_ok และ high_ok
+        (ค่าเรียงแล้ว ค่าที่ไม่ผ่าน low_ok อยู่ต้นช่วง ค่าที่ไม่ผ่าน high_ok อยู่ท้ายช่วง)
+        """
+        n = len(groups)
+        drop_low = np.bincount(which, weights=~low_ok, minlength=n).astype(np.int64)
+        drop_high = np.bincount(which, weights=low_ok & ~high_ok, minlength=n).astype(np.int64)
+        return self.lo[groups] + drop_low, self.hi[groups] - drop_high
+
+    def trim_to_bounds(self, groups, lower, upper):
+        """
+        เก็บเฉพาะค่าในช่วง [lower, upper] ของแต่ละกลุ่ม (คืนช่วงใหม่ ยังไม่บันทึก)
+        """
+        positions, which = self.active(groups)
+        values = self.values[positions]
+        return self.trimmed_bounds(groups, values >= lower[which], values <= upper[which], which)
+
+    def mean_std(self, groups):
+        """
+        ค่าเฉลี่ยและส่วนเบี่ยงเบนมาตรฐาน (ddof=1) ของค่าที่เหลือ (std เป็น NaN ถ้าเหลือไม่ถึง 2 ค่า)
+        """
+        positions, which = self.active(groups)
+        values = self.values[positions]
+        n = self.sizes(groups)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.bincount(which, weights=values, minlength=len(groups)) / n
+            squared = (mean[which] - values) ** 2
+            var = np.bincount(which, weights=squared, minlength=len(groups)) / (n - 1)
+        std = np.where(n > 1, np.sqrt(np.where(n > 1, var, 0)), np.nan)
+        return mean, std, positions, which
+
+    def group_means(self):
+        """
+        ค่าเฉลี่ยของค่าที่เหลือในแต่ละกลุ่ม (NaN ถ้ากลุ่มว่าง) จากผลรวมสะสมของค่าที่เรียงแล้ว
+        """
+        if not hasattr(self, '_prefix'):
+            self._prefix = np.concatenate(([0.0], np.cumsum(self.values)))
+        n = self.hi - self.lo
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(n > 0, (self._prefix[self.hi] - self._prefix[self.lo]) / n, np.nan)
+
+    def keep_mask(self):
+        """
+        mask ตามลำดับแถวเดิม: True = แถวที่ยังอยู่ในช่วงของกลุ่ม
+        """
+        keep = np.zeros(self.n_rows, dtype=bool)
+        groups = np.flatnonzero(self.sizes(np.arange(len(self.lo))) > 0)
+        positions, _ = self.active(groups)
+        keep[self.order[positions]] = True
+        return keep
+
+
+def _segments(values, codes, n_groups):
+    if isinstance(values, SegmentedValues):
+        return values.reset()
+    return SegmentedValues(values, codes, n_groups)
+
+
+def trim_zscore_iqr(values, codes, n_groups, min_count=15, max_iter=20, z_threshold=3, iqr_k=1.5):
+    """
+    ตัด outliers สลับ Z-Score (±z_threshold) กับ IQR (iqr_k×IQR) ทุกกลุ่มพร้อมกัน
+    แต่ละรอบ: ตัด Z-Score -> ถ้าไม่มี outlier ตาม IQR แล้วหยุด -> ตัด IQR -> ถ้าไม่มี outlier แล้วหยุด
+    ค่า NaN ไม่นับเป็นข้อมูล คืน (keep mask ตามแถวเดิม, สถานะการหยุดต่อกลุ่ม, จำนวนรอบต่อกลุ่ม)
+    values เป็น SegmentedValues ที่สร้างไว้แล้วได้ (เริ่มจากช่วงเต็มใหม่ ช่วงที่เหลือดูได้จาก lo/hi หลังเรียก)
+    """
+    seg = _segments(values, codes, n_groups)
+    status = np.full(n_groups, STOP_MAX_ITER, dtype=np.int8)
+    rounds = np.full(n_groups, max_iter, dtype=np.int64)
+    too_few = seg.counts < min_count
+    status[too_few] = STOP_TOO_FEW
+    rounds[too_few] = 0
+    running = np.flatnonzero(~too_few)
+
+    for i in range(max_iter):
+        if len(running) == 0:
+            break
+        # Z-Score (กลุ่มที่ std = 0 ไม่ตัด)
+        mean, std, positions, which = seg.mean_std(running)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            z = (seg.values[positions] - mean[which]) / std[which]
+        lo, hi = seg.trimmed_bounds(running, z >= -z_threshold, z <= z_threshold, which)
+        cut = std != 0
+        seg.lo[running[cut]], seg.hi[running[cut]] = lo[cut], hi[cut]
+
+        lower, upper = seg.iqr_bounds(running, iqr_k)
+        done = ~seg.has_outlier(running, lower, upper)
+        status[running[done]], rounds[running[done]] = STOP_ZSCORE, i + 1
+        running, lower, upper = running[~done], lower[~done], upper[~done]
+
+        # IQR
+        seg.lo[running], seg.hi[running] = seg.trim_to_bounds(running, lower, upper)
+        lower, upper = seg.iqr_bounds(running, iqr_k)
+        done = ~seg.has_outlier(running, lower, upper)
+        status[running[done]], rounds[running[done]] = STOP_IQR, i + 1
+        running = running[~done]
+
+    return seg.keep_mask(), status, rounds
+
+
+def trim_iqr(values, codes, n_groups, min_count=15, max_iter=10, min_keep=5, max_drop_ratio=0.5, iqr_k=1.5):
+    """
+    ตัด outliers ด้วย IQR (iqr_k×IQR) ซ้ำทุกกลุ่มพร้อมกัน หยุดกลุ่มเมื่อรอบนั้นไม่ตัดอะไร, เหลือน้อยกว่า min_keep
+    หรือจะตัดเกิน max_drop_ratio (รอบที่หยุดไม่ถูกนำมาใช้) คืน keep mask ตามแถวเดิม
+    values เป็น SegmentedValues ที่สร้างไว้แล้วได้ (เหมือน trim_zscore_iqr)
+    """
+    seg = _segments(values, codes, n_groups)
+    running = np.flatnonzero(seg.counts >= min_count)
+    for _ in range(max_iter):
+        if len(running) == 0:
+            break
+        before = seg.sizes(running)
+        lower, upper = seg.iqr_bounds(running, iqr_k)
+        lo, hi = seg.trim_to_bounds(running, lower, upper)
+        after = hi - lo
+        stop = (after == before) | (after < min_keep) | ((before - after) / before > max_drop_ratio)
+        apply = ~stop
+        seg.lo[running[apply]], seg.hi[running[apply]] = lo[apply], hi[apply]
+        running = running[apply]
+    return seg.keep_mask()
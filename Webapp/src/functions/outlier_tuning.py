@@ -0,0 +1,178 @@
+import math
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+try:
+    from functions import outlier_engine
+except ImportError:
+    import outlier_engine
+
+
+# ================================================================
+# OUTLIER TUNING (what-if)
+# เก็บค่า UPH ของแต่ละกลุ่มเป็น NumPy array ที่เรียงแล้ว (SegmentedValues) ไว้ในหน่วยความจำหลังรันครั้งแรก
+# -> เปลี่ยน threshold (z-score, k×IQR, จำนวนจุดขั้นต่ำ, จำนวนรอบ) แล้วรันเฉพาะการตัด outliers + ค่าเฉลี่ยใหม่
+#    ไม่ต้องโหลดไฟล์ / groupby / เรียงข้อมูลใหม่
+# ================================================================
+
+# พารามิเตอร์ที่ปรับได้ของแต่ละวิธี -> (ชนิด, ค่าเริ่มต้นเดียวกับที่ DA / WB ใช้)
+PARAMETERS = {
+    'zscore_iqr': {
+        'z_threshold': (float, 3.0),
+        'iqr_k': (float, 1.5),
+        'min_count': (int, 15),
+        'max_iter': (int, 20),
+    },
+    'iqr': {
+        'iqr_k': (float, 1.5),
+        'min_count': (int, 15),
+        'max_iter': (int, 10),
+        'min_keep': (int, 5),
+        'max_drop_ratio': (float, 0.5),
+    },
+}
+
+SESSION_CACHE_SIZE = 8
+_sessions = {}
+_sessions_lock = threading.Lock()
+_build_locks = {}
+
+
+def parse_params(method, raw=None):
+    """
+    แปลงพารามิเตอร์จาก request (string/ตัวเลข) เป็นชนิดที่ถูกต้อง ค่าที่ไม่ได้ส่งมาใช้ค่าเริ่มต้น
+    ชื่อที่ไม่รู้จักหรือค่าที่ไม่ถูกต้องจะ raise ValueError
+    """
+    spec = PARAMETERS[method]
+    raw = {k: v for k, v in (raw or {}).items() if v not in (None, '')}
+    unknown = sorted(set(raw) - set(spec))
+    if unknown:
+        raise ValueError(f"ไม่รู้จักพารามิเตอร์: {unknown} (ใช้ได้: {list(spec)})")
+    params = {}
+    for name, (kind, default) in spec.items():
+        try:
+            number = float(raw[name] if name in raw else default)
+            if not math.isfinite(number):
+                raise ValueError
+            if kind is int and not number.is_integer():
+                raise ValueError
+            value = kind(number)
+        except (TypeError, ValueError, OverflowError):
+            raise ValueError(f"ค่า {name} ไม่ถูกต้อง: {raw[name]!r}")
+        if value < 0 or (name == 'max_iter' and value < 1):
+            raise ValueError(f"ค่า {name} ต้องเป็นค่าบวก: {value}")
+        params[name] = value
+    return params
+
+
+def file_key(file_path):
+    """key ของชุดไฟล์ (path + เวลาแก้ไข + ขนาด) ใช้ร่วมกับช่วงวันที่เป็น key ของ session"""
+    paths = [file_path] if isinstance(file_path, str) else list(file_path or [])
+    return tuple((os.path.abspath(p), os.stat(p).st_mtime_ns, os.stat(p).st_size) for p in paths)
+
+
+class TuningSession:
+    """
+    ข้อมูลของการรันหนึ่งครั้งที่เตรียมไว้สำหรับ what-if
+    keys: DataFrame หนึ่งแถวต่อกลุ่ม (ตามลำดับรหัสกลุ่ม) ใช้เป็นคอลัมน์ของตารางผลลัพธ์
+    summarize: ถ้าระบุ สร้างตารางผลลัพธ์จาก keep mask (ตามแถวเดิม) แทนตาราง keys + UPH
+    session หนึ่งถูกเรียกจากหลาย request พร้อมกันได้ (ช่วง lo/hi ใช้ร่วมกัน) จึง run ทีละครั้งด้วย lock
+    """
+
+    def __init__(self, method, keys, values, codes, n_groups, method_labels=None, summarize=None):
+        self.method = method
+        self.keys = keys.reset_index(drop=True)
+        self.codes = codes
+        self.n_groups = n_groups
+        self.segments = outlier_engine.SegmentedValues(values, codes, n_groups)
+        self.before = np.bincount(codes[codes >= 0], minlength=n_groups)
+        self.method_labels = method_labels
+        self.summarize = summarize
+        self._lock = threading.Lock()
+
+    def run(self, params=None):
+        """ตัด outliers ด้วยพารามิเตอร์ชุดใหม่ คืนตารางค่าเฉลี่ยต่อกลุ่ม (เฉพาะกลุ่มที่ยังมีข้อมูล)"""
+        params = parse_params(self.method, params)
+        with self._lock:
+            return self._run(params)
+
+    def _run(self, params):
+        seg = self.segments
+        if self.method == 'zscore_iqr':
+            _, status, rounds = outlier_engine.trim_zscore_iqr(seg, self.codes, self.n_groups, **params)
+        else:
+            outlier_engine.trim_iqr(seg, self.codes, self.n_groups, **params)
+        after = seg.hi - seg.lo
+        if self.summarize is not None:
+            return self.summarize(seg.keep_mask())
+
+        table = self.keys.copy()
+        table['UPH'] = np.round(seg.group_means(), 3)
+        table['DataPoints_Before'] = self.before
+        table['DataPoints_After'] = after
+        table['Outliers_Removed'] = self.before - after
+        if self.method == 'zscore_iqr' and self.method_labels:
+            table['Outlier_Method'] = [self.method_labels[s].format(r) for s, r in zip(status, rounds)]
+        return table[after > 0].reset_index(drop=True)
+
+
+def build_session(method, df, group_cols, value_col, dropna=True, first_cols=(), rename=None, method_labels=None,
+                  summarize=None):
+    """
+    สร้าง TuningSession จาก DataFrame ที่กรองช่วงวันที่แล้ว (ขั้นตอนก่อนตัด outliers ของ DA / WB)
+    first_cols: คอลัมน์ที่แสดงค่าแรกของกลุ่ม (เช่น operation) rename: เปลี่ยนชื่อคอลัมน์ในตารางผลลัพธ์
+    """
+    grouped = df.groupby(group_cols, sort=True, dropna=dropna)
+    # รหัสกลุ่มแบบเดียวกับ outlier_engine.group_codes (ใช้ groupby ครั้งเดียวกับตาราง keys)
+    codes = grouped.ngroup().fillna(-1).to_numpy(dtype=np.int64)
+    n_groups = grouped.ngroups
+    values = pd.to_numeric(df[value_col], errors='coerce').to_numpy(dtype=float)
+    first_cols = [c for c in first_cols if c in df.columns and c not in group_cols]
+    if first_cols:
+        keys = grouped[first_cols].first().reset_index()
+    else:
+        keys = grouped.size().reset_index()[list(group_cols)]
+    if rename:
+        keys = keys.rename(columns=rename)
+    return TuningSession(method, keys, values, codes, n_groups, method_labels=method_labels, summarize=summarize)
+
+
+def get_session(key, builder):
+    """session ตาม key (สร้างด้วย builder() ครั้งแรก แล้วเก็บไว้ใช้ซ้ำ)
+    builder() รันนอก lock รวม (lock แยกต่อ key) session อื่นที่ cache ไว้แล้วจึงไม่ต้องรอการโหลดไฟล์"""
+    with _sessions_lock:
+        if key in _sessions:
+            return _sessions[key]
+        build_lock = _build_locks.setdefault(key, threading.Lock())
+    with build_lock:
+        with _sessions_lock:
+            if key in _sessions:
+                return _sessions[key]
+        try:
+            session = builder()
+        except Exception:
+            with _sessions_lock:
+                _build_locks.pop(key, None)
+            raise
+        with _sessions_lock:
+            if len(_sessions) >= SESSION_CACHE_SIZE:
+                _sessions.pop(next(iter(_sessions)))
+            _sessions[key] = session
+            _build_locks.pop(key, None)
+        return session
+
+
+def run_what_if(key, builder, params=None):
+    """
+    รัน what-if หนึ่งครั้ง คืน (ตารางผลลัพธ์, เวลาที่ใช้ตัด outliers + เฉลี่ย เป็นวินาที)
+    """
+    session = get_session(key, builder)
+    start = time.perf_counter()
+    table = session.run(params)
+    elapsed = time.perf_counter() - start
+    print(f"🔁 What-if: {len(table)} กลุ่ม ({elapsed:.3f} วินาที)")
+    return table, elapsed
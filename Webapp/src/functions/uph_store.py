@@ -0,0 +1,172 @@
+import os
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+try:
+    from functions.logview import file_content_hash
+except ImportError:
+    from logview import file_content_hash
+
+
+# ================================================================
+# UPH STORE
+# คลังข้อมูล UPH รายจุด (SQLite) ของ DA / WB สำหรับรันซ้ำโดยไม่ต้องอ่านไฟล์ Excel รายไตรมาสใหม่
+# -> เพิ่มไฟล์ใหม่ (เช่น ไตรมาสใหม่) แบบ append ไม่เขียนข้อมูลเดิมซ้ำ (ตรวจด้วย hash เนื้อหาไฟล์)
+# -> index ตามกลุ่ม (bom, machine model, optn, device, package, rev) + วันที่ และตามวันที่อย่างเดียว
+#    ดึงช่วงวันที่ใดก็ได้ด้วย index range scan
+# -> DA / WB ดึงข้อมูลด้วย load_window แล้วตัด outliers ด้วย remove_outliers ของแต่ละโมดูลเอง
+# ================================================================
+
+STORE_DB_NAME = "uph_store.sqlite"
+GROUP_COLUMNS = ['bom_no', 'machine_model', 'optn_code', 'device', 'package_code', 'bom_rev']
+VALUE_COLUMNS = GROUP_COLUMNS + ['operation']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS source_files (
+    process     TEXT NOT NULL,
+    file_hash   TEXT NOT NULL,
+    file_name   TEXT NOT NULL,
+    row_count   INTEGER NOT NULL,
+    inserted_at TEXT NOT NULL,
+    PRIMARY KEY (process, file_hash)
+);
+CREATE TABLE IF NOT EXISTS uph_observations (
+    id            INTEGER PRIMARY KEY AUTOINCREMENT,
+    process       TEXT NOT NULL,
+    file_hash     TEXT NOT NULL,
+    bom_no,
+    machine_model,
+    optn_code,
+    device,
+    package_code,
+    bom_rev,
+    operation,
+    obs_time      TEXT,
+    obs_day       TEXT,
+    uph
+);
+CREATE INDEX IF NOT EXISTS idx_uph_group_day ON uph_observations
+    (process, bom_no, machine_model, optn_code, device, package_code, bom_rev, obs_day);
+CREATE INDEX IF NOT EXISTS idx_uph_day ON uph_observations (process, obs_day);
+"""
+
+
+def _to_day(value):
+    return pd.Timestamp(str(value).replace('/', '-')).strftime('%Y-%m-%d')
+
+
+def _sql_value(value):
+    """แปลงค่า numpy/pandas เป็นชนิดที่ sqlite3 รับได้ (NaN -> NULL)"""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+class UphStore:
+    """
+    คลังข้อมูล UPH รายจุด แยกตาม process ('DA', 'WB')
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def has_file(self, process, file_hash):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT 1 FROM source_files WHERE process = ? AND file_hash = ?", (process, file_hash)
+            ).fetchone()
+        return row is not None
+
+    def append(self, process, file_hash, file_name, df, date_col=None, columns=None):
+        """
+        เพิ่มข้อมูลจากไฟล์หนึ่งไฟล์ (คืน False ถ้าเคยเพิ่มแล้ว)
+        columns: map ชื่อคอลัมน์ใน df -> ชื่อในคลัง (bom_no, machine_model, ..., uph) คอลัมน์ที่ไม่มีเก็บเป็น NULL
+        """
+        columns = columns or {}
+        source = {name: columns.get(name, name) for name in VALUE_COLUMNS + ['uph']}
+        data = {name: (df[col] if col in df.columns else pd.Series(None, index=df.index, dtype=object))
+                for name, col in source.items()}
+        if date_col is not None and date_col in df.columns:
+            times = pd.to_datetime(df[date_col], errors='coerce')
+        else:
+            times = pd.Series(pd.NaT, index=df.index)
+        data['obs_time'] = times.dt.strftime('%Y-%m-%d %H:%M:%S')
+        data['obs_day'] = times.dt.strftime('%Y-%m-%d')
+        names = VALUE_COLUMNS + ['obs_time', 'obs_day', 'uph']
+        rows = zip(*[[_sql_value(v) for v in data[name].tolist()] for name in names])
+
+        with self._connect() as conn:
+            inserted = conn.execute(
+                "INSERT OR IGNORE INTO source_files (process, file_hash, file_name, row_count, inserted_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (process, file_hash, file_name, len(df), datetime.now().isoformat(timespec='seconds')),
+            ).rowcount
+            if not inserted:
+                return False
+            conn.executemany(
+                f"INSERT INTO uph_observations (process, file_hash, {', '.join(names)}) "
+                f"VALUES (?, ?, {', '.join('?' * len(names))})",
+                ((process, file_hash) + row for row in rows),
+            )
+        return True
+
+    def load_window(self, process, start_date=None, end_date=None):
+        """
+        ข้อมูลรายจุดในช่วงวันที่ [start_date, end_date] (รวมทั้งสองวัน) ตามลำดับที่เพิ่มเข้าคลัง
+        คืน DataFrame คอลัมน์ bom_no, machine_model, ..., operation, uph, date_time_start (datetime64)
+        """
+        conditions, params = ["process = ?"], [process]
+        if start_date:
+            conditions.append("obs_day >= ?")
+            params.append(_to_day(start_date))
+        if end_date:
+            conditions.append("obs_day <= ?")
+            params.append(_to_day(end_date))
+        query = (
+            f"SELECT {', '.join(VALUE_COLUMNS)}, uph, obs_time AS date_time_start "
+            f"FROM uph_observations WHERE {' AND '.join(conditions)} ORDER BY id"
+        )
+        with self._connect() as conn:
+            df = pd.read_sql_query(query, conn, params=params)
+        # NULL ของ SQLite อ่านกลับมาเป็น None ในคอลัมน์ object: คืนเป็น NaN ให้เหมือนอ่านจากไฟล์
+        df = df.fillna(np.nan)
+        df['date_time_start'] = pd.to_datetime(df['date_time_start'], errors='coerce')
+        return df
+
+    def files(self, process=None):
+        query = "SELECT process, file_name, file_hash, row_count, inserted_at FROM source_files"
+        params = []
+        if process:
+            query += " WHERE process = ?"
+            params.append(process)
+        with self._connect() as conn:
+            return pd.read_sql_query(query + " ORDER BY rowid", conn, params=params)
+
+
+def append_files(store, process, paths, read_file):
+    """
+    เพิ่มไฟล์ที่ยังไม่อยู่ในคลัง read_file(path) ต้องคืน (df, date_col, columns) ตามที่ UphStore.append ต้องการ
+    คืนจำนวนไฟล์ที่เพิ่มใหม่
+    """
+    added = 0
+    for path in paths:
+        file_hash = file_content_hash(path)
+        if store.has_file(process, file_hash):
+            print(f"⏭️  มีในคลังแล้ว: {os.path.basename(path)}")
+            continue
+        df, date_col, columns = read_file(path)
+        if store.append(process, file_hash, os.path.basename(path), df, date_col=date_col, columns=columns):
+            print(f"✅ เพิ่มเข้าคลัง: {os.path.basename(path)} ({len(df):,} แถว)")
+            added += 1
+    return added
@@ -1,8 +1,48 @@
 import pandas as pd
+import numpy as np
 import os
+import shutil
+import tempfile
+import itertools
+import tracemalloc
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
 import re
 
+try:
+    from functions import normalize, outlier_engine, outlier_tuning, uph_store
+    from functions.logview import resolve_workers
+except ImportError:
+    import normalize
+    import outlier_engine
+    import outlier_tuning
+    import uph_store
+    from logview import resolve_workers
+
+# คีย์ของไฟล์ Map (Part bom pkg) นอกจาก bom_no และคอลัมน์ค่าที่ใช้จากแถวที่ตรงกัน
+MAP_OPTIONAL_KEYS = ('bom_rev', 'package_code', 'product_number')
+MAP_VALUE_COLUMNS = ['item_no', 'no_bump', 'number_required', 'number_required_2']
+
+# โหมดประมวลผลทีละ chunk (ไฟล์ UPH ขนาดใหญ่): จำนวนแถวต่อ chunk, จำนวน partition บนดิสก์
+# และคอลัมน์ที่เก็บลง partition (คีย์กลุ่ม + uph + operation)
+CHUNK_ROWS = 200_000
+SPILL_PARTITIONS = 32
+SPILL_COLUMNS = ['bom_no', 'machine_model', 'optn_code', 'bom_rev', 'device', 'package_code', 'operation', 'uph']
+# คอลัมน์ที่ไม่ถูกแปลงตอนทำความสะอาด ต้องคืนชนิดให้เหมือนอ่านทั้งไฟล์ (ชนิดของแต่ละ chunk อาจต่างกัน)
+PASS_THROUGH_COLUMNS = ['bom_rev', 'device', 'package_code', 'operation']
+
+def _common_dtype(dtypes):
+    """ชนิดคอลัมน์เมื่อรวมทุก chunk: เหมือนกันทั้งหมด -> ชนิดนั้น, ตัวเลขปนกัน -> float64, นอกนั้น -> object"""
+    dtypes = set(dtypes)
+    if len(dtypes) == 1:
+        return dtypes.pop()
+    if all(pd.api.types.is_numeric_dtype(d) and not pd.api.types.is_bool_dtype(d) for d in dtypes):
+        return np.dtype('float64')
+    return np.dtype(object)
+
+def _frame_mb(df):
+    return float(df.memory_usage(deep=True).sum()) / 1024 / 1024
+
 class WireBondingAnalyzer:
     def __init__(self):
         self.nobump_df = None
@@ -12,47 +52,19 @@ class WireBondingAnalyzer:
     
     def normalize_model_name(self, model_name):
         """ทำความสะอาดและรวมชื่อรุ่นเครื่องที่คล้ายกัน"""
-        if not isinstance(model_name, str):
-            model_name = str(model_name)
-        model_name = model_name.strip().upper()
-        if 'WB3100' in model_name:
-            return 'WB3100'
-        elif 'WB3200' in model_name:
-            return 'WB3200'
-        elif 'WB3300' in model_name:
-            return 'WB3300'
-        else:
-            return model_name
+        return normalize.normalize_model_name(model_name)
         
     def normalize_optn_code(self, optn_name):
         """ทำความสะอาดและรวมรหัส Option Code ที่คล้ายกัน"""
-        if not isinstance(optn_name, str):
-            optn_name = str(optn_name)
-
-        optn_name = optn_name.strip().upper()
-
-        mapping = {
-         "L/B-ROV-CU": "W/B-ROV-CU",
-         "L/B-ROVING": "W/B-ROV",
-        }
-
-        for key, value in mapping.items():
-            if optn_name in key:
-                return value
-            
-        for key, value in mapping.items():
-            if key in optn_name:  # optn_name = "W/B-ROV-CU"
-                return value
-
-        return optn_name
+        return normalize.normalize_optn_code(optn_name)
         
     def clean_model_names(self, df):
-        """ทำความสะอาดชื่อรุ่นเครื่อง"""
+        """ทำความสะอาดชื่อรุ่นเครื่อง (ครั้งเดียวต่อค่าที่ไม่ซ้ำ แล้วกระจายกลับทุกแถว)"""
         df = df.copy()
         if 'machine_model' in df.columns:
-            df['machine_model'] = df['machine_model'].apply(self.normalize_model_name)
+            df['machine_model'] = normalize.map_unique(df['machine_model'], self.normalize_model_name)
         if 'optn_code' in df.columns:
-            df['optn_code'] = df['optn_code'].apply(self.normalize_optn_code)
+            df['optn_code'] = normalize.map_unique(df['optn_code'], self.normalize_optn_code)
         return df
     
     def find_wire_data_file(self, directory_path=None):
@@ -71,6 +83,10 @@ class WireBondingAnalyzer:
     
     def load_data(self, uph_path, wire_data_path=None):
         """โหลดข้อมูลที่จำเป็น"""
+        return self.load_wire_data(wire_data_path) and self.load_uph_data(uph_path)
+
+    def load_wire_data(self, wire_data_path=None):
+        """โหลดไฟล์ Wire Data (Part bom pkg)"""
         try:
             # หา wire_data_path ถ้าไม่ระบุ
             if wire_data_path is None:
@@ -116,8 +132,58 @@ class WireBondingAnalyzer:
             for k in ['bom_rev', 'package_code', 'product_number']:
                 if k in self.nobump_df.columns:
                     self.nobump_df[k] = self.nobump_df[k].astype(str).str.strip().str.upper()
+            self._build_map_index()
             print(f"✅ Wire data loaded: {len(self.nobump_df)} rows")
+            return True
 
+        except Exception as e:
+            print(f"❌ Error loading data: {e}")
+            return False
+
+    def share_wire_data(self, reference):
+        """ใช้ Wire Data + index ที่โหลดแล้วของ analyzer อื่นร่วมกัน (อ่านอย่างเดียว) แทนการอ่าน Part bom pkg ใหม่"""
+        self.nobump_df = reference.nobump_df
+        self._map_index_source = reference._map_index_source
+        self._map_index = reference._map_index
+        self._map_values = reference._map_values
+        return self
+
+    def _normalize_uph_columns(self, df):
+        """ปรับชื่อคอลัมน์ของข้อมูล UPH ให้เป็นมาตรฐาน (machine_model, bom_no, uph, optn_code, ...)"""
+        # ทำความสะอาดคอลัมน์ UPH
+        df.columns = (
+            df.columns
+            .str.strip()
+            .str.lower()
+            .str.replace(' ', '_')
+            .str.replace('-', '_')
+        )
+
+        # Map คอลัมน์ UPH
+        col_map = {}
+        for col in df.columns:
+            norm = col.replace('_', '').lower()
+            if norm in ['machinemodel', 'model']:
+                col_map[col] = 'machine_model'
+            elif norm in ['bomno', 'bom', 'bom_no']:
+                col_map[col] = 'bom_no'
+            elif norm == 'uph':
+                col_map[col] = 'uph'
+            elif norm in ['optncode', 'optn_code']:
+                col_map[col] = 'optn_code'
+            elif norm == 'operation':
+                col_map[col] = 'operation'
+            elif norm in ['device']:
+                col_map[col] = 'device'
+            elif norm in ['packagecode', 'package_code']:   # FIX: รองรับทั้งสองแบบ
+                col_map[col] = 'package_code'
+            elif norm in ['bomrev', 'bom_rev']:              # FIX: รองรับทั้งสองแบบ
+                col_map[col] = 'bom_rev'
+        return df.rename(columns=col_map)
+
+    def load_uph_data(self, uph_path):
+        """โหลดไฟล์ UPH และปรับชื่อคอลัมน์ให้เป็นมาตรฐาน"""
+        try:
             # โหลด UPH Data
             print(f"📊 Loading UPH data from: {os.path.basename(uph_path)}")
             ext = os.path.splitext(uph_path)[-1].lower()
@@ -131,36 +197,7 @@ class WireBondingAnalyzer:
                 print(f"❌ Unsupported file type: {ext}")
                 return False
 
-            # ทำความสะอาดคอลัมน์ UPH
-            self.raw_data.columns = (
-                self.raw_data.columns
-                .str.strip()
-                .str.lower()
-                .str.replace(' ', '_')
-                .str.replace('-', '_')
-            )
-
-            # Map คอลัมน์ UPH
-            col_map = {}
-            for col in self.raw_data.columns:
-                norm = col.replace('_', '').lower()
-                if norm in ['machinemodel', 'model']:
-                    col_map[col] = 'machine_model'
-                elif norm in ['bomno', 'bom', 'bom_no']:
-                    col_map[col] = 'bom_no'
-                elif norm == 'uph':
-                    col_map[col] = 'uph'
-                elif norm in ['optncode', 'optn_code']:
-                    col_map[col] = 'optn_code'
-                elif norm == 'operation':
-                    col_map[col] = 'operation'
-                elif norm in ['device']:
-                    col_map[col] = 'device'
-                elif norm in ['packagecode', 'package_code']:   # FIX: รองรับทั้งสองแบบ
-                    col_map[col] = 'package_code'
-                elif norm in ['bomrev', 'bom_rev']:              # FIX: รองรับทั้งสองแบบ
-                    col_map[col] = 'bom_rev'
-            self.raw_data.rename(columns=col_map, inplace=True)
+            self.raw_data = self._normalize_uph_columns(self.raw_data)
             print(f"✅ UPH data loaded: {len(self.raw_data)} rows")
 
             # ตรวจสอบคอลัมน์ที่จำเป็น
@@ -178,30 +215,62 @@ class WireBondingAnalyzer:
             print(f"❌ Error loading data: {e}")
             return False
     
-    # ตัวช่วยกรองแถวในไฟล์ Map ด้วยหลายคีย์
-    def _filter_map_rows(self, bom_no, bom_rev=None, package_code=None, product_number=None):
-        df = self.nobump_df.copy()
-        if df is None or df.empty:
-            return df.iloc[0:0]
-        def norm(v): 
+    def find_date_column(self, df):
+        """คอลัมน์วันที่ที่ใช้กรอง (คอลัมน์แรกที่มี 'date' หรือ 'time' แบบเดียวกับ preprocess_data)"""
+        date_cols = [col for col in df.columns if 'date' in col or 'time' in col]
+        return date_cols[0] if date_cols else None
+
+    def _build_map_index(self):
+        """
+        สร้าง index ของไฟล์ Map ครั้งเดียว: ทุกระดับของคีย์ (bom_no + ชุดย่อยของ bom_rev / package_code / product_number)
+        -> dict จากค่าคีย์ที่ normalize แล้ว ไปยังตำแหน่งแถวที่ตรงกัน (ตามลำดับแถวในไฟล์)
+        """
+        df = self.nobump_df
+        self._map_index_source = df
+        self._map_index = {}
+        self._map_values = {}
+        if df is None or 'bom_no' not in df.columns:
+            return
+        optional = [k for k in MAP_OPTIONAL_KEYS if k in df.columns]
+        columns = {k: df[k].astype(str).str.strip().str.upper().tolist() for k in ['bom_no'] + optional}
+        for n in range(len(optional) + 1):
+            for level in itertools.combinations(optional, n):
+                index = {}
+                for pos, key in enumerate(zip(*(columns[k] for k in ('bom_no',) + level))):
+                    index.setdefault(key, []).append(pos)
+                self._map_index[level] = index
+        self._map_values = {c: df[c].to_numpy() for c in MAP_VALUE_COLUMNS if c in df.columns}
+
+    def _map_positions(self, bom_no, bom_rev=None, package_code=None, product_number=None):
+        """ตำแหน่งแถวในไฟล์ Map ที่ตรงกับคีย์ (คีย์ที่เป็น None หรือไม่มีคอลัมน์ใน Map จะไม่ใช้กรอง)"""
+        if self.nobump_df is None or self.nobump_df.empty:
+            return []
+        if getattr(self, '_map_index_source', None) is not self.nobump_df:
+            self._build_map_index()
+        def norm(v):
             return str(v).strip().upper()
-        mask = (df['bom_no'].astype(str).str.strip().str.upper() == norm(bom_no))
-        if bom_rev is not None and 'bom_rev' in df.columns:
-            mask &= (df['bom_rev'].astype(str).str.strip().str.upper() == norm(bom_rev))
-        if package_code is not None and 'package_code' in df.columns:
-            mask &= (df['package_code'].astype(str).str.strip().str.upper() == norm(package_code))
-        # Product Number ใน Map
-        if product_number is not None:
-            if 'product_number' in df.columns:
-                mask &= (df['product_number'].astype(str).str.strip().str.upper() == norm(product_number))
-        return df[mask]
+        values = {'bom_rev': bom_rev, 'package_code': package_code, 'product_number': product_number}
+        level = tuple(k for k in MAP_OPTIONAL_KEYS if values[k] is not None and k in self.nobump_df.columns)
+        key = (norm(bom_no),) + tuple(norm(values[k]) for k in level)
+        return self._map_index.get(level, {}).get(key, [])
+
+    def _map_record(self, bom_no, bom_rev=None, package_code=None, product_number=None):
+        """ค่าของแถวแรกในไฟล์ Map ที่ตรงกับคีย์ (dict ของ item_no, no_bump, ...) หรือ None ถ้าไม่พบ"""
+        positions = self._map_positions(bom_no, bom_rev, package_code, product_number)
+        if not positions:
+            return None
+        return {c: values[positions[0]] for c, values in self._map_values.items()}
+
+    # ตัวช่วยกรองแถวในไฟล์ Map ด้วยหลายคีย์ (ผ่าน index)
+    def _filter_map_rows(self, bom_no, bom_rev=None, package_code=None, product_number=None):
+        if self.nobump_df is None:
+            return pd.DataFrame()
+        return self.nobump_df.iloc[self._map_positions(bom_no, bom_rev, package_code, product_number)]
 
     # ตัวช่วย: wire2 "มีค่า" เฉพาะกรณี > 0 (ไม่รวม NaN/ว่าง/ศูนย์)
-    def _wire2_has_value(self, rows):
+    def _wire2_has_value(self, record):
         try:
-            if rows.empty or 'number_required_2' not in rows.columns:
-                return False
-            v = rows['number_required_2'].iloc[0]
+            v = record.get('number_required_2') if record else None
             # ว่างหรือ NaN → ไม่มีค่า
             if v is None or (isinstance(v, float) and pd.isna(v)):
                 return False
@@ -218,15 +287,15 @@ class WireBondingAnalyzer:
         """คำนวณจำนวนสายต่อหน่วยจากไฟล์ Map โดยพิจารณา Bom Rev, Package Code, Product Number
            ถ้า wire2 มีค่า → ไม่คำนวณ (คืน None)"""
         try:
-            rows = self._filter_map_rows(bom_no, bom_rev=bom_rev, package_code=package_code, product_number=product_number)
-            if rows.empty:
+            record = self._map_record(bom_no, bom_rev=bom_rev, package_code=package_code, product_number=product_number)
+            if record is None:
                 return None
             # ถ้า wire2 มีค่า ให้ไม่คำนวณ
-            if self._wire2_has_value(rows):
+            if self._wire2_has_value(record):
                 return None
 
-            no_bump = rows['no_bump'].iloc[0] if 'no_bump' in rows.columns else None
-            num_required = rows['number_required'].iloc[0] if 'number_required' in rows.columns else None
+            no_bump = record.get('no_bump')
+            num_required = record.get('number_required')
             if pd.isna(no_bump) or pd.isna(num_required):
                 return None
             no_bump = float(no_bump); num_required = float(num_required)
@@ -240,18 +309,18 @@ class WireBondingAnalyzer:
         """ดึง ITEM_NO, NO_BUMP, NUMBER_REQUIRED จากไฟล์ Map ตาม BOM + Bom Rev + Package Code + Product Number
            ถ้า wire2 มีค่า → คืน (item_no, None, None)"""
         try:
-            rows = self._filter_map_rows(bom_no, bom_rev=bom_rev, package_code=package_code, product_number=product_number)
-            if rows.empty:
+            record = self._map_record(bom_no, bom_rev=bom_rev, package_code=package_code, product_number=product_number)
+            if record is None:
                 return None, None, None
 
-            item_no = rows['item_no'].iloc[0] if 'item_no' in rows.columns else None
+            item_no = record.get('item_no')
 
             # ถ้า wire2 มีค่า ให้ blank no_bump/number_required ตั้งแต่ต้น
-            if self._wire2_has_value(rows):
+            if self._wire2_has_value(record):
                 return item_no, None, None
 
-            no_bump = rows['no_bump'].iloc[0] if 'no_bump' in rows.columns else None
-            number_required = rows['number_required'].iloc[0] if 'number_required' in rows.columns else None
+            no_bump = record.get('no_bump')
+            number_required = record.get('number_required')
             return item_no, no_bump, number_required
         except Exception as e:
             print(f"❌ Error getting wire info for BOM {bom_no}: {e}")
@@ -273,57 +342,34 @@ class WireBondingAnalyzer:
             group_keys = ['bom_no', 'machine_model', 'optn_code', 'bom_rev', 'device', 'package_code']
             group_keys = [k for k in group_keys if k in df.columns]  # เผื่อบางคอลัมน์ไม่มี
             grouped = df.groupby(group_keys, dropna=False)
+            codes = grouped.ngroup().to_numpy()
 
-            cleaned_data = []
-            outlier_info = {}
-
-            for group_key, group_data in grouped:
-                # group_key อาจเป็น str หรือ tuple ขึ้นกับจำนวน key
-                if not isinstance(group_key, tuple):
-                    group_key = (group_key,)
-                group_data = group_data.copy()
-                original_count = len(group_data)
-
-                # ข้ามถ้าข้อมูลน้อยกว่า 15 จุด
-                if len(group_data) < 15:
-                    cleaned_data.append(group_data)
-                    outlier_info[group_key] = {
-                        'original_count': original_count,
-                        'removed_count': 0,
-                        'final_count': original_count
-                    }
-                    continue
-
-                # ใช้ IQR iteratively
-                current_data = group_data
-                max_iterations = 10
-                for _ in range(max_iterations):
-                    before_count = len(current_data)
-                    Q1 = current_data['uph'].quantile(0.25)
-                    Q3 = current_data['uph'].quantile(0.75)
-                    IQR = Q3 - Q1
-                    filtered_data = current_data[
-                        (current_data['uph'] >= Q1 - 1.5*IQR) &
-                        (current_data['uph'] <= Q3 + 1.5*IQR)
-                    ]
-                    after_count = len(filtered_data)
-                    if after_count == before_count or after_count < 5 or (before_count - after_count) / before_count > 0.5:
-                        break
-                    current_data = filtered_data
-
-                cleaned_data.append(current_data)
-                final_count = len(current_data)
-                outlier_info[group_key] = {
-                    'original_count': original_count,
-                    'removed_count': original_count - final_count,
-                    'final_count': final_count
-                }
-
-            result_df = pd.concat(cleaned_data) if cleaned_data else df
-            return result_df, outlier_info
+            # ใช้ IQR iteratively กับทุกกลุ่มพร้อมกัน (ข้ามกลุ่มที่ข้อมูลน้อยกว่า 15 จุด)
+            keep = outlier_engine.trim_iqr(df['uph'].to_numpy(dtype=float), codes, grouped.ngroups,
+                                           min_count=15, max_iter=10, min_keep=5, max_drop_ratio=0.5)
+            return self.kept_rows(df, grouped, codes, keep)
         except Exception as e:
             print(f"❌ Error in remove_outliers: {e}")
             return df, {}
+
+    def kept_rows(self, df, grouped, codes, keep):
+        """แถวที่เหลือหลังตัด outliers (เรียงตามกลุ่ม) และ outlier_info ต่อกลุ่มสำหรับ summarize_groups"""
+        rows = outlier_engine.sorted_group_order(codes, keep)
+
+        original_counts = np.bincount(codes, minlength=grouped.ngroups)
+        final_counts = np.bincount(codes[rows], minlength=grouped.ngroups)
+        group_index = grouped.size().index
+        outlier_info = {}
+        for group_key, original_count, final_count in zip(group_index, original_counts, final_counts):
+            # group_key อาจเป็น str หรือ tuple ขึ้นกับจำนวน key
+            if not isinstance(group_key, tuple):
+                group_key = (group_key,)
+            outlier_info[group_key] = {
+                'original_count': int(original_count),
+                'removed_count': int(original_count - final_count),
+                'final_count': int(final_count)
+            }
+        return df.iloc[rows], outlier_info
         
     def match_mat_size_with_optn_code(self, mat_size, optn_code):
         # ดึงขนาดลวดจาก optn_code เช่น "2.0MIL"
@@ -344,33 +390,74 @@ class WireBondingAnalyzer:
             missing_cols = [col for col in required_cols if col not in df.columns]
             if missing_cols:
                 raise KeyError(f"Missing required columns: {missing_cols}")
-            # ทำความสะอาดข้อมูล
-            df['uph'] = pd.to_numeric(df['uph'], errors='coerce')
-            df['bom_no'] = df['bom_no'].astype(str).str.strip().str.upper()
-            df = df.dropna(subset=['uph', 'bom_no'])
-            # กรองตามวันที่
             if start_date and end_date:
                 print(f"📅 Filtering by date: {start_date} - {end_date}")
-                date_cols = [col for col in df.columns if 'date' in col or 'time' in col]
-                for col in date_cols:
-                    try:
-                        df[col] = pd.to_datetime(df[col], errors='coerce')
-                        start_dt = pd.to_datetime(start_date)
-                        end_dt = pd.to_datetime(end_date)
-                        df = df[(df[col] >= start_dt) & (df[col] <= end_dt)]
-                        print(f"✅ Date filter applied: {len(df)} rows remaining")
-                        break
-                    except Exception:
-                        continue
-            df = self.clean_model_names(df)
+            df = self._clean_uph_rows(df, start_date, end_date)
+            if start_date and end_date:
+                print(f"✅ Date filter applied: {len(df)} rows remaining")
             self.wb_data = df
             return True
         except Exception as e:
             print(f"❌ Error in preprocess_data: {e}")
             return False
+
+    def _clean_uph_rows(self, df, start_date=None, end_date=None):
+        """ทำความสะอาด uph / bom_no กรองตามวันที่ และทำความสะอาดชื่อรุ่นเครื่อง (ใช้ทั้งแบบทั้งไฟล์และทีละ chunk)"""
+        df['uph'] = pd.to_numeric(df['uph'], errors='coerce')
+        df['bom_no'] = df['bom_no'].astype(str).str.strip().str.upper()
+        # copy: ผลกรองต้องไม่เป็น view ของ frame ของผู้เรียก (จะแปลงคอลัมน์วันที่ต่อ)
+        df = df.dropna(subset=['uph', 'bom_no']).copy()
+        # กรองตามวันที่
+        if start_date and end_date:
+            date_cols = [col for col in df.columns if 'date' in col or 'time' in col]
+            for col in date_cols:
+                try:
+                    df[col] = pd.to_datetime(df[col], errors='coerce')
+                    start_dt = pd.to_datetime(start_date)
+                    end_dt = pd.to_datetime(end_date)
+                    df = df[(df[col] >= start_dt) & (df[col] <= end_dt)]
+                    break
+                except Exception:
+                    continue
+        return self.clean_model_names(df)
     
+    def _join_map_values(self, keys):
+        """
+        ค่าในไฟล์ Map (แถวแรกที่ตรงกับคีย์ กฎเดียวกับ _map_record) ของทุกกลุ่มด้วย left join ครั้งเดียวกับ index ของไฟล์ Map
+        keys: DataFrame คีย์ของกลุ่ม (bom_no, bom_rev, package_code, device) คืน DataFrame คอลัมน์ MAP_VALUE_COLUMNS
+        (None = ไม่พบ) ตามลำดับแถวของ keys
+        """
+        n = len(keys)
+        columns = {c: np.full(n, None, dtype=object) for c in MAP_VALUE_COLUMNS}
+        map_df = self.nobump_df
+        if map_df is None or map_df.empty or 'bom_no' not in map_df.columns:
+            return pd.DataFrame(columns)
+        if getattr(self, '_map_index_source', None) is not map_df:
+            self._build_map_index()
+
+        # คีย์ของกลุ่ม -> คีย์ในไฟล์ Map (device = Product Number)
+        source = {'bom_rev': 'bom_rev', 'package_code': 'package_code', 'product_number': 'device'}
+        level = tuple(k for k in MAP_OPTIONAL_KEYS if source[k] in keys.columns and k in map_df.columns)
+        key_cols = ['bom_no'] + list(level)
+        left = pd.DataFrame({
+            k: keys['bom_no' if k == 'bom_no' else source[k]].astype(str).str.strip().str.upper().to_numpy()
+            for k in key_cols
+        })
+        index = self._map_index.get(level, {})
+        right = pd.DataFrame(
+            [key + (positions[0],) for key, positions in index.items()],
+            columns=key_cols + ['map_pos'],
+        )
+        positions = left.merge(right, on=key_cols, how='left')['map_pos'].to_numpy()
+        found = ~pd.isna(positions)
+        rows = positions[found].astype(np.int64)
+        for c, values in self._map_values.items():
+            columns[c][found] = values[rows]
+        return pd.DataFrame(columns)
+
     def calculate_efficiency(self, start_date=None, end_date=None):
-        """คำนวณประสิทธิภาพการทำงาน (พิจารณา Map ตาม BOM + REV + PKG + PRODUCT NUMBER)"""
+        """คำนวณประสิทธิภาพการทำงาน (พิจารณา Map ตาม BOM + REV + PKG + PRODUCT NUMBER)
+        ค่าเฉลี่ยต่อกลุ่มด้วย groupby ครั้งเดียว + left join กับไฟล์ Map แล้วคำนวณ WireCount / WPH / UPH ทั้งคอลัมน์"""
         try:
             print(f"🔄 Starting efficiency calculation...")
             if not self.preprocess_data(start_date=start_date, end_date=end_date):
@@ -384,101 +471,231 @@ class WireBondingAnalyzer:
                 return None
             print(f"📊 After outlier removal: {cleaned_data.shape}")
 
-            group_keys = ['bom_no', 'machine_model', 'optn_code', 'bom_rev', 'device', 'package_code']
-            group_keys = [k for k in group_keys if k in cleaned_data.columns]
-            grouped = cleaned_data.groupby(group_keys, dropna=False)
-
-            results = []
-            print(f"📊 Processing {len(grouped)} groups...")
-            for i, (key_tuple, group) in enumerate(grouped):
-                try:
-                    if i > 0 and i % 50 == 0:
-                        print(f"⏳ Progress: {i}/{len(grouped)} groups processed...")
-
-                    if not isinstance(key_tuple, tuple):
-                        key_tuple = (key_tuple,)
-                    key_dict = dict(zip(group_keys, key_tuple))
-                    bom_no       = key_dict.get('bom_no')
-                    model        = key_dict.get('machine_model')
-                    optn_code    = key_dict.get('optn_code')
-                    bom_rev      = key_dict.get('bom_rev')
-                    device       = key_dict.get('device')          # = Product Number
-                    package_code = key_dict.get('package_code')
-
-                    mean_uph = group['uph'].mean()
-                    count_after = len(group)  # กลุ่มหลังตัด outlier
-
-                    operation = group['operation'].iloc[0] if 'operation' in group.columns else 'WB'
-                    optn_code_val = optn_code if optn_code is not None else (group['optn_code'].iloc[0] if 'optn_code' in group.columns else 'N/A')
-
-                    # ดึงข้อมูลจากไฟล์ Map: ITEM_NO, NO_BUMP, NUMBER_REQUIRED
-                    item_no, no_bump, number_required = self.get_wire_info_for_bom_optn(
-                        bom_no,
-                        optn_code_val,
-                        bom_rev=bom_rev,
-                        package_code=package_code,
-                        product_number=device  # device = Product Number
-                    )
-
-                    # คำนวณ wire_per_unit และ UPH (จะเป็น None อัตโนมัติถ้า wire2 มีค่า เพราะ no_bump/number_required = None)
-                    wire_per_unit = None
-                    efficiency = None
-                    if (no_bump is not None) and (number_required is not None) and (not pd.isna(no_bump)) and (not pd.isna(number_required)):
-                        wire_per_unit = self.calculate_wire_per_unit(
-                            bom_no,
-                            optn_code_val,
-                            bom_rev=bom_rev,
-                            package_code=package_code,
-                            product_number=device
-                        )
-                        if wire_per_unit is not None and wire_per_unit > 0:
-                            efficiency = mean_uph / wire_per_unit
-
-                    outlier_data = outlier_info.get(tuple(key_dict.get(k) for k in group_keys), {
-                        'original_count': count_after,
-                        'removed_count': 0,
-                        'final_count': count_after
-                    })
-                    original_count = outlier_data.get('original_count', count_after)
-                    final_count = outlier_data.get('final_count', count_after)
-                    removed_count = outlier_data.get('removed_count', original_count - final_count)
-
-                    result_entry = {
-                        'Cust': str(bom_no)[:3],
-                        'Package Code': package_code,
-                        'Product Number': device,
-                        'Bom No': bom_no,
-                        'Bom Rev': bom_rev,
-                        'Machine Model': model,
-                        'Operation': operation,
-                        'Optn_Code': optn_code_val,
-                        'Item_No': item_no,
-                        '#OF BUMP': no_bump,
-                        '#OF WIRE': number_required,
-                        'Total WireCount': round(wire_per_unit, 2) if wire_per_unit is not None else None,
-                        'WPH': round(mean_uph, 2),
-                        'UPH': round(efficiency, 3) if efficiency is not None else None,
-                        'DataPoints_Before': original_count,
-                        'DataPoints_After': final_count,
-                        'Outliers_Removed': removed_count
-                    }
-                    results.append(result_entry)
-                except Exception as group_error:
-                    print(f"❌ Error processing group {key_tuple}: {group_error}")
-                    continue
-
-            if not results:
+            self.efficiency_df = self.summarize_groups(cleaned_data, outlier_info)
+            if self.efficiency_df.empty:
                 print(f"❌ No results generated")
                 return None
 
-            self.efficiency_df = pd.DataFrame(results)
-
             print(f"✅ Generated {len(self.efficiency_df)} results")
             return self.efficiency_df
         except Exception as e:
             print(f"❌ Error in calculate_efficiency: {e}")
             return None
-    
+
+    def summarize_groups(self, cleaned_data, outlier_info):
+        """ตารางผลลัพธ์ต่อกลุ่มจากข้อมูลหลังตัด outliers (ค่าเฉลี่ย + Map + WireCount / WPH / UPH)"""
+        group_keys = ['bom_no', 'machine_model', 'optn_code', 'bom_rev', 'device', 'package_code']
+        group_keys = [k for k in group_keys if k in cleaned_data.columns]
+        grouped = cleaned_data.groupby(group_keys, dropna=False)
+        print(f"📊 Processing {grouped.ngroups} groups...")
+
+        mean_uph = grouped['uph'].mean()
+        count_after = grouped.size().to_numpy()
+        key_tuples = [k if isinstance(k, tuple) else (k,) for k in mean_uph.index]
+        keys = mean_uph.index.to_frame(index=False)
+        mean_uph = mean_uph.to_numpy()
+
+        # แถวแรกของแต่ละกลุ่ม (ลำดับกลุ่มเดียวกับ groupby)
+        _, first_rows = np.unique(grouped.ngroup().to_numpy(), return_index=True)
+        if 'operation' in cleaned_data.columns:
+            operation = cleaned_data['operation'].to_numpy()[first_rows]
+        else:
+            operation = np.full(len(keys), 'WB', dtype=object)
+        if 'optn_code' in keys.columns:
+            optn_code = keys['optn_code'].to_numpy(dtype=object)
+        else:
+            optn_code = np.full(len(keys), 'N/A', dtype=object)
+
+        # ดึงข้อมูลจากไฟล์ Map: ITEM_NO, NO_BUMP, NUMBER_REQUIRED (ถ้า wire2 มีค่า > 0 ให้ blank no_bump/number_required)
+        map_values = self._join_map_values(keys)
+        wire2 = pd.to_numeric(map_values['number_required_2'].astype(str).str.strip(), errors='coerce').to_numpy() > 0
+        item_no = map_values['item_no'].to_numpy()
+        no_bump = np.where(wire2, None, map_values['no_bump'].to_numpy())
+        number_required = np.where(wire2, None, map_values['number_required'].to_numpy())
+
+        # wire_per_unit = no_bump / 2 + number_required (เฉพาะค่า > 0) และ UPH = WPH / wire_per_unit
+        wire_per_unit = (pd.to_numeric(pd.Series(no_bump), errors='coerce').to_numpy(dtype=float) / 2.0
+                         + pd.to_numeric(pd.Series(number_required), errors='coerce').to_numpy(dtype=float))
+        has_wire = wire_per_unit > 0
+        with np.errstate(invalid='ignore', divide='ignore'):
+            efficiency = np.round(mean_uph / wire_per_unit, 3)
+
+        original_count, final_count, removed_count = [], [], []
+        for key_tuple, count in zip(key_tuples, count_after):
+            outlier_data = outlier_info.get(key_tuple, {
+                'original_count': count,
+                'removed_count': 0,
+                'final_count': count
+            })
+            original_count.append(outlier_data.get('original_count', count))
+            final_count.append(outlier_data.get('final_count', count))
+            removed_count.append(outlier_data.get('removed_count', original_count[-1] - final_count[-1]))
+
+        def key_column(k):
+            return keys[k].tolist() if k in keys.columns else [None] * len(keys)
+
+        def optional(values, mask):
+            return [v if m else None for v, m in zip(values, mask)]
+
+        return pd.DataFrame({
+            'Cust': [str(b)[:3] for b in keys['bom_no'].tolist()],
+            'Package Code': key_column('package_code'),
+            'Product Number': key_column('device'),
+            'Bom No': key_column('bom_no'),
+            'Bom Rev': key_column('bom_rev'),
+            'Machine Model': key_column('machine_model'),
+            'Operation': list(operation),
+            'Optn_Code': list(optn_code),
+            'Item_No': list(item_no),
+            '#OF BUMP': list(no_bump),
+            '#OF WIRE': list(number_required),
+            'Total WireCount': [round(v, 2) if ok else None for v, ok in zip(wire_per_unit.tolist(), has_wire)],
+            'WPH': list(np.round(mean_uph, 2)),
+            'UPH': optional(list(efficiency), has_wire),
+            'DataPoints_Before': original_count,
+            'DataPoints_After': final_count,
+            'Outliers_Removed': removed_count
+        })
+
+    def iter_uph_chunks(self, uph_path, chunk_rows=CHUNK_ROWS):
+        """
+        อ่านไฟล์ UPH ทีละ chunk (ชื่อคอลัมน์ปรับแล้ว) โดยไม่โหลดทั้งไฟล์
+        csv ใช้ read_csv(chunksize), xlsx ใช้ openpyxl แบบ read-only (sheet แรก), xls / json อ่านทั้งไฟล์แล้วแบ่ง
+        """
+        ext = os.path.splitext(uph_path)[-1].lower()
+        if ext == '.csv':
+            for chunk in pd.read_csv(uph_path, encoding='utf-8-sig', chunksize=chunk_rows):
+                yield self._normalize_uph_columns(chunk)
+        elif ext == '.xlsx':
+            from openpyxl import load_workbook
+            wb = load_workbook(uph_path, read_only=True, data_only=True)
+            try:
+                rows = wb.worksheets[0].iter_rows(values_only=True)
+                header = next(rows, None)
+                if header is None:
+                    return
+                columns = [str(h) if h is not None else f"Unnamed: {i}" for i, h in enumerate(header)]
+                batch = []
+                for row in rows:
+                    # ข้ามแถวว่าง เหมือน pandas.read_excel
+                    if all(v is None for v in row):
+                        continue
+                    batch.append(row[:len(columns)])
+                    if len(batch) >= chunk_rows:
+                        yield self._normalize_uph_columns(self._excel_rows_frame(batch, columns))
+                        batch = []
+                if batch:
+                    yield self._normalize_uph_columns(self._excel_rows_frame(batch, columns))
+            finally:
+                wb.close()
+        elif ext in ['.xls', '.json']:
+            df = pd.read_excel(uph_path) if ext == '.xls' else pd.read_json(uph_path)
+            df = self._normalize_uph_columns(df)
+            for start in range(0, len(df), chunk_rows):
+                yield df.iloc[start:start + chunk_rows].copy()
+        else:
+            raise ValueError(f"Unsupported file type: {ext}")
+
+    def _excel_rows_frame(self, rows, columns):
+        # เซลล์ว่างเป็น NaN แบบเดียวกับ pandas.read_excel (openpyxl คืน None)
+        return pd.DataFrame(rows, columns=columns).fillna(np.nan)
+
+    def _spill_chunks(self, uph_path, work_dir, start_date, end_date, chunk_rows, n_partitions, stats):
+        """
+        อ่านทีละ chunk -> ทำความสะอาด / กรองวันที่ -> เขียนแถวลง partition บนดิสก์ตาม hash ของ bom_no
+        (ทุกแถวของกลุ่มเดียวกันอยู่ partition เดียวกัน) คืน (ไฟล์ของแต่ละ partition, ชนิดคอลัมน์ของทุก chunk)
+        """
+        partition_files = [[] for _ in range(n_partitions)]
+        dtypes = {}
+        paths = [uph_path] if isinstance(uph_path, str) else list(uph_path)
+        chunks = itertools.chain.from_iterable(self.iter_uph_chunks(path, chunk_rows) for path in paths)
+        for chunk in chunks:
+            # ตรวจทุก chunk (ไฟล์ถัดไปในรายการอาจมีคอลัมน์ไม่ครบ)
+            missing_cols = [col for col in ['uph', 'machine_model', 'bom_no'] if col not in chunk.columns]
+            if missing_cols:
+                raise KeyError(f"Missing required columns: {missing_cols}")
+            stats['chunks'] += 1
+            stats['rows_read'] += len(chunk)
+            stats['chunk_peak_mb'] = max(stats['chunk_peak_mb'], _frame_mb(chunk))
+            for col, dtype in chunk.dtypes.items():
+                dtypes.setdefault(col, set()).add(dtype)
+
+            df = self._clean_uph_rows(chunk, start_date, end_date)
+            df = df[[c for c in SPILL_COLUMNS if c in df.columns]]
+            stats['rows_kept'] += len(df)
+            if df.empty:
+                continue
+            part_ids = pd.util.hash_pandas_object(df['bom_no'], index=False).to_numpy() % n_partitions
+            for pid in np.unique(part_ids):
+                path = os.path.join(work_dir, f"part{pid:03d}_{stats['chunks']:05d}.pkl")
+                df[part_ids == pid].to_pickle(path)
+                partition_files[pid].append(path)
+            print(f"⏳ Chunk {stats['chunks']}: {stats['rows_read']:,} rows read, {stats['rows_kept']:,} kept")
+        return partition_files, dtypes
+
+    def calculate_efficiency_chunked(self, uph_path, start_date=None, end_date=None, chunk_rows=CHUNK_ROWS,
+                                     n_partitions=SPILL_PARTITIONS, spill_dir=None, track_memory=False):
+        """
+        คำนวณประสิทธิภาพแบบ out-of-core สำหรับไฟล์ UPH ขนาดใหญ่ (ผลลัพธ์เดียวกับ load_data + calculate_efficiency)
+        ข้อมูลถูกแบ่ง partition บนดิสก์ตาม bom_no แล้วตัด outliers (IQR แบบเต็ม) + สรุปผลทีละ partition
+        หน่วยความจำสูงสุดประมาณ max(chunk, partition ที่ใหญ่ที่สุด) บันทึกใน self.chunk_stats
+        (track_memory=True วัด peak จริงด้วย tracemalloc ซึ่งทำให้ช้าลง) ต้องโหลด Wire data ก่อน
+        uph_path เป็น list ได้: อ่านทุกไฟล์ต่อกันเป็นชุดข้อมูลเดียว
+        """
+        print(f"🔄 Starting chunked efficiency calculation ({chunk_rows:,} rows/chunk, {n_partitions} partitions)...")
+        stats = {'chunks': 0, 'rows_read': 0, 'rows_kept': 0, 'groups': 0,
+                 'chunk_peak_mb': 0.0, 'partition_peak_mb': 0.0, 'traced_peak_mb': None}
+        self.chunk_stats = stats
+        work_dir = tempfile.mkdtemp(prefix="wb_chunks_", dir=spill_dir)
+        if track_memory:
+            tracemalloc.start()
+        try:
+            partition_files, dtypes = self._spill_chunks(
+                uph_path, work_dir, start_date, end_date, chunk_rows, n_partitions, stats)
+            if stats['rows_kept'] == 0:
+                print(f"❌ No data after preprocessing")
+                return None
+
+            tables = []
+            for files in partition_files:
+                if not files:
+                    continue
+                part = pd.concat([pd.read_pickle(f) for f in files], ignore_index=True)
+                for f in files:
+                    os.remove(f)
+                for col in PASS_THROUGH_COLUMNS:
+                    if col in part.columns and col in dtypes:
+                        dtype = _common_dtype(dtypes[col])
+                        if part[col].dtype != dtype:
+                            part[col] = part[col].astype(dtype)
+                stats['partition_peak_mb'] = max(stats['partition_peak_mb'], _frame_mb(part))
+                cleaned_data, outlier_info = self.remove_outliers(part)
+                tables.append(self.summarize_groups(cleaned_data, outlier_info))
+                del part, cleaned_data
+
+            # เรียงกลุ่มแบบเดียวกับ groupby ของทั้งไฟล์ แล้วสร้างตารางใหม่ให้ชนิดคอลัมน์เหมือน summarize_groups
+            result = pd.concat(tables, ignore_index=True)
+            order_cols = ['Bom No', 'Machine Model', 'Optn_Code', 'Bom Rev', 'Product Number', 'Package Code']
+            order = result.groupby(order_cols, dropna=False, sort=True).ngroup().to_numpy()
+            result = result.iloc[np.argsort(order, kind='stable')]
+            self.efficiency_df = pd.DataFrame({c: result[c].tolist() for c in result.columns})
+            stats['groups'] = len(self.efficiency_df)
+            if track_memory:
+                stats['traced_peak_mb'] = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+        except Exception as e:
+            print(f"❌ Error in calculate_efficiency_chunked: {e}")
+            return None
+        finally:
+            if track_memory:
+                tracemalloc.stop()
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        print(f"🧠 Memory ceiling: chunk {stats['chunk_peak_mb']:.1f} MB, "
+              f"largest partition {stats['partition_peak_mb']:.1f} MB"
+              + (f", traced peak {stats['traced_peak_mb']:.1f} MB" if stats['traced_peak_mb'] is not None else ""))
+        print(f"✅ Generated {stats['groups']} results from {stats['rows_read']:,} rows ({stats['chunks']} chunks)")
+        return self.efficiency_df
+
     def export_to_excel(self, file_path=None):
         """ส่งออกผลลัพธ์เป็น Excel"""
         try:
@@ -664,7 +881,15 @@ def run(input_dir, output_dir, uph_filename=None, wire_filename=None, **kwargs):
         start_date = kwargs.get('start_date', None)
         end_date = kwargs.get('end_date', None)
 
+        # chunk_rows: ประมวลผลไฟล์ UPH ทีละ chunk (ไฟล์ขนาดใหญ่ที่โหลดทั้งไฟล์ไม่ไหว)
+        chunk_rows = kwargs.get('chunk_rows', None)
+        # wire_data: analyzer ที่โหลด Wire Data แล้ว (ใช้ร่วมกัน ไม่อ่าน Part bom pkg ใหม่)
+        wire_data = kwargs.get('wire_data', None)
+        output_filename = kwargs.get('output_filename', None) or "WB_AUTO_UPH_RESULT.xlsx"
+
         analyzer = WireBondingAnalyzer()
+        if wire_data is not None:
+            analyzer.share_wire_data(wire_data)
 
         # สร้าง path ของไฟล์
         uph_file = os.path.join(input_dir, uph_filename)
@@ -674,19 +899,29 @@ def run(input_dir, output_dir, uph_filename=None, wire_filename=None, **kwargs):
         # ตรวจสอบไฟล์
         if not os.path.exists(uph_file):
             raise Exception(f"ไม่พบไฟล์ UPH: {uph_file}")
-        if not os.path.exists(wire_file):
+        if wire_data is None and not os.path.exists(wire_file):
             raise Exception(f"ไม่พบไฟล์ Wire Data: {wire_file}")
         print(f"✅ Files validated")
-        # โหลดข้อมูล
-        if not analyzer.load_data(uph_file, wire_file):
-            raise Exception("โหลดข้อมูลไม่สำเร็จ")
-        # คำนวณประสิทธิภาพ
-        efficiency_df = analyzer.calculate_efficiency(start_date=start_date, end_date=end_date)
+        if chunk_rows:
+            if wire_data is None and not analyzer.load_wire_data(wire_file):
+                raise Exception("โหลดข้อมูลไม่สำเร็จ")
+            efficiency_df = analyzer.calculate_efficiency_chunked(
+                uph_file, start_date=start_date, end_date=end_date, chunk_rows=chunk_rows)
+        else:
+            # โหลดข้อมูล
+            if wire_data is not None:
+                loaded = analyzer.load_uph_data(uph_file)
+            else:
+                loaded = analyzer.load_data(uph_file, wire_file)
+            if not loaded:
+                raise Exception("โหลดข้อมูลไม่สำเร็จ")
+            # คำนวณประสิทธิภาพ
+            efficiency_df = analyzer.calculate_efficiency(start_date=start_date, end_date=end_date)
         if efficiency_df is None or efficiency_df.empty:
             raise Exception("คำนวณประสิทธิภาพไม่สำเร็จ")
         # สร้างโฟลเดอร์ output
         os.makedirs(output_dir, exist_ok=True)
-        output_path = os.path.join(output_dir, "WB_AUTO_UPH_RESULT.xlsx")
+        output_path = os.path.join(output_dir, output_filename)
         # Export ไฟล์
         if not analyzer.export_to_excel(output_path):
             raise Exception("ส่งออกไฟล์ไม่สำเร็จ")
@@ -698,22 +933,168 @@ def run(input_dir, output_dir, uph_filename=None, wire_filename=None, **kwargs):
         print(f"❌ WB_AUTO_UPH failed: {e}")
         raise e
 
-def WB_AUTO_UPH(input_path, output_dir, start_date=None, end_date=None):
-    """ฟังก์ชัน WB_AUTO_UPH หลัก"""
+# === หลายไฟล์: โหลด Wire Data ครั้งเดียว แล้วประมวลผลไฟล์ UPH แบบขนาน ===
+# worker แต่ละตัวได้ Wire Data ผ่าน initializer ครั้งเดียว (fork: ใช้หน่วยความจำร่วมกันแบบ copy-on-write)
+_shared_wire_data = None
+
+def _init_wire_worker(wire_data):
+    global _shared_wire_data
+    _shared_wire_data = wire_data
+
+def _run_shared(task):
+    uph_file, output_dir, output_filename, start_date, end_date, chunk_rows = task
+    return run(os.path.dirname(uph_file), output_dir, uph_filename=os.path.basename(uph_file),
+               output_filename=output_filename, wire_data=_shared_wire_data,
+               start_date=start_date, end_date=end_date, chunk_rows=chunk_rows)
+
+def _load_uph_frame(uph_file):
+    analyzer = WireBondingAnalyzer()
+    if not analyzer.load_uph_data(uph_file):
+        raise Exception(f"โหลดไฟล์ UPH ไม่สำเร็จ: {os.path.basename(uph_file)}")
+    return analyzer.raw_data
+
+def result_filenames(uph_files):
+    """ชื่อไฟล์ผลลัพธ์ของแต่ละไฟล์ UPH (WB_AUTO_UPH_RESULT_<ชื่อไฟล์>.xlsx ชื่อซ้ำจะเติมลำดับ)"""
+    names, seen = [], {}
+    for path in uph_files:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        seen[stem] = seen.get(stem, 0) + 1
+        suffix = stem if seen[stem] == 1 else f"{stem}_{seen[stem]}"
+        names.append(f"WB_AUTO_UPH_RESULT_{suffix}.xlsx")
+    return names
+
+def run_many(uph_files, output_dir, start_date=None, end_date=None, chunk_rows=None, combine=False, workers=None,
+             wire_file=None):
+    """
+    ประมวลผลหลายไฟล์ UPH โดยโหลด Part bom pkg (และ index) ครั้งเดียว
+    combine=False: แยกผลลัพธ์ต่อไฟล์ (ประมวลผลขนานด้วย process pool) คืน list ของ path
+    combine=True: รวมทุกไฟล์เป็นชุดข้อมูลเดียว (โหลดไฟล์ขนาน) คืน path ผลลัพธ์เดียว
+    workers: จำนวน process (ค่าเริ่มต้น = logview.DEFAULT_WORKERS ไม่เกินจำนวนไฟล์)
+    """
+    if not uph_files:
+        raise Exception("ไม่มีไฟล์ในรายการ")
+    start = datetime.now()
+    wire_data = WireBondingAnalyzer()
+    if not wire_data.load_wire_data(wire_file):
+        raise Exception("โหลดข้อมูล Wire Data ไม่สำเร็จ")
+    workers = resolve_workers(workers, len(uph_files))
+
+    if not combine:
+        tasks = [(path, output_dir, name, start_date, end_date, chunk_rows)
+                 for path, name in zip(uph_files, result_filenames(uph_files))]
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_wire_worker,
+                                     initargs=(wire_data,)) as executor:
+                result_paths = list(executor.map(_run_shared, tasks))
+        else:
+            _init_wire_worker(wire_data)
+            result_paths = [_run_shared(task) for task in tasks]
+        print(f"📊 ประมวลผล {len(result_paths)} ไฟล์ ({(datetime.now() - start).total_seconds():.2f} วินาที, workers: {workers})")
+        return result_paths
+
+    analyzer = WireBondingAnalyzer().share_wire_data(wire_data)
+    if chunk_rows:
+        efficiency_df = analyzer.calculate_efficiency_chunked(
+            uph_files, start_date=start_date, end_date=end_date, chunk_rows=chunk_rows)
+    else:
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                frames = list(executor.map(_load_uph_frame, uph_files))
+        else:
+            frames = [_load_uph_frame(path) for path in uph_files]
+        analyzer.raw_data = pd.concat(frames, ignore_index=True, sort=False) if len(frames) > 1 else frames[0]
+        print(f"📊 รวม {len(frames)} ไฟล์: {len(analyzer.raw_data):,} แถว (workers: {workers})")
+        efficiency_df = analyzer.calculate_efficiency(start_date=start_date, end_date=end_date)
+    if efficiency_df is None or efficiency_df.empty:
+        raise Exception("คำนวณประสิทธิภาพไม่สำเร็จ")
+    os.makedirs(output_dir, exist_ok=True)
+    output_path = os.path.join(output_dir, "WB_AUTO_UPH_RESULT.xlsx")
+    if not analyzer.export_to_excel(output_path):
+        raise Exception("ส่งออกไฟล์ไม่สำเร็จ")
+    print(f"📊 รวม {len(uph_files)} ไฟล์เป็นผลลัพธ์เดียว ({(datetime.now() - start).total_seconds():.2f} วินาที)")
+    return output_path
+
+def tune_outliers(input_path, start_date=None, end_date=None, params=None):
+    """
+    what-if: ตัด outliers (IQR ซ้ำ) ใหม่ด้วย params (iqr_k, min_count, max_iter, min_keep, max_drop_ratio)
+    ใช้ไฟล์ UPH เดียวกับที่แสดงผล (ไฟล์แรกถ้าเลือกหลายไฟล์) คืน (ตารางแบบเดียวกับ UPH_Results, วินาที)
+    """
+    uph_path = input_path[0] if isinstance(input_path, list) else input_path
+    key = ('WB', outlier_tuning.file_key(uph_path), start_date, end_date)
+
+    def builder():
+        analyzer = WireBondingAnalyzer()
+        if not analyzer.load_data(uph_path) or not analyzer.preprocess_data(start_date, end_date):
+            raise Exception("โหลดข้อมูลไม่สำเร็จ")
+        df = analyzer.wb_data
+        # คีย์กลุ่มเดียวกับ remove_outliers
+        group_keys = ['bom_no', 'machine_model', 'optn_code', 'bom_rev', 'device', 'package_code']
+        group_keys = [k for k in group_keys if k in df.columns]
+        grouped = df.groupby(group_keys, dropna=False)
+        codes = grouped.ngroup().to_numpy()
+
+        # ผลลัพธ์ผ่าน summarize_groups เหมือน calculate_efficiency (Map + WireCount / WPH / UPH)
+        def summarize(keep):
+            return analyzer.summarize_groups(*analyzer.kept_rows(df, grouped, codes, keep))
+
+        return outlier_tuning.build_session('iqr', df, group_keys, 'uph', dropna=False, summarize=summarize)
+
+    return outlier_tuning.run_what_if(key, builder, params)
+
+def run_from_store(input_path, output_dir, store_path, start_date=None, end_date=None):
+    """รัน WB_AUTO_UPH จากคลังข้อมูล UPH (เพิ่มไฟล์ใหม่ใน input_path เข้าคลังก่อน ไฟล์ที่เคยเพิ่มแล้วไม่อ่านซ้ำ)"""
+    print(f"🚀 Starting WB_AUTO_UPH execution (store: {store_path})...")
+    analyzer = WireBondingAnalyzer()
+    store = uph_store.UphStore(store_path)
+    paths = [input_path] if isinstance(input_path, str) else list(input_path or [])
+    paths = [f for f in paths if os.path.isfile(f)]
+
+    def read_file(path):
+        if not analyzer.load_uph_data(path):
+            raise Exception(f"โหลดข้อมูลไม่สำเร็จ: {path}")
+        return analyzer.raw_data, analyzer.find_date_column(analyzer.raw_data), None
+
+    uph_store.append_files(store, 'WB', paths, read_file)
+    if not analyzer.load_wire_data():
+        raise Exception("โหลดข้อมูลไม่สำเร็จ")
+    analyzer.raw_data = store.load_window('WB', start_date, end_date)
+    print(f"✅ UPH data loaded from store: {len(analyzer.raw_data)} rows")
+
+    efficiency_df = analyzer.calculate_efficiency(start_date=start_date, end_date=end_date)
+    if efficiency_df is None or efficiency_df.empty:
+        raise Exception("คำนวณประสิทธิภาพไม่สำเร็จ")
+    os.makedirs(output_dir, exist_ok=True)
+    output_path = os.path.join(output_dir, "WB_AUTO_UPH_RESULT.xlsx")
+    if not analyzer.export_to_excel(output_path):
+        raise Exception("ส่งออกไฟล์ไม่สำเร็จ")
+    print(f"✅ WB_AUTO_UPH completed successfully!")
+    return output_path
+
+def WB_AUTO_UPH(input_path, output_dir, start_date=None, end_date=None, store_path=None, chunk_rows=None,
+                combine=False, workers=None):
+    """ฟังก์ชัน WB_AUTO_UPH หลัก (store_path: ใช้คลังข้อมูล UPH แทนการอ่านไฟล์ดิบทุกครั้ง
+    chunk_rows: อ่านและประมวลผลไฟล์ UPH ทีละ chunk สำหรับไฟล์ขนาดใหญ่
+    หลายไฟล์: โหลด Part bom pkg ครั้งเดียวแล้วประมวลผลขนาน (workers) combine=True รวมทุกไฟล์เป็นผลลัพธ์เดียว)"""
     try:
+        if store_path:
+            return run_from_store(input_path, output_dir, store_path, start_date, end_date)
+
         # กรณีที่เป็น list ของไฟล์
         if isinstance(input_path, list):
+            files = [f for f in input_path if os.path.isfile(f)]
+            if len(files) > 1:
+                return run_many(files, output_dir, start_date=start_date, end_date=end_date,
+                                chunk_rows=chunk_rows, combine=combine, workers=workers)
             result_paths = []
-            for f in input_path:
-                if os.path.isfile(f):
-                    input_dir = os.path.dirname(f)
-                    uph_filename = os.path.basename(f)
-                    result_path = run(input_dir, output_dir, uph_filename=uph_filename, 
-                                    start_date=start_date, end_date=end_date)
-                    
-                    # เพิ่ม mapping
-                    #mapped_path = map_data(result_path)
-                    result_paths.append(result_path)
+            for f in files:
+                input_dir = os.path.dirname(f)
+                uph_filename = os.path.basename(f)
+                result_path = run(input_dir, output_dir, uph_filename=uph_filename, 
+                                start_date=start_date, end_date=end_date, chunk_rows=chunk_rows)
+                
+                # เพิ่ม mapping
+                #mapped_path = map_data(result_path)
+                result_paths.append(result_path)
 
             return result_paths[0] if len(result_paths) == 1 else result_paths
 
@@ -726,7 +1107,7 @@ def WB_AUTO_UPH(input_path, output_dir, start_date=None, end_date=None):
             input_dir = os.path.dirname(input_path)
             uph_filename = os.path.basename(input_path)
             result_path = run(input_dir, output_dir, uph_filename=uph_filename, 
-                            start_date=start_date, end_date=end_date)
+                            start_date=start_date, end_date=end_date, chunk_rows=chunk_rows)
             
             # เพิ่ม mapping
             #mapped_path = map_data(result_path)
@@ -0,0 +1,41 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# ให้ import functions.* ได้เหมือนตอนรันจาก Webapp/src
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+
+def make_uph_frame(seed, n_rows=1500):
+    """ข้อมูล UPH สังเคราะห์แบบไฟล์ DA / WB (มีค่าว่างในคีย์กลุ่มและ UPH)"""
+    rng = np.random.default_rng(seed)
+
+    def pick(values, blank=0.0):
+        column = pd.Series(rng.choice(values, n_rows), dtype=object)
+        column[rng.random(n_rows) < blank] = np.nan
+        return column
+
+    df = pd.DataFrame({
+        'date_time_start': (pd.Timestamp('2024-01-01')
+                            + pd.to_timedelta(rng.integers(0, 90 * 24 * 3600, n_rows), unit='s')),
+        'bom_no': pick(['ONS2072P', 'ISL0451P', 'MCH2679P'], blank=0.05),
+        'operation': pick(['DIE ATTACH', 'WIRE BOND']),
+        'optn_code': pick(['D/A-DAF-TP', '2.0MIL AU', 'DA-SCR/P-TP'], blank=0.1),
+        'Machine_Model': pick(['2008 HS PLUS', 'ESEC 2100', 'IHAWK XTREME']),
+        'device': pick(['MCP6402T-E/MNY', 'TD9146PS.E1.0'], blank=0.05),
+        'package_code': pick(['TD-200E300B008P', 'MS-7BP17B0601AN']),
+        'bom_rev': pick(['A', 'D'], blank=0.05),
+        'UPH': rng.normal(4000, 600, n_rows).round(3),
+    })
+    df.loc[rng.random(n_rows) < 0.02, 'UPH'] = np.nan
+    return df
+
+
+@pytest.fixture
+def uph_file(tmp_path):
+    path = tmp_path / 'uph.xlsx'
+    make_uph_frame(0).to_excel(path, index=False)
+    return str(path)
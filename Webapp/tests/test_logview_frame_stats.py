@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from functions import logview, logview_benchmark
+
+
+# ---------- ขั้นตอนสถิติรายเฟรมแบบเดิม (วนทีละกลุ่ม/ทีละแถว) ใช้เป็นค่าอ้างอิง ----------
+
+def mark_outlier_subgroups(df, subgroup_col='subgroup_id', no_strip_col='No_strip'):
+    outlier_groups = []
+    for subgroup, group_df in df.groupby(subgroup_col):
+        if 1 not in group_df[no_strip_col].values:
+            outlier_groups.append(subgroup)
+    df['outlier_subgroup'] = df[subgroup_col].isin(outlier_groups)
+    return df
+
+
+def detect_outliers_combined(df, group_col='frame', value_col='seconds', no_strip_col='No_strip',
+                             iqr_factor=1, zscore_threshold=2, min_diff_seconds=90):
+    df['is_outlier'] = False
+    df_filtered = df[~((df[no_strip_col] == 2) & (df[no_strip_col].shift(-1) == 1))]
+    for group_name, group in df_filtered.groupby(group_col):
+        values = group[value_col].dropna().values
+        if len(values) == 0:
+            continue
+        median = np.median(values)
+        q1 = np.percentile(values, 25)
+        q3 = np.percentile(values, 75)
+        iqr = q3 - q1
+        upper_bound = q3 + iqr_factor * iqr
+        mean = np.mean(values)
+        std = np.std(values)
+        for idx in group.index:
+            val = df.loc[idx, value_col]
+            if pd.isna(val):
+                continue
+            if val > upper_bound and abs(val - median) > min_diff_seconds:
+                df.at[idx, 'is_outlier'] = True
+            elif std > 0:
+                z_score = (val - mean) / std
+                if z_score > zscore_threshold and abs(val - mean) > min_diff_seconds:
+                    df.at[idx, 'is_outlier'] = True
+    return df
+
+
+def add_avg_exclude_outliers_by_frame(df, value_col='seconds', group_col='frame', outlier_col='is_outlier',
+                                      outlier_subgroup_col='outlier_subgroup', outlier_mc='MC'):
+    df['avg_ex_outliers'] = pd.NA
+    df['count_avg'] = pd.NA
+    df['count_outliers'] = pd.NA
+    for frame_val in df[group_col].dropna().unique():
+        group_df = df[df[group_col] == frame_val]
+        good_values = group_df[(group_df[outlier_col] != True) & (group_df[outlier_subgroup_col] != True)
+                               & (group_df[outlier_mc] != 'MC error')][value_col].dropna()
+        if len(good_values) < 5:
+            continue
+        avg_val = good_values.mean()
+        count_avg_val = len(good_values)
+        count_all = group_df[value_col].count()
+        idx = df[df[group_col] == frame_val].index
+        if len(idx) > 0:
+            first_idx = idx[0]
+            df.at[first_idx, 'avg_ex_outliers'] = round(avg_val, 2)
+            df.at[first_idx, 'count_avg'] = count_avg_val
+            df.at[first_idx, 'count_outliers'] = count_all - count_avg_val
+    return df
+
+
+def frame_input(path):
+    """ข้อมูลก่อนขั้นตอนสถิติรายเฟรม (ขั้นตอนเดียวกับ analyze_single_file)"""
+    df = logview.load_and_parse_file(path)
+    df_pro = logview.mark_errors(df, logview.extract_pro_and_speed(df))
+    value_cols = [col for col in df_pro.columns if col.startswith('value_')][:1]
+    selected_cols = ['date', 'time', 'step', 'package', 'frame', 'No_strip'] + value_cols + ['speed', 'MC']
+    df_pro = df_pro[[col for col in selected_cols if col in df_pro.columns]]
+    df_time = logview.calculate_time_diff(logview.insert_blank_rows(df_pro))
+    df_time['frame'] = df_time['frame'].astype(str).str.strip()
+    for col in ['speed', 'value_1', 'No_strip']:
+        if col in df_time.columns:
+            df_time[col] = pd.to_numeric(df_time[col], errors='coerce')
+    df_filtered = df_time[df_time['frame'].notna()]
+    return logview.assign_subgroups_and_insert_empty_rows(df_filtered, 'No_strip', 'frame')
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2, 3])
+def test_frame_statistics_match_per_frame_loops(tmp_path, seed):
+    # seed=2: เฟรม F19ZYZ มีค่าเฉลี่ย 52.225 (ปัดแบบ numpy ได้ 52.22)
+    path = tmp_path / f'log_{seed}.txt'
+    logview_benchmark.generate_log(str(path), 6000, seed=seed)
+    df = frame_input(str(path))
+
+    expected = mark_outlier_subgroups(df.copy(), 'subgroup_id', 'No_strip')
+    expected = detect_outliers_combined(expected, 'frame', 'seconds', 'No_strip')
+    expected = add_avg_exclude_outliers_by_frame(expected, value_col='seconds', group_col='frame')
+    result = logview.compute_frame_statistics(df.copy(), 'frame', 'seconds', 'No_strip', 'subgroup_id')
+
+    columns = ['outlier_subgroup', 'is_outlier', 'avg_ex_outliers', 'count_avg', 'count_outliers']
+    assert result['avg_ex_outliers'].notna().any()
+    for col in columns:
+        assert result[col].tolist() == expected[col].tolist(), col
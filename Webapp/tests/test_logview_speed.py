@@ -0,0 +1,65 @@
+import os
+
+import pandas as pd
+import pytest
+
+from functions import logview, logview_benchmark
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+
+def forward_scan_speed(df):
+    """extract_pro_and_speed แบบเดิม (วนหา CUC ตัวถัดไปทีละแถว) ใช้เป็นค่าอ้างอิง"""
+    df_pro = df[df['step'] == 'PRO'].copy()
+    df_pro['speed'] = None
+    for idx in df_pro.index:
+        speed_value = None
+        pos = df.index.get_loc(idx)
+        for j in range(pos + 1, len(df)):
+            if df.loc[df.index[j], 'step'] == 'CUC':
+                if 'value_5' in df.columns and len(df.columns) > df.columns.get_loc('value_5'):
+                    speed_value = df.loc[df.index[j], 'value_5']
+                break
+        df_pro.at[idx, 'speed'] = speed_value
+    df_pro['speed'] = pd.to_numeric(df_pro['speed'], errors='coerce')
+    df_pro['speed'] = df_pro['speed'] / 10 / 25.4
+    df_pro['speed'] = df_pro['speed'].apply(lambda x: int(x) if x % 1 == 0 else round(x, 2))
+    return df_pro
+
+
+def assert_same_speed(df):
+    expected = forward_scan_speed(df)
+    result = logview.extract_pro_and_speed(df)
+    pd.testing.assert_series_equal(result['speed'], expected['speed'], check_exact=True)
+    return result
+
+
+def test_sample_log_matches_forward_scan():
+    # PRO ท้ายไฟล์ไม่มี CUC, PRO ติดกันหลายตัวก่อน CUC, CUC ที่ value_5 ไม่ใช่ตัวเลข / ไม่มี value_5
+    df = logview.load_and_parse_file(os.path.join(DATA_DIR, 'singulation_sample.log'))
+    result = assert_same_speed(df)
+    speed = result['speed'].tolist()
+    assert speed[:6] == [10, 10, 3.94, 3.94, 3.94, 3.94]
+    assert result['speed'].isna().sum() == 4
+    assert result['speed'].iloc[-2:].isna().all()
+
+
+def test_all_integer_speeds_keep_int_dtype():
+    df = logview.load_and_parse_file(os.path.join(DATA_DIR, 'singulation_sample.log'))
+    # เฉพาะ lot แรก: PRO ทุกตัวได้ speed จาก CUC เดียวกัน (2540 -> 10)
+    df = df.iloc[:3].reset_index(drop=True)
+    result = assert_same_speed(df)
+    assert result['speed'].dtype == 'int64'
+
+
+def test_no_cuc_rows():
+    df = logview.load_and_parse_file(os.path.join(DATA_DIR, 'singulation_sample.log'))
+    assert_same_speed(df[df['step'] != 'CUC'].reset_index(drop=True))
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_generated_logs_match_forward_scan(tmp_path, seed):
+    path = tmp_path / f'log_{seed}.txt'
+    logview_benchmark.generate_log(str(path), 3000, seed=seed)
+    df = logview.load_and_parse_file(str(path))
+    assert_same_speed(df)
@@ -0,0 +1,40 @@
+import pandas as pd
+
+from functions import logview_benchmark, logview_stream
+
+
+def generate_logs(tmp_path, seeds=(0, 1)):
+    paths = []
+    for seed in seeds:
+        path = tmp_path / f'log_{seed}.txt'
+        logview_benchmark.generate_log(str(path), 3000, seed=seed)
+        paths.append(str(path))
+    return paths
+
+
+def test_summary_only_includes_requested_files(tmp_path):
+    paths = generate_logs(tmp_path)
+
+    # ไฟล์สถานะใช้ร่วมกัน: สรุปของไฟล์แรกต้องไม่รวม frame จากไฟล์อื่นที่เคย stream ไว้
+    shared_state = str(tmp_path / 'shared_state.json')
+    for name in ('other', 'shared', 'alone'):
+        (tmp_path / name).mkdir()
+    logview_stream.LOGVIEW_STREAM(paths[1], str(tmp_path / 'other'), shared_state)
+    shared = pd.read_csv(logview_stream.LOGVIEW_STREAM(paths[0], str(tmp_path / 'shared'), shared_state))
+    alone = pd.read_csv(logview_stream.LOGVIEW_STREAM(paths[0], str(tmp_path / 'alone')))
+    assert not alone.empty
+    pd.testing.assert_frame_equal(shared, alone)
+
+
+def test_summary_of_several_files_merges_per_file_stats(tmp_path):
+    paths = generate_logs(tmp_path)
+    stream = logview_stream.LogStream(str(tmp_path / 'state.json'))
+    stream.update(paths)
+
+    merged = stream.frame_stats()
+    for key, stats in merged.items():
+        parts = [stream.frame_stats([p]).get(key) for p in paths]
+        parts = [p for p in parts if p]
+        assert stats['count'] == sum(p['count'] for p in parts)
+        expected_mean = sum(p['mean'] * p['count'] for p in parts) / max(stats['count'], 1)
+        assert abs(stats['mean'] - expected_mean) < 1e-9
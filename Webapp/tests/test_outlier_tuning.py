@@ -0,0 +1,36 @@
+import pandas as pd
+import pytest
+
+from functions import da_auto_uph, outlier_tuning
+
+
+@pytest.mark.parametrize('dates', [(None, None), ('2024-01-15', '2024-02-20')])
+def test_da_default_what_if_matches_result_page(tmp_path, uph_file, dates):
+    # ค่าเริ่มต้นต้องได้ตารางเดียวกับไฟล์ผลลัพธ์ของ DA_AUTO_UPH (Cust, #OF DIE, Product Number, DataPoints_*)
+    result = da_auto_uph.DA_AUTO_UPH([uph_file], str(tmp_path), *dates)
+    table, _ = da_auto_uph.tune_outliers([uph_file], *dates)
+    expected = pd.read_excel(result)
+    assert list(table.columns) == list(expected.columns)
+    # เทียบผ่านไฟล์ Excel เหมือนหน้า result (ชนิดคอลัมน์ตามที่อ่านกลับมา)
+    table.to_excel(tmp_path / 'what_if.xlsx', index=False)
+    pd.testing.assert_frame_equal(pd.read_excel(tmp_path / 'what_if.xlsx'), expected)
+
+
+def test_da_what_if_counts_change_with_params(uph_file):
+    strict, _ = da_auto_uph.tune_outliers([uph_file], params={'z_threshold': 1, 'min_count': 5})
+    default, _ = da_auto_uph.tune_outliers([uph_file])
+    assert strict['Outliers_Removed'].sum() > default['Outliers_Removed'].sum()
+    assert (strict['DataPoints_Before'] == strict['DataPoints_After'] + strict['Outliers_Removed']).all()
+
+
+@pytest.mark.parametrize('value', ['1.7', 2.5, 'abc', 'nan'])
+def test_parse_params_rejects_invalid_int(value):
+    with pytest.raises(ValueError):
+        outlier_tuning.parse_params('iqr', {'min_count': value})
+
+
+def test_parse_params_accepts_integral_values():
+    params = outlier_tuning.parse_params('zscore_iqr', {'min_count': '10.0', 'z_threshold': '2.5'})
+    assert params == {'z_threshold': 2.5, 'iqr_k': 1.5, 'min_count': 10, 'max_iter': 20}
+    assert isinstance(params['min_count'], int)
+
@@ -0,0 +1,20 @@
+import pandas as pd
+import pytest
+
+from functions import da_auto_uph, wb_auto_uph
+
+
+@pytest.mark.parametrize('dates', [(None, None), ('2024-01-15', '2024-02-20')])
+def test_wb_store_run_matches_direct_run(tmp_path, uph_file, dates):
+    direct = wb_auto_uph.WB_AUTO_UPH([uph_file], str(tmp_path / 'direct'), *dates)
+    stored = wb_auto_uph.WB_AUTO_UPH([uph_file], str(tmp_path / 'store'), *dates,
+                                     store_path=str(tmp_path / 'uph.sqlite'))
+    pd.testing.assert_frame_equal(pd.read_excel(stored), pd.read_excel(direct))
+
+
+@pytest.mark.parametrize('dates', [(None, None), ('2024-01-15', '2024-02-20')])
+def test_da_store_run_matches_direct_run(tmp_path, uph_file, dates):
+    direct = da_auto_uph.DA_AUTO_UPH([uph_file], str(tmp_path / 'direct'), *dates)
+    stored = da_auto_uph.DA_AUTO_UPH([uph_file], str(tmp_path / 'store'), *dates,
+                                     store_path=str(tmp_path / 'uph.sqlite'))
+    pd.testing.assert_frame_equal(pd.read_excel(stored), pd.read_excel(direct))
@@ -0,0 +1,134 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import make_uph_frame
+from functions import wb_auto_uph
+
+# คีย์ที่มีใน Part bom pkg.xlsx จริง (bom_no, bom_rev, package_code, device)
+MAP_KEYS = [
+    ('IDT3907P', 'B', 'TQC400E400B024A', 'P9120Z NBG24 I'),      # wire2 มีค่า -> ไม่คำนวณ UPH
+    ('PA30111P', 'D', 'TQC400M400B024P', 'NN30320A-VB1_SFG'),    # wire2 มีค่า
+    ('MCH2679P', 'D', 'TD-200E300B008P', 'MCP6402T-E/MNY'),
+    (' mch3423p', 'C', 'TD-200E300B008P', 'MCP6232T-E/MNY'),     # bom_no ต้อง normalize ก่อน map
+    ('MCR0084P', 'B', 'ND-700S500Z004P', '1500AA3A'),            # มี #of Bump1
+    ('MCR0075P', 'E', 'ND-700S500Z004P', 'D4BA-L5'),
+    ('MCH2679P', np.nan, 'TD-200E300B008P', 'MCP6402T-E/MNY'),   # bom_rev ว่าง
+    ('ZZZ0001P', 'A', 'TD-200E300B008P', 'UNKNOWN-DEVICE'),      # ไม่มีใน Map
+]
+
+
+def make_wb_frame(seed, n_rows=3000):
+    df = make_uph_frame(seed, n_rows)
+    rng = np.random.default_rng(seed + 100)
+    keys = [MAP_KEYS[i] for i in rng.integers(0, len(MAP_KEYS), n_rows)]
+    for col, values in zip(['bom_no', 'bom_rev', 'package_code', 'device'], zip(*keys)):
+        df[col] = pd.Series(values, dtype=object)
+    return df
+
+
+@pytest.fixture(scope='module')
+def wire_data():
+    analyzer = wb_auto_uph.WireBondingAnalyzer()
+    assert analyzer.load_wire_data()
+    return analyzer
+
+
+@pytest.fixture(params=['xlsx', 'csv'])
+def wb_file(request, tmp_path):
+    path = tmp_path / f'wb_uph.{request.param}'
+    df = make_wb_frame(0)
+    if request.param == 'csv':
+        df.to_csv(path, index=False)
+    else:
+        df.to_excel(path, index=False)
+    return str(path)
+
+
+def loaded_analyzer(wire_data, path):
+    analyzer = wb_auto_uph.WireBondingAnalyzer().share_wire_data(wire_data)
+    assert analyzer.load_uph_data(path)
+    return analyzer
+
+
+def rowwise_efficiency(analyzer, start_date=None, end_date=None):
+    """calculate_efficiency แบบเดิม (วนทีละกลุ่ม + ค้น Map ทีละกลุ่มด้วย get_wire_info_for_bom_optn) ใช้เป็นค่าอ้างอิง"""
+    assert analyzer.preprocess_data(start_date=start_date, end_date=end_date)
+    cleaned_data, outlier_info = analyzer.remove_outliers(analyzer.wb_data)
+    group_keys = ['bom_no', 'machine_model', 'optn_code', 'bom_rev', 'device', 'package_code']
+    results = []
+    for key_tuple, group in cleaned_data.groupby(group_keys, dropna=False):
+        key = dict(zip(group_keys, key_tuple))
+        mean_uph = group['uph'].mean()
+        item_no, no_bump, number_required = analyzer.get_wire_info_for_bom_optn(
+            key['bom_no'], key['optn_code'], bom_rev=key['bom_rev'],
+            package_code=key['package_code'], product_number=key['device'])
+        wire_per_unit = efficiency = None
+        if no_bump is not None and number_required is not None and not pd.isna(no_bump) and not pd.isna(number_required):
+            wire_per_unit = analyzer.calculate_wire_per_unit(
+                key['bom_no'], key['optn_code'], bom_rev=key['bom_rev'],
+                package_code=key['package_code'], product_number=key['device'])
+            if wire_per_unit is not None and wire_per_unit > 0:
+                efficiency = mean_uph / wire_per_unit
+        # เหมือนเดิม: กลุ่มที่คีย์มี NaN หาใน outlier_info ไม่เจอ ใช้จำนวนหลังตัดเป็นค่าเริ่มต้น
+        count_after = len(group)
+        outlier_data = outlier_info.get(key_tuple, {
+            'original_count': count_after, 'removed_count': 0, 'final_count': count_after})
+        results.append({
+            'Cust': str(key['bom_no'])[:3],
+            'Package Code': key['package_code'],
+            'Product Number': key['device'],
+            'Bom No': key['bom_no'],
+            'Bom Rev': key['bom_rev'],
+            'Machine Model': key['machine_model'],
+            'Operation': group['operation'].iloc[0],
+            'Optn_Code': key['optn_code'],
+            'Item_No': item_no,
+            '#OF BUMP': no_bump,
+            '#OF WIRE': number_required,
+            'Total WireCount': round(wire_per_unit, 2) if wire_per_unit is not None else None,
+            'WPH': round(mean_uph, 2),
+            'UPH': round(efficiency, 3) if efficiency is not None else None,
+            'DataPoints_Before': outlier_data['original_count'],
+            'DataPoints_After': outlier_data['final_count'],
+            'Outliers_Removed': outlier_data['removed_count'],
+        })
+    return pd.DataFrame(results)
+
+
+@pytest.mark.parametrize('dates', [(None, None), ('2024-01-15', '2024-02-20')])
+def test_efficiency_matches_rowwise_map_lookup(wire_data, wb_file, dates):
+    result = loaded_analyzer(wire_data, wb_file).calculate_efficiency(*dates)
+    expected = rowwise_efficiency(loaded_analyzer(wire_data, wb_file), *dates)
+    pd.testing.assert_frame_equal(result, expected)
+
+    # ครอบคลุม wire2, bom_rev ว่าง และ BOM ที่ไม่มีใน Map
+    wire2 = result['Bom No'].isin(['IDT3907P', 'PA30111P'])
+    assert wire2.any() and result.loc[wire2, 'UPH'].isna().all() and result.loc[wire2, 'Item_No'].notna().all()
+    assert result['Bom Rev'].isna().any()
+    unmatched = result['Bom No'] == 'ZZZ0001P'
+    assert unmatched.any() and result.loc[unmatched, 'Item_No'].isna().all()
+    assert result['UPH'].notna().any()
+
+
+@pytest.mark.parametrize('dates', [(None, None), ('2024-01-15', '2024-02-20')])
+def test_chunked_efficiency_matches_whole_file(wire_data, wb_file, dates):
+    whole = loaded_analyzer(wire_data, wb_file)
+    expected = whole.calculate_efficiency(*dates)
+    analyzer = wb_auto_uph.WireBondingAnalyzer().share_wire_data(wire_data)
+    result = analyzer.calculate_efficiency_chunked(wb_file, *dates, chunk_rows=700, n_partitions=4)
+    pd.testing.assert_frame_equal(result, expected)
+
+    stats = analyzer.chunk_stats
+    assert stats['chunks'] == 5
+    assert stats['rows_read'] == 3000
+    assert stats['rows_kept'] == len(whole.wb_data)
+    assert stats['groups'] == len(expected)
+    assert 0 < stats['chunk_peak_mb'] and 0 < stats['partition_peak_mb']
+    assert stats['traced_peak_mb'] is None
+
+
+def test_chunked_efficiency_reports_traced_memory(wire_data, wb_file):
+    analyzer = wb_auto_uph.WireBondingAnalyzer().share_wire_data(wire_data)
+    analyzer.calculate_efficiency_chunked(wb_file, chunk_rows=1000, n_partitions=2, track_memory=True)
+    assert analyzer.chunk_stats['traced_peak_mb'] > 0